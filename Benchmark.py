@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+"""
+Binome : DELECLUSE Raphael, CEUNINCK Guillaume
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import numpy as np
+import Eigenfaces as EG
+import Generation_data
+import Metrics as Mt
+import Stockage
+import NN_brute_force as NN_BF
+import Quantification
+
+REGLES = ("Kaiser", "Inertia", "Coude")
+
+#Configurations par defaut : (nombre de personnes, images par personne, cote p des images)
+CONFIGURATIONS = ((200, 8, 32), (400, 10, 48))
+
+#Quantiles a 97.5% de la loi de Student selon le nombre de degres de liberte (1.96 au-dela)
+STUDENT_975 = {1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306, 9: 2.262,
+               10: 2.228, 15: 2.131, 20: 2.086, 30: 2.042}
+
+def gallery_synthetique(nb_personnes, images_par_personne, p, rang = 40, bruit = 6, seed = 0):
+    """ 
+    Generation d'une base d'images synthetiques ressemblant a des visages apres ACP : chaque personne est un point
+    d'un sous-espace de dimension rang, ses images en sont des variations, auxquelles s'ajoute un bruit sur chaque pixel.
+    
+    Entree:
+        nb_personnes:
+            Le nombre de personnes.
+        images_par_personne:
+            Le nombre d'images de chaque personne.
+        p:
+            Le cote des images.
+        rang:
+            La dimension du sous-espace des visages.
+        bruit:
+            L'ecart type du bruit ajoute a chaque pixel.
+        seed:
+            La graine du generateur aleatoire.
+    
+    Sortie:
+        database:
+            Le np array uint8 de taille (n, p, p) des images.
+        database_names:
+            La liste contenant les noms de chaque image, sous la forme X.Y
+    """
+    
+    rng = np.random.default_rng(seed)
+    #Variance decroissante des composantes, comme les valeurs propres d'une base de visages
+    base = rng.standard_normal((rang, p*p))*(20/np.sqrt(np.arange(1, rang + 1)))[:, None]
+    personnes = rng.standard_normal((nb_personnes, rang))*2
+    
+    coefficients = np.repeat(personnes, images_par_personne, axis = 0)
+    coefficients += 0.4*rng.standard_normal(coefficients.shape)
+    images = 128 + coefficients.dot(base) + bruit*rng.standard_normal((len(coefficients), p*p))
+    
+    database = np.clip(images, 0, 255).astype(np.uint8).reshape(-1, p, p)
+    database_names = ["%d.%d" % (i, j) for i in range(nb_personnes) for j in range(images_par_personne)]
+    return database, database_names
+
+def mesurer(fonction, repetitions = 5, echauffement = 1):
+    """ 
+    Mesure du temps d'execution d'une fonction sans argument.
+    
+    Entree:
+        fonction:
+            La fonction mesuree.
+        repetitions:
+            Le nombre d'executions mesurees.
+        echauffement:
+            Le nombre d'executions prealables non mesurees (caches, allocations).
+    
+    Sortie:
+        statistiques:
+            Le dictionnaire des temps en secondes : moyenne, ecart_type, ic95 (demi-largeur de l'intervalle de confiance
+            a 95% de la moyenne), min, mediane et la liste des mesures.
+        resultat:
+            Le resultat de la derniere execution.
+    """
+    
+    for i in range(echauffement):
+        resultat = fonction()
+    
+    mesures = []
+    for i in range(repetitions):
+        startTime = time.perf_counter()
+        resultat = fonction()
+        mesures.append(time.perf_counter() - startTime)
+    
+    mesures = np.array(mesures)
+    ecart_type = mesures.std(ddof = 1) if len(mesures) > 1 else 0.0
+    ddl = [d for d in STUDENT_975 if d <= max(len(mesures) - 1, 1)][-1]
+    quantile = STUDENT_975[ddl] if len(mesures) - 1 <= 30 else 1.96
+    
+    statistiques = {"moyenne": float(mesures.mean()), "ecart_type": float(ecart_type),
+                    "ic95": float(quantile*ecart_type/np.sqrt(len(mesures))),
+                    "min": float(mesures.min()), "mediane": float(np.median(mesures)),
+                    "mesures": mesures.tolist()}
+    return statistiques, resultat
+
+def benchmark(configurations = CONFIGURATIONS, regles = REGLES, repetitions = 5, echauffement = 1, nb_probes = 100, seed = 0):
+    """ 
+    Mesure de chaque etape de la chaine sur des gallery synthetiques (voir gallery_synthetique) :
+    * chargement : lecture de la gallery depuis un fichier .gal (voir Stockage.lire_gallery) ;
+    * acp_<regle> : ACP efficace selon chaque critere de select_significatif_vectors, sans le cache des decompositions ;
+    * projection_<regle> : projection des requetes connues et inconnues ;
+    * recherche_<regle> : distances minimales des requetes a la gallery reduite (voir Metrics.distances_minimales) ;
+    * recherche_force_brute : la meme recherche dans l'espace des pixels, sans reduction ;
+    * comptage_<regle> : comptage des cas pour tous les radius (voir Metrics.mesure_cas_balayage) ;
+    * rayon_<regle> et rayon_pq_<regle> : recherche par rayon de toutes les requetes, au rayon median des distances minimales
+      des requetes connues, en force brute sur la gallery reduite et sur sa version compressee (voir Quantification.GalleryPQ).
+    
+    Entree:
+        configurations:
+            La liste des (nombre de personnes, images par personne, cote p des images) testes.
+        regles:
+            Les criteres de selection des vecteurs principaux testes.
+        repetitions, echauffement:
+            Le nombre d'executions mesurees et non mesurees de chaque etape (voir mesurer).
+        nb_probes:
+            Le nombre maximal de requetes connues et inconnues.
+        seed:
+            La graine des generations aleatoires.
+    
+    Sortie:
+        Le dictionnaire des resultats, serialisable en JSON : l'environnement d'execution, les parametres,
+        et pour chaque configuration les statistiques de chaque etape, la dimension retenue par chaque critere
+        et la memoire de la gallery reduite et de sa version compressee.
+    """
+    
+    resultats = {"environnement": {"python": platform.python_version(), "numpy": np.__version__,
+                                   "machine": platform.machine(), "nb_coeurs": os.cpu_count()},
+                 "parametres": {"repetitions": repetitions, "echauffement": echauffement, "seed": seed},
+                 "configurations": []}
+    
+    for nb_personnes, images_par_personne, p in configurations:
+        database, database_names = gallery_synthetique(nb_personnes, images_par_personne, p, seed = seed)
+        data, data_names, probes_unknown, names_unknown, probes_known, names_known = Generation_data.generation_data(
+            database, database_names, min(nb_probes, nb_personnes//4), seed)
+        ids_data, ids_known, ids_unknown = Mt.identites_entieres(data_names, names_known, names_unknown)
+        
+        nom = "%dx%d_%dpx" % (nb_personnes, images_par_personne, p)
+        configuration = {"nom": nom, "nb_images": len(data), "dimension": p*p, "nb_requetes": len(probes_known) + len(probes_unknown),
+                         "dimensions_reduites": {}, "octets_gallery": {}, "etapes": {}}
+        etapes = configuration["etapes"]
+        
+        with tempfile.TemporaryDirectory() as dossier:
+            chemin = os.path.join(dossier, "data.gal")
+            Stockage.ecrire_gallery(chemin, data, data_names)
+            etapes["chargement"] = mesurer(lambda: np.array(Stockage.lire_gallery(chemin)[0]), repetitions, echauffement)[0]
+        
+        def recherche(D, known, unknown):
+            d_min_known, d_meme_known = Mt.distances_minimales(D, ids_data, ids_known, known)
+            return d_min_known, d_meme_known, Mt.distances_minimales(D, ids_data, ids_unknown, unknown)[0]
+        
+        data_linear = EG.linearisation(data)
+        etapes["recherche_force_brute"] = mesurer(lambda: recherche(data_linear, EG.linearisation(probes_known), EG.linearisation(probes_unknown)),
+                                                  repetitions, echauffement)[0]
+        
+        for regle in regles:
+            etapes["acp_" + regle], (D_reduced, w_significatif, mu, moyenne) = mesurer(
+                lambda: EG.ACP_efficace_complete(data, regle), repetitions, echauffement)
+            configuration["dimensions_reduites"][regle] = int(w_significatif.shape[1])
+            
+            transformateur = EG.TransformateurEigenfaces(moyenne, w_significatif, np.float64)
+            etapes["projection_" + regle], (known, unknown) = mesurer(
+                lambda: (transformateur.transform(probes_known), transformateur.transform(probes_unknown)), repetitions, echauffement)
+            
+            etapes["recherche_" + regle], distances = mesurer(lambda: recherche(D_reduced, known, unknown), repetitions, echauffement)
+            
+            radius = np.linspace(0, distances[0].max(), 1000)
+            etapes["comptage_" + regle] = mesurer(lambda: Mt.mesure_cas_balayage(*distances, radius), repetitions, echauffement)[0]
+            
+            requetes = np.concatenate((known, unknown))
+            r = float(np.median(distances[0]))
+            gallery_pq = Quantification.GalleryPQ(D_reduced)
+            configuration["octets_gallery"][regle] = {"float64": int(D_reduced.nbytes), "pq": int(gallery_pq.octets())}
+            etapes["rayon_" + regle] = mesurer(lambda: NN_BF.NN_bf_search(D_reduced, requetes, r), repetitions, echauffement)[0]
+            etapes["rayon_pq_" + regle] = mesurer(lambda: gallery_pq.NN_search(requetes, r), repetitions, echauffement)[0]
+        
+        resultats["configurations"].append(configuration)
+        print(nom + " : " + "  ".join("%s %.2e s" % (etape, stats["moyenne"]) for etape, stats in etapes.items()))
+    
+    return resultats
+
+def sauvegarder_resultats(resultats, chemin):
+    """ 
+    Ecriture des resultats d'un benchmark au format JSON.
+    """
+    
+    dossier = os.path.dirname(chemin)
+    if dossier:
+        os.makedirs(dossier, exist_ok = True)
+    with open(chemin, "w") as f:
+        json.dump(resultats, f, indent = 2)
+
+def charger_resultats(chemin):
+    """ 
+    Lecture des resultats d'un benchmark au format JSON.
+    """
+    
+    with open(chemin) as f:
+        return json.load(f)
+
+def regressions(resultats, reference, tolerance = 0.25):
+    """ 
+    Comparaison des resultats a une reference : une etape regresse si la borne basse de l'intervalle de confiance
+    de son temps moyen depasse de plus de tolerance la borne haute de celui de la reference.
+    Seules les configurations et etapes presentes dans les deux resultats sont comparees.
+    
+    Entree:
+        resultats:
+            Les resultats du benchmark (voir benchmark).
+        reference:
+            Les resultats de reference.
+        tolerance:
+            Le ralentissement relatif tolere.
+    
+    Sortie:
+        La liste des [configuration, etape, temps moyen, temps moyen de reference] des etapes ayant regresse.
+    """
+    
+    references = {configuration["nom"]: configuration["etapes"] for configuration in reference["configurations"]}
+    res = []
+    for configuration in resultats["configurations"]:
+        for etape, stats in configuration["etapes"].items():
+            ref = references.get(configuration["nom"], {}).get(etape)
+            if ref is None:
+                continue
+            if stats["moyenne"] - stats["ic95"] > (ref["moyenne"] + ref["ic95"])*(1 + tolerance):
+                res.append([configuration["nom"], etape, stats["moyenne"], ref["moyenne"]])
+    return res
+
+if __name__ == "__main__":
+    #python Benchmark.py [--sortie resultats.json] [--reference reference.json] [--enregistrer-reference]
+    parser = argparse.ArgumentParser(description = "Benchmark des etapes de la chaine eigenfaces sur des gallery synthetiques.")
+    parser.add_argument("--sortie", default = "benchmarks/resultats.json")
+    parser.add_argument("--reference", default = "benchmarks/reference.json")
+    parser.add_argument("--enregistrer-reference", action = "store_true")
+    parser.add_argument("--repetitions", type = int, default = 5)
+    parser.add_argument("--echauffement", type = int, default = 1)
+    parser.add_argument("--tolerance", type = float, default = 0.25)
+    args = parser.parse_args()
+    
+    resultats = benchmark(repetitions = args.repetitions, echauffement = args.echauffement)
+    sauvegarder_resultats(resultats, args.sortie)
+    
+    if args.enregistrer_reference:
+        sauvegarder_resultats(resultats, args.reference)
+    elif os.path.isfile(args.reference):
+        res = regressions(resultats, charger_resultats(args.reference), args.tolerance)
+        for nom, etape, moyenne, moyenne_ref in res:
+            print("Regression %s %s : %.2e s contre %.2e s" % (nom, etape, moyenne, moyenne_ref))
+        if len(res) > 0:
+            sys.exit(1)
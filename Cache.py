@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+Binome : DELECLUSE Raphael, CEUNINCK Guillaume
+"""
+
+import os
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict
+
+#Taille des blocs de donnees lus pour le calcul de l'empreinte
+TAILLE_BLOC = 2**24
+
+def empreinte(data_linear, *parametres):
+    """ 
+    Empreinte du contenu des images linearisees et des parametres de la decomposition.
+    Deux gallery identiques ont la meme empreinte, quel que soit leur chemin de chargement.
+    
+    Entree:
+        data_linear:
+            Le np array de taille (n, p*p) des images linearisees.
+        parametres:
+            Les parametres dont depend le resultat (solveur, k, type des calculs).
+    
+    Sortie:
+        L'empreinte, une chaine hexadecimale.
+    """
+    
+    h = hashlib.blake2b(digest_size = 20)
+    h.update(repr((data_linear.shape, data_linear.dtype.str) + parametres).encode("utf-8"))
+    pas = max(1, TAILLE_BLOC // max(1, data_linear.itemsize*data_linear.shape[1]))
+    for i in range(0, len(data_linear), pas):
+        h.update(np.ascontiguousarray(data_linear[i:i + pas]))
+    return h.hexdigest()
+
+class CacheDecomposition:
+    """ 
+    Cache des decompositions (valeurs propres triees mu et vecteurs propres w) indexe par empreinte du contenu de la gallery
+    (voir empreinte) : en memoire, les decompositions les plus recemment utilisees sont gardees dans la limite de octets_max ;
+    sur disque, si un dossier est donne, chaque decomposition est conservee dans dossier/<empreinte>_mu.npy et dossier/<empreinte>_w.npy,
+    les moins recemment utilisees etant supprimees au-dela de octets_max_disque.
+    
+    Le cache est passe explicitement aux fonctions qui l'utilisent (voir Eigenfaces.decomposition) et peut etre partage entre threads.
+    Les tableaux retournes sont partages entre les appels et donc en lecture seule.
+    """
+    
+    def __init__(self, octets_max = 2**30, dossier = None, octets_max_disque = 2**32):
+        """ 
+        Entree:
+            octets_max:
+                La memoire maximale occupee par les decompositions gardees en memoire.
+            dossier:
+                Le dossier du cache sur disque, None (par defaut) pour un cache uniquement en memoire.
+            octets_max_disque:
+                La place maximale occupee par les fichiers du cache sur disque.
+        """
+        
+        self.octets_max = octets_max
+        self.dossier = dossier
+        self.octets_max_disque = octets_max_disque
+        self.entrees = OrderedDict()
+        self.octets = 0
+        self.succes, self.echecs = 0, 0
+        self._verrou = threading.RLock()
+    
+    def _chemins(self, cle):
+        return [os.path.join(self.dossier, cle + "_" + nom + ".npy") for nom in ("mu", "w")]
+    
+    def _garder(self, cle, mu, w):
+        for tableau in (mu, w):
+            tableau.flags.writeable = False
+        if cle in self.entrees:
+            mu_ancien, w_ancien = self.entrees.pop(cle)
+            self.octets -= mu_ancien.nbytes + w_ancien.nbytes
+        self.entrees[cle] = (mu, w)
+        self.octets += mu.nbytes + w.nbytes
+        #Eviction des decompositions les moins recemment utilisees
+        while self.octets > self.octets_max and len(self.entrees) > 1:
+            mu_ancien, w_ancien = self.entrees.popitem(last = False)[1]
+            self.octets -= mu_ancien.nbytes + w_ancien.nbytes
+    
+    def _fichiers_disque(self):
+        """ 
+        Retourne le dictionnaire associant a chaque cle presente sur disque la liste de ses fichiers,
+        leur taille totale et leur date de derniere utilisation.
+        """
+        
+        fichiers = {}
+        for nom in os.listdir(self.dossier):
+            for suffixe in ("_mu.npy", "_w.npy"):
+                if nom.endswith(suffixe):
+                    chemin = os.path.join(self.dossier, nom)
+                    try:
+                        infos = os.stat(chemin)
+                    except OSError:
+                        continue
+                    entree = fichiers.setdefault(nom[:-len(suffixe)], [[], 0, 0])
+                    entree[0].append(chemin)
+                    entree[1] += infos.st_size
+                    entree[2] = max(entree[2], infos.st_mtime)
+        return fichiers
+    
+    def _evincer_disque(self, cle_gardee):
+        """ 
+        Suppression des decompositions les moins recemment utilisees du disque, jusqu'a respecter octets_max_disque.
+        La decomposition cle_gardee, qui vient d'etre ecrite, est toujours conservee.
+        """
+        
+        fichiers = self._fichiers_disque()
+        total = sum(entree[1] for entree in fichiers.values())
+        for cle, (chemins, taille, date) in sorted(fichiers.items(), key = lambda item: item[1][2]):
+            if total <= self.octets_max_disque:
+                break
+            if cle == cle_gardee:
+                continue
+            for chemin in chemins:
+                try:
+                    os.remove(chemin)
+                except OSError:
+                    pass
+            total -= taille
+    
+    def obtenir(self, cle):
+        """ 
+        Retourne la decomposition (mu, w) associee a la cle, depuis la memoire ou depuis le disque, None si absente.
+        """
+        
+        with self._verrou:
+            if cle in self.entrees:
+                self.entrees.move_to_end(cle)
+                self.succes += 1
+                return self.entrees[cle]
+            
+            if self.dossier is not None and all(os.path.isfile(chemin) for chemin in self._chemins(cle)):
+                chemins = self._chemins(cle)
+                mu, w = [np.load(chemin) for chemin in chemins]
+                #La date des fichiers sert d'ordre d'utilisation pour l'eviction sur disque
+                for chemin in chemins:
+                    os.utime(chemin)
+                self._garder(cle, mu, w)
+                self.succes += 1
+                return mu, w
+            
+            self.echecs += 1
+            return None
+    
+    def ranger(self, cle, mu, w):
+        """ 
+        Ajout de la decomposition (mu, w) au cache, en memoire et sur disque.
+        Chaque fichier est ecrit sous un nom temporaire puis renomme, de sorte qu'un fichier du cache est toujours complet.
+        """
+        
+        mu, w = np.array(mu), np.array(w)
+        with self._verrou:
+            if self.dossier is not None and mu.nbytes + w.nbytes <= self.octets_max_disque:
+                os.makedirs(self.dossier, exist_ok = True)
+                for chemin, tableau in zip(self._chemins(cle), (mu, w)):
+                    with open(chemin + ".tmp", "wb") as f:
+                        np.save(f, tableau)
+                    os.replace(chemin + ".tmp", chemin)
+                self._evincer_disque(cle)
+            self._garder(cle, mu, w)
+    
+    def vider(self, disque = False):
+        """ 
+        Vidage du cache en memoire, et des fichiers du cache sur disque si disque vaut True.
+        """
+        
+        with self._verrou:
+            self.entrees.clear()
+            self.octets = 0
+            if disque and self.dossier is not None and os.path.isdir(self.dossier):
+                for chemins, taille, date in self._fichiers_disque().values():
+                    for chemin in chemins:
+                        os.remove(chemin)
@@ -5,8 +5,11 @@ Binome : DELECLUSE Raphael, CEUNINCK Guillaume
 
 import numpy as np
 import matplotlib.pyplot as plt
+import Profilage
+import Cache
+import NN_brute_force as NN_BF
 
-def linearisation(data):
+def linearisation(data, dtype = np.float64):
     """ 
     Linearisation des donnees.
     
@@ -14,13 +17,20 @@ def linearisation(data):
         data: 
             La liste d'images correspondant a la gallery, aux requetes connues ou inconnues.
             Une image est representee par un np array de taille (p,p).
+        dtype:
+            Le type dans lequel les images d'une liste sont copiees (np.uint8 suffit pour des images brutes).
     
     Sortie:
         data_linear:
             Le np array contenant l'ensemble des images linearisees en dimension p*p.
+            Pour une liste, les images sont copiees en dtype ; pour un np array (n, p, p), son type est conserve.
     """
     
-    data_linear = np.zeros((len(data),data[0].shape[0]*data[0].shape[1]))
+    #Un np array contigu de taille (n, p, p) (voir Generation_data.load_images_parallel) est simplement vu en (n, p*p), sans copie
+    if isinstance(data, np.ndarray) and data.ndim == 3:
+        return data.reshape(len(data), -1)
+    
+    data_linear = np.zeros((len(data),data[0].shape[0]*data[0].shape[1]), dtype = dtype)
     
     for i, image in enumerate(data):
         data_linear[i] = np.reshape(image, image.shape[0]*image.shape[1])
@@ -58,6 +68,7 @@ def transform_data(data):
     
     return centraliser(linearisation(data))
 
+@Profilage.etape
 def projection(data, w):
     """ 
     Projection des donnees sur le sous-espace vectoriel engendre par les w vecteurs.
@@ -75,14 +86,141 @@ def projection(data, w):
     
     return  data.dot(w)
 
-def Calc_valeurs_vecteurs_propres(D):
+class TransformateurEigenfaces:
+    """ 
+    Projection de requetes dans l'espace reduit d'une gallery deja apprise : linearisation, centrage par rapport
+    au visage moyen de la gallery et projection sur les vecteurs principaux, en une seule etape.
+    
+    Le centrage est effectue apres la projection : (x - moyenne).w = x.w - moyenne.w, ou moyenne.w est calcule une fois,
+    ce qui evite une passe et une copie sur les p*p pixels de chaque requete. Les calculs sont faits en float32
+    dans des tampons alloues une fois, agrandis seulement si un lot plus grand se presente.
+    
+    Pour la metrique blanchie, la division par sqrt(mu) est integree aux vecteurs principaux ; pour la metrique cosinus,
+    les requetes projetees sont normalisees (voir NN_brute_force.preparer, qui prepare la gallery de la meme maniere).
+    """
+    
+    def __init__(self, moyenne, w, dtype = np.float32, metrique = "euclidienne", mu = None):
+        """ 
+        Entree:
+            moyenne:
+                Le visage d’un individu moyen de la gallery, linearise.
+            w:
+                Les k vecteurs principaux de la gallery.
+            dtype:
+                Le type flottant des calculs.
+            metrique:
+                La metrique de la recherche (voir NN_brute_force.METRIQUES).
+            mu:
+                Les valeurs propres de l'ACP, necessaires pour la metrique blanchie.
+        """
+        
+        self.dtype = np.dtype(dtype)
+        w = np.asarray(w, dtype = np.float64)
+        echelle = NN_BF.echelle_metrique(metrique, mu, w.shape[1])
+        if echelle is not None:
+            w = w*echelle
+        self.normaliser = metrique == "cosinus"
+        self.w = np.ascontiguousarray(w, dtype = self.dtype)
+        self.moyenne_projetee = np.asarray(moyenne, dtype = np.float64).dot(w).astype(self.dtype)
+        self._entree = np.empty((1, self.w.shape[0]), dtype = self.dtype)
+        self._sortie = np.empty((1, self.w.shape[1]), dtype = self.dtype)
+    
+    @classmethod
+    def ajuster(cls, data, rule = "Kaiser", solveur = "eigh", dtype = np.float32):
+        """ 
+        Apprentissage du transformateur par l'ACP efficace de la gallery (voir ACP_efficace_complete).
+        
+        Sortie:
+            transformateur:
+                Le transformateur appris.
+            D_reduced:
+                La gallery reduite.
+        """
+        
+        D_reduced, w_significatif, mu, moyenne = ACP_efficace_complete(data, rule, solveur)
+        return cls(moyenne, w_significatif, dtype), D_reduced
+    
+    def _tampons(self, n):
+        if len(self._entree) < n:
+            self._entree = np.empty((n, self.w.shape[0]), dtype = self.dtype)
+            self._sortie = np.empty((n, self.w.shape[1]), dtype = self.dtype)
+        return self._entree[:n], self._sortie[:n]
+    
+    @Profilage.etape
+    def transform(self, batch, out = None):
+        """ 
+        Projection d'un lot de requetes.
+        
+        Entree:
+            batch:
+                La liste ou le np array des requetes.
+                Une image est representee par un np array de taille (p,p) ou (p*p).
+            out:
+                Un np array de taille (n, k) et du type du transformateur dans lequel ecrire le resultat.
+        
+        Sortie:
+            Les requetes projetees. Sans out, le resultat est une copie independante des tampons.
+        """
+        
+        batch = np.asarray(batch)
+        n = len(batch)
+        entree, sortie = self._tampons(n)
+        np.copyto(entree, batch.reshape(n, -1), casting = "unsafe")
+        if out is None:
+            out = np.empty((n, self.w.shape[1]), dtype = self.dtype)
+        np.dot(entree, self.w, out = out)
+        out -= self.moyenne_projetee
+        if self.normaliser:
+            NN_BF.normaliser_lignes(out)
+        return out
+    
+    def transform_un(self, probe):
+        """ 
+        Projection d'une seule requete, sans aucune allocation.
+        
+        Entree:
+            probe:
+                La requete, de taille (p,p) ou (p*p).
+        
+        Sortie:
+            La requete projetee, dans un tampon interne reecrit a l'appel suivant.
+        """
+        
+        entree, sortie = self._tampons(1)
+        np.copyto(entree[0], np.ravel(probe), casting = "unsafe")
+        np.dot(entree, self.w, out = sortie)
+        sortie -= self.moyenne_projetee
+        if self.normaliser:
+            NN_BF.normaliser_lignes(sortie)
+        return sortie[0]
+
+#Solveurs utilisables pour la decomposition de D (voir Calc_valeurs_vecteurs_propres)
+SOLVEURS = ("eig", "eigh", "svd", "aleatoire", "eigsh")
+
+#Solveurs ne calculant que les k premiers couples valeurs/vecteurs propres
+SOLVEURS_PARTIELS = ("aleatoire", "eigsh")
+
+@Profilage.etape
+def Calc_valeurs_vecteurs_propres(D, solveur = "eigh", k = None, seed = 0):
     """ 
     Calcule des valeurs propres mu et des vecteurs w normalises associes a D
+    Les valeurs propres sont toujours retournees par ordre decroissant, et les vecteurs dans le meme ordre.
     
     Entree:
         D: 
             La liste d'images linearisees et centrees correspondant a la gallery.
             Une image est representee par un np array.
+        solveur:
+            La methode de decomposition utilisee.
+            * eig : Decomposition generale de la matrice de Gram D.D_t (methode historique).
+            * eigh : Decomposition symetrique de la matrice de Gram D.D_t.
+            * svd : Decomposition en valeurs singulieres reduite de D.
+            * aleatoire : SVD aleatoire ne calculant que les k premiers vecteurs.
+            * eigsh : Methode de Lanczos (scipy) ne calculant que les k premiers vecteurs de la matrice de Gram.
+        k:
+            Le nombre de vecteurs propres a calculer pour les solveurs partiels.
+        seed:
+            La graine du generateur aleatoire utilise par le solveur aleatoire.
     
     Sortie:
         mu: 
@@ -91,9 +229,34 @@ def Calc_valeurs_vecteurs_propres(D):
             Les n vecteurs propres normalises associes a D.
     """
     
+    if solveur not in SOLVEURS:
+        raise ValueError("Solveur inconnu : " + str(solveur))
+    
+    n = D.shape[0]
+    
+    if solveur == "svd":
+        U, s, Vt = np.linalg.svd(D, full_matrices = False)
+        return s**2/(n -1), Vt.transpose()
+    
+    if solveur == "aleatoire":
+        return svd_aleatoire(D, k, seed = seed)
+    
     D_t = D.transpose()
     cov = D.dot(D_t)/(D.shape[1]-1)
-    values, vectors = np.linalg.eig(cov)
+    
+    if solveur == "eig":
+        values, vectors = np.linalg.eig(cov)
+        values, vectors = np.real(values), np.real(vectors)
+    elif solveur == "eigh":
+        values, vectors = np.linalg.eigh(cov)
+    else:
+        from scipy.sparse.linalg import eigsh
+        values, vectors = eigsh(cov, k = min(k, n - 1), which = "LA")
+    
+    #Tri des valeurs propres par ordre décroissant
+    ordre = np.argsort(values)[::-1]
+    values, vectors = values[ordre], vectors[:, ordre]
+    
     w = D_t.dot(vectors)
         
     #valeurs propres de D :
@@ -101,12 +264,87 @@ def Calc_valeurs_vecteurs_propres(D):
     
     #Normalisation des vecteurs
     normes = np.linalg.norm(w, axis = 0)
+    normes[normes == 0] = 1
     w_norm = w/normes
     
     return mu, w_norm
 
+@Profilage.etape
+def decomposition(data_linear, D, solveur = "eigh", k = None, cache = None):
+    """ 
+    Calc_valeurs_vecteurs_propres de la gallery centree D, conservee si un cache est donne (voir Cache.CacheDecomposition)
+    sous l'empreinte des images linearisees data_linear : changer de critere de selection ou tracer l'eboulis
+    d'une gallery deja decomposee ne refait ni la matrice de Gram ni sa decomposition.
+    
+    Entree:
+        data_linear:
+            Les images linearisees dont D est la version centree.
+        D:
+            La liste d'images linearisees et centrees correspondant a la gallery.
+        solveur:
+            La methode de decomposition utilisee (voir Calc_valeurs_vecteurs_propres).
+        k:
+            Le nombre de vecteurs propres a calculer pour les solveurs partiels.
+        cache:
+            Le cache des decompositions, None pour toujours decomposer.
+    
+    Sortie:
+        mu: 
+            Les valeurs propres associees a D, par ordre decroissant (en lecture seule si issues du cache).
+        w_norm:
+            Les vecteurs propres normalises associes a D (en lecture seule si issus du cache).
+    """
+    
+    if cache is None:
+        return Calc_valeurs_vecteurs_propres(D, solveur, k)
+    
+    cle = Cache.empreinte(data_linear, solveur, k if solveur in SOLVEURS_PARTIELS else None, D.dtype.str)
+    res = cache.obtenir(cle)
+    if res is None:
+        cache.ranger(cle, *Calc_valeurs_vecteurs_propres(D, solveur, k))
+        res = cache.obtenir(cle)
+    return res
+
+def svd_aleatoire(D, k, sur_echantillonnage = 10, nb_iterations = 4, seed = 0):
+    """ 
+    Calcule les k premieres valeurs propres mu et vecteurs w normalises associes a D par SVD aleatoire
+    (recherche de l'image de D par projection aleatoire, puis iterations de puissance).
+    
+    Entree:
+        D: 
+            La liste d'images linearisees et centrees correspondant a la gallery.
+            Une image est representee par un np array.
+        k:
+            Le nombre de vecteurs propres a calculer.
+        sur_echantillonnage:
+            Le nombre de vecteurs aleatoires supplementaires ameliorant la precision.
+        nb_iterations:
+            Le nombre d'iterations de puissance.
+        seed:
+            La graine du generateur aleatoire.
+    
+    Sortie:
+        mu: 
+            Les k premieres valeurs propres associees a D, par ordre decroissant.
+        w_norm:
+            Les k premiers vecteurs propres normalises associes a D.
+    """
+    
+    n = D.shape[0]
+    l = min(k + sur_echantillonnage, min(D.shape))
+    omega = np.random.default_rng(seed).standard_normal((D.shape[1], l)).astype(D.dtype, copy = False)
+    
+    Q = np.linalg.qr(D.dot(omega))[0]
+    for i in range(nb_iterations):
+        Q = np.linalg.qr(D.transpose().dot(Q))[0]
+        Q = np.linalg.qr(D.dot(Q))[0]
+    
+    U, s, Vt = np.linalg.svd(Q.transpose().dot(D), full_matrices = False)
+    
+    return s[:k]**2/(n -1), Vt[:k].transpose()
+
 
-def ACP_efficace(data, rule = "Kaiser"):
+def ACP_efficace(data, rule = "Kaiser", solveur = "eigh", k = None, dtype = np.float64, cache = None):
     """ 
     Realisation de l'ACP efficace selon le critere rule
         
@@ -119,6 +357,14 @@ def ACP_efficace(data, rule = "Kaiser"):
             * Kaiser : Le critere de Kaiser est choisi pour selectionner les k premiers vecteurs principaux.
             * Inertia : Le critere d'inertie est choisi pour selectionner les k premiers vecteurs principaux.
             * Coude : Le critere d'eboulis des parts d’inertie est choisi pour selectionner les k premiers vecteurs principaux.
+        solveur:
+            La methode de decomposition utilisee (voir Calc_valeurs_vecteurs_propres).
+        k:
+            Le nombre de vecteurs propres calcules en premier lieu par un solveur partiel.
+        dtype:
+            Le type flottant des calculs (voir ACP_efficace_complete).
+        cache:
+            Le cache des decompositions (voir decomposition).
     
     Sortie:
         D_reduced: 
@@ -127,22 +373,194 @@ def ACP_efficace(data, rule = "Kaiser"):
             Les k premiers vecteurs principaux permettant la reduction de la dimension des donnees.
     """
     
+    D_reduced, w_significatif = ACP_efficace_complete(data, rule, solveur, k, dtype, cache)[:2]
+    
+    return D_reduced, w_significatif
+
+@Profilage.etape
+def ACP_efficace_complete(data, rule = "Kaiser", solveur = "eigh", k = None, dtype = np.float64, cache = None):
+    """ 
+    Realisation de l'ACP efficace selon le critere rule, en conservant tout ce qui est necessaire
+    pour projeter de nouvelles images sans refaire l'ACP (voir Modele.ModeleEigenfaces).
+    
+    Avec un solveur partiel, seuls k vecteurs sont calcules (10 pour le critere Coude, 32 sinon par defaut),
+    et k est double tant que le critere choisi en demande davantage.
+        
+    Entree:
+        data: 
+            La liste d'images correspondant a la gallery.
+            Une image est representee par un np array.
+        rule:
+            Le critere choisi pour selectionner les premiers vecteurs principaux (voir ACP_efficace).
+        solveur:
+            La methode de decomposition utilisee (voir Calc_valeurs_vecteurs_propres).
+        k:
+            Le nombre de vecteurs propres calcules en premier lieu par un solveur partiel.
+        dtype:
+            Le type flottant des calculs. Les images brutes (uint8) ne sont converties qu'au centrage,
+            et en np.float32 la matrice centree et la matrice de Gram occupent deux fois moins de memoire.
+        cache:
+            Le cache des decompositions (voir decomposition).
+    
+    Sortie:
+        D_reduced: 
+            Les donnees dont la dimension a ete reduites sur le sous-espaces engendre par les k premiers vecteurs principaux.
+        w_significatif:
+            Les k premiers vecteurs principaux permettant la reduction de la dimension des donnees.
+        mu:
+            Les valeurs propres associees a D.
+        moyenne:
+            Le visage d’un individu moyen de la gallery.
+    """
+    
     #Linéarisation et centralisation par rapport aux variables
-    D = transform_data(data)
+    #Les images sont linearisees dans leur type d'origine (uint8 pour des images brutes)
+    data_linear = linearisation(data, np.asarray(data[0]).dtype)
+    moyenne = data_linear.mean(axis = 0, dtype = np.float64)
+    D = np.subtract(data_linear, moyenne.astype(dtype), dtype = dtype)
     
     #Calcul des valeurs propres et vecteurs propres de D
-    mu, w_norm = Calc_valeurs_vecteurs_propres(D)
-    
-    #Selections des K vecteurs principaux
-    w_significatif = select_significatif_vectors(mu, w_norm, rule)
+    if solveur in SOLVEURS_PARTIELS:
+        #L'inertie totale est la trace de la covariance, connue sans decomposition
+        inertie_totale = np.einsum("ij,ij->", D, D)/(D.shape[0] -1)
+        rang_max = min(D.shape[0] -1, D.shape[1])
+        if k is None:
+            k = 10 if rule == "Coude" else 32
+        k = min(k, rang_max)
+        
+        mu, w_norm = decomposition(data_linear, D, solveur, k, cache)
+        w_significatif = select_significatif_vectors(mu, w_norm, rule, inertie_totale)
+        
+        #Le critere retient tous les vecteurs calcules : il en faut peut-etre davantage
+        while w_significatif.shape[1] == k and k < rang_max and rule != "Coude":
+            k = min(2*k, rang_max)
+            mu, w_norm = decomposition(data_linear, D, solveur, k, cache)
+            w_significatif = select_significatif_vectors(mu, w_norm, rule, inertie_totale)
+    else:
+        mu, w_norm = decomposition(data_linear, D, solveur, cache = cache)
+        
+        #Selections des K vecteurs principaux
+        w_significatif = select_significatif_vectors(mu, w_norm, rule)
     
     #Projection des données
     D_reduced = projection(D,w_significatif)
     
-    return D_reduced, w_significatif
+    return D_reduced, w_significatif, mu, moyenne
+
+def iter_lots(source, taille_lot):
+    """ 
+    Parcours d'une gallery par lots d'images linearisees, sans jamais la charger entierement en memoire.
+    
+    Entree:
+        source: 
+            La gallery d'images, sous toute forme indexable par tranches : liste, np array,
+            ou np array projete en memoire depuis le disque (np.load(..., mmap_mode = "r")).
+        taille_lot:
+            Le nombre d'images par lot.
+    
+    Sortie:
+        Un generateur des lots d'images linearisees, copiees en float64 (et donc modifiables sans alterer la source).
+    """
+    
+    for i in range(0, len(source), taille_lot):
+        yield linearisation(source[i:i + taille_lot]).astype(np.float64)
+
+@Profilage.etape
+def ACP_par_lots(source, rule = "Kaiser", k = None, taille_lot = 256, nb_iterations = 4, sur_echantillonnage = 10, seed = 0):
+    """ 
+    Realisation de l'ACP selon le critere rule sur une gallery lue par lots (voir iter_lots).
+    
+    Les k premiers vecteurs principaux sont obtenus par iterations de sous-espace sur la covariance,
+    chaque produit par la covariance etant accumule lot par lot : la memoire utilisee est bornee par
+    la taille d'un lot et par la base (p*p, k), et non par le nombre d'images.
+    Comme pour les solveurs partiels de ACP_efficace_complete, k est double tant que le critere en demande davantage.
+        
+    Entree:
+        source: 
+            La gallery d'images, indexable par tranches (voir iter_lots).
+        rule:
+            Le critere choisi pour selectionner les premiers vecteurs principaux (voir ACP_efficace).
+        k:
+            Le nombre de vecteurs propres calcules en premier lieu (10 pour le critere Coude, 32 sinon par defaut).
+        taille_lot:
+            Le nombre d'images lues a la fois.
+        nb_iterations:
+            Le nombre d'iterations de sous-espace.
+        sur_echantillonnage:
+            Le nombre de vecteurs supplementaires ameliorant la precision.
+        seed:
+            La graine du generateur aleatoire.
+    
+    Sortie:
+        D_reduced: 
+            Les donnees dont la dimension a ete reduites sur le sous-espaces engendre par les k premiers vecteurs principaux.
+        w_significatif:
+            Les k premiers vecteurs principaux permettant la reduction de la dimension des donnees.
+        mu:
+            Les k premieres valeurs propres associees a D.
+        moyenne:
+            Le visage d’un individu moyen de la gallery.
+    """
+    
+    #Premier passage : visage moyen
+    n = 0
+    somme = 0
+    for lot in iter_lots(source, taille_lot):
+        n += lot.shape[0]
+        somme = somme + lot.sum(axis = 0)
+    moyenne = somme/n
+    dim = moyenne.shape[0]
+    
+    #Deuxieme passage : inertie totale
+    inertie_totale = 0
+    for lot in iter_lots(source, taille_lot):
+        lot -= moyenne
+        inertie_totale += np.einsum("ij,ij->", lot, lot)
+    inertie_totale /= (n -1)
+    
+    rang_max = min(n -1, dim)
+    if k is None:
+        k = 10 if rule == "Coude" else 32
+    k = min(k, rang_max)
+    
+    while True:
+        l = min(k + sur_echantillonnage, rang_max)
+        Q = np.linalg.qr(np.random.default_rng(seed).standard_normal((dim, l)))[0]
+        
+        #Iterations de sous-espace : Q <- orth(D_t.D.Q)
+        for it in range(nb_iterations):
+            Y = np.zeros((dim, l))
+            for lot in iter_lots(source, taille_lot):
+                lot -= moyenne
+                Y += lot.transpose().dot(lot.dot(Q))
+            Q = np.linalg.qr(Y)[0]
+        
+        #Covariance restreinte au sous-espace engendre par Q
+        C = np.zeros((l, l))
+        for lot in iter_lots(source, taille_lot):
+            lot -= moyenne
+            P = lot.dot(Q)
+            C += P.transpose().dot(P)
+        values, vectors = np.linalg.eigh(C)
+        ordre = np.argsort(values)[::-1][:k]
+        mu = values[ordre]/(n -1)
+        w_norm = Q.dot(vectors[:, ordre])
+        
+        w_significatif = select_significatif_vectors(mu, w_norm, rule, inertie_totale)
+        
+        #Le critere retient tous les vecteurs calcules : il en faut peut-etre davantage
+        if w_significatif.shape[1] < k or k >= rang_max or rule == "Coude":
+            break
+        k = min(2*k, rang_max)
+    
+    #Dernier passage : projection des données
+    D_reduced = np.concatenate([projection(lot - moyenne, w_significatif) for lot in iter_lots(source, taille_lot)])
+    
+    return D_reduced, w_significatif, mu, moyenne
 
   
-def select_significatif_vectors(mu, w, rule = "Kaiser"):
+@Profilage.etape
+def select_significatif_vectors(mu, w, rule = "Kaiser", inertie_totale = None):
     """ 
     Retourne les k premiers vecteurs principaux selon le critere rule choisi.
         
@@ -156,20 +574,25 @@ def select_significatif_vectors(mu, w, rule = "Kaiser"):
             * Kaiser : Le critere de Kaiser est choisi pour selectionner les k premiers vecteurs principaux.
             * Inertia : Le critere d'inertie est choisi pour selectionner les k premiers vecteurs principaux.
             * Coude : Le critere d'eboulis des parts d’inertie est choisi pour selectionner les k premiers vecteurs principaux.
+        inertie_totale:
+            La somme de toutes les valeurs propres, a fournir lorsque mu ne contient que les premieres d'entre elles.
         
     Sortie:
         Les k premiers vecteurs principaux permettant la reduction de la dimension des donnees.
     """
     
+    if inertie_totale is None:
+        inertie_totale = np.sum(mu)
+    
     #Régle de Kaiser 
     #Les valeurs propres sont triés par ordre décroissant
     
     if rule == "Kaiser":
         index_significatif = []
         i = 0
-        Inertie_moy = (np.sum(mu)/w.shape[0])
+        Inertie_moy = (inertie_totale/w.shape[0])
         
-        while mu[i]>=Inertie_moy:
+        while i < len(mu) and mu[i]>=Inertie_moy:
             index_significatif.append(i)
             i+=1
             
@@ -179,9 +602,9 @@ def select_significatif_vectors(mu, w, rule = "Kaiser"):
     if rule == "Inertia":
         index_significatif = []
         i = 0
-        Inertie_tot = np.sum(mu)
+        Inertie_tot = inertie_totale
         
-        while np.sum(mu[:i])/Inertie_tot <= 0.8:
+        while i < len(mu) and np.sum(mu[:i])/Inertie_tot <= 0.8:
             index_significatif.append(i)
             i+=1
     
@@ -189,7 +612,7 @@ def select_significatif_vectors(mu, w, rule = "Kaiser"):
         index_significatif = []
         i = 0
         
-        while i < 10:
+        while i < min(10, len(mu)):
             index_significatif.append(i)
             i+=1
         
@@ -226,7 +649,7 @@ def retrieved_image(D, eigenvectors, moy):
 
     return data_linear
 
-def critere_coude(data, echelle):
+def critere_coude(data, echelle, cache = None):
     """ 
     Generation du graphique representant la part de l'inertie totale en % en fonction des k premiers vecteurs principaux.
     
@@ -236,13 +659,17 @@ def critere_coude(data, echelle):
             Une image est representee par un np array.
         echelle:
             Selectionne les k premiers vecteurs principaux.
+        cache:
+            Le cache des decompositions (voir decomposition).
          
     Sortie:
         Graphique representant la part de l'inertie totale en % en fonction du nombre de premiers vecteurs principaux k.
     """
     
-    D = transform_data(data)
-    mu = Calc_valeurs_vecteurs_propres(D)[0]
+    #Meme linearisation et centrage que ACP_efficace_complete, pour reutiliser sa decomposition (voir decomposition)
+    data_linear = linearisation(data, np.asarray(data[0]).dtype)
+    D = data_linear - data_linear.mean(axis = 0)
+    mu = decomposition(data_linear, D, cache = cache)[0]
 
     mu_Inertie = (mu/np.sum(mu))*100
     
@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+"""
+Binome : DELECLUSE Raphael, CEUNINCK Guillaume
+"""
+
+import time
+import numpy as np
+import NN_brute_force as NN_BF
+import Metrics as Mt
+import Verification
+
+METHODES = ("centroide", "medoides", "covariance")
+
+def medoides_identites(data, debuts, nb_medoides = 3):
+    """ 
+    Resume chaque individu par quelques medoides, choisis de maniere gloutonne (phase de construction de PAM) :
+    le premier est l'image minimisant la somme des distances aux autres images de l'individu, chaque suivant
+    est celui qui reduit le plus la somme des distances de chaque image a son medoide le plus proche.
+    
+    Entree:
+        data:
+            La gallery reduite, triee par individu.
+        debuts:
+            Le np array tel que les images de l'individu i soient data[debuts[i]:debuts[i+1]].
+        nb_medoides:
+            Le nombre maximal de medoides par individu.
+    
+    Sortie:
+        medoides:
+            Le np array des medoides, tries par individu.
+        proprietaires:
+            Le np array de l'individu de chaque medoide.
+        rayons:
+            Le np array de la distance (non elevee au carre) maximale entre chaque medoide et les images qui lui sont rattachees.
+    """
+    
+    medoides, proprietaires, rayons = [], [], []
+    for i in range(len(debuts) - 1):
+        images = data[debuts[i]:debuts[i + 1]]
+        distances = np.sqrt(NN_BF.batch_euclidean_distances(images, images))
+        
+        choisis = [int(np.argmin(distances.sum(axis = 1)))]
+        plus_proche = distances[choisis[0]]
+        while len(choisis) < min(nb_medoides, len(images)):
+            couts = np.minimum(plus_proche[None, :], distances).sum(axis = 1)
+            couts[choisis] = np.inf
+            choisis.append(int(np.argmin(couts)))
+            plus_proche = np.minimum(plus_proche, distances[choisis[-1]])
+        
+        rattachement = np.argmin(distances[choisis], axis = 0)
+        for j, choisi in enumerate(choisis):
+            medoides.append(images[choisi])
+            proprietaires.append(i)
+            rayons.append(distances[choisi][rattachement == j].max())
+    
+    return np.array(medoides).reshape(-1, data.shape[1]), np.array(proprietaires, dtype = np.int64), np.array(rayons)
+
+def variances_identites(data, debuts, centroides, regularisation = 1.0):
+    """ 
+    Variance de chaque composante pour chaque individu, ramenee vers la variance de toute la gallery
+    (les individus n'ont que quelques images) : v = (n_i.v_i + regularisation.v_gallery)/(n_i + regularisation).
+    
+    Entree:
+        data:
+            La gallery reduite, triee par individu.
+        debuts:
+            Le np array tel que les images de l'individu i soient data[debuts[i]:debuts[i+1]].
+        centroides:
+            Le np array des centroides des individus.
+        regularisation:
+            Le poids, en nombre d'images, de la variance de la gallery.
+    
+    Sortie:
+        Le np array de taille (nb individus, k) des variances.
+    """
+    
+    effectifs = np.diff(debuts)
+    ecarts = (data - np.repeat(centroides, effectifs, axis = 0))**2
+    sommes = np.add.reduceat(ecarts, debuts[:-1], axis = 0) if len(data) > 0 else np.zeros(centroides.shape)
+    variance_gallery = np.maximum(data.var(axis = 0), 1e-12) if len(data) > 0 else np.ones(centroides.shape[1])
+    return (sommes + regularisation*variance_gallery)/(effectifs + regularisation)[:, None]
+
+class GalleryGabarits:
+    """ 
+    Gallery compactee : chaque individu est resume par un ou plusieurs gabarits, et la recherche se fait en deux etages,
+    respectant le meme contrat que NN_brute_force (radius_search, NN_search).
+    
+    Premier etage, grossier : la requete n'est comparee qu'aux gabarits, dont le nombre depend du nombre d'individus
+    et non du nombre d'images par individu.
+    * centroide : le centroide de l'individu (voir Verification.centroides_identites) ;
+    * medoides : quelques images representatives de l'individu (voir medoides_identites) ;
+    * covariance : le centroide, compare par une distance de Mahalanobis diagonale propre a l'individu (voir variances_identites).
+    Chaque gabarit garde le rayon de la boule couvrant ses images : par l'inegalite triangulaire, aucune image d'un individu
+    n'est dans le rayon r si (distance au gabarit - rayon)² > r pour tous ses gabarits.
+    
+    Second etage, exact : les images des seuls individus retenus sont comparees a la requete. Sans nb_candidats, tous les
+    individus que l'inegalite triangulaire n'exclut pas sont retenus, et les voisins sont ceux de la force brute ;
+    avec nb_candidats, seuls les nb_candidats individus les mieux classes par le premier etage le sont.
+    """
+    
+    def __init__(self, D, data_names, methode = "centroide", nb_medoides = 3, nb_candidats = None, regularisation = 1.0):
+        """ 
+        Entree:
+            D:
+                La gallery reduite, de taille (n, k) (voir Eigenfaces.ACP_efficace).
+            data_names:
+                La liste contenant les noms de chaque image de la gallery.
+                Un nom est formate sous la forme X.Y
+            methode:
+                Le type de gabarit (voir METHODES).
+            nb_medoides:
+                Le nombre maximal de medoides par individu (methode medoides).
+            nb_candidats:
+                Le nombre maximal d'individus examines par le second etage, None pour une recherche exacte.
+            regularisation:
+                Le poids de la variance de la gallery dans celle de chaque individu (methode covariance).
+        """
+        
+        if methode not in METHODES:
+            raise ValueError("Methode de gabarit inconnue : " + str(methode))
+        
+        D = NN_BF.as_matrix(D)
+        self.methode = methode
+        self.nb_candidats = nb_candidats
+        self.identites, self.ordre, self.debuts, centroides, rayons = Verification.centroides_identites(D, data_names)
+        self.data = D[self.ordre]
+        self.norms = NN_BF.squared_norms(self.data)
+        self.ids = np.repeat(np.arange(len(self.identites)), np.diff(self.debuts))
+        
+        if methode == "medoides":
+            self.gabarits, self.proprietaires, self.rayons = medoides_identites(self.data, self.debuts, nb_medoides)
+        else:
+            self.gabarits, self.proprietaires, self.rayons = centroides, np.arange(len(self.identites)), rayons
+        #Les gabarits de l'individu i sont gabarits[debuts_gabarits[i]:debuts_gabarits[i+1]]
+        self.debuts_gabarits = np.searchsorted(self.proprietaires, np.arange(len(self.identites) + 1))
+        
+        if methode == "covariance":
+            self.variances = variances_identites(self.data, self.debuts, centroides, regularisation)
+    
+    def taux_compaction(self):
+        """ 
+        Retourne le nombre de gabarits rapporte au nombre d'images de la gallery.
+        """
+        
+        return len(self.gabarits)/max(len(self.data), 1)
+    
+    def _par_identite(self, valeurs):
+        #Minimum, pour chaque individu, des valeurs de ses gabarits
+        return np.minimum.reduceat(valeurs, self.debuts_gabarits[:-1], axis = 1)
+    
+    def scores(self, queries):
+        """ 
+        Premier etage : score de chaque individu pour chaque requete, le plus petit etant le meilleur.
+        Distance au carre au gabarit le plus proche, ou distance de Mahalanobis diagonale pour la methode covariance.
+        
+        Entree:
+            queries:
+                La liste des requetes reduites.
+        
+        Sortie:
+            Le np array de taille (nb requetes, nb individus) des scores.
+        """
+        
+        queries = NN_BF.as_matrix(queries)
+        if self.methode == "covariance":
+            inverses = 1/self.variances
+            scores = (queries**2).dot(inverses.T) - 2*queries.dot((self.gabarits*inverses).T)
+            scores += np.sum(self.gabarits**2*inverses, axis = 1)
+            return np.maximum(scores, 0)
+        return self._par_identite(NN_BF.batch_euclidean_distances(self.gabarits, queries))
+    
+    def _exact(self, q, individus):
+        positions = np.concatenate([np.zeros(0, dtype = np.int64)] + [np.arange(self.debuts[i], self.debuts[i + 1]) for i in individus])
+        distances = np.maximum(self.norms[positions] + np.dot(q, q) - 2*self.data[positions].dot(q), 0)
+        return positions, distances
+    
+    def _meilleurs(self, scores, individus):
+        if self.nb_candidats is None or len(individus) <= self.nb_candidats:
+            return individus
+        return individus[np.argpartition(scores[individus], self.nb_candidats - 1)[:self.nb_candidats]]
+    
+    def NN_search(self, queries, r):
+        """ 
+        Retourne la liste des indices des plus proches voisins sur l'ensemble des requetes, dont la distance est inferieure au rayon r.
+        
+        Entree:
+            queries:
+                La liste des requetes.
+                Une image est representee par un np array.
+            r:
+                Le rayon delimitant la distance maximale requise pour etre considere comme l'un des plus proches voisins.
+        
+        Sortie:
+            indices:
+                La liste des indices des plus proches voisins sur l'ensemble des requetes, selon r.
+        """
+        
+        queries = NN_BF.as_matrix(queries)
+        scores = self.scores(queries)
+        distances_gabarits = np.sqrt(NN_BF.batch_euclidean_distances(self.gabarits, queries))
+        #Marge pour ne jamais ecarter un individu a cause des arrondis
+        bornes = self._par_identite(np.maximum(distances_gabarits - self.rayons, 0)**2)
+        
+        indices = []
+        for q, score, borne in zip(queries, scores, bornes):
+            individus = self._meilleurs(score, np.flatnonzero(borne <= r*(1 + 1e-9) + 1e-9))
+            positions, distances = self._exact(q, individus)
+            indices.append(np.sort(self.ordre[positions[distances <= r]]))
+        return indices
+    
+    def radius_search(self, q, r):
+        """ 
+        Retourne la liste des indices des plus proches voisins de la requete q dont la distance est inferieure au rayon r.
+        """
+        
+        return self.NN_search([q], r)[0]
+    
+    def _ids_requetes(self, names):
+        cles = np.array([name.split(".")[0] for name in names])
+        positions = np.minimum(np.searchsorted(self.identites, cles), max(len(self.identites) - 1, 0))
+        connues = len(self.identites) > 0
+        return np.where(connues & (self.identites[positions] == cles), positions, -1) if len(cles) > 0 else np.zeros(0, dtype = np.int64)
+    
+    def distances_minimales(self, names, probes, gabarits_seuls = False):
+        """ 
+        Equivalent de Metrics.distances_minimales pour la recherche en deux etages : la distance de chaque requete a l'image
+        la plus proche parmi les individus retenus par le premier etage, et a l'image la plus proche de son individu
+        si celui-ci est retenu (inf sinon).
+        
+        Entree:
+            names:
+                La liste contenant les noms de chaque requete.
+                Un nom est formate sous la forme X.Y
+            probes:
+                La liste des requetes reduites.
+            gabarits_seuls:
+                Si True, la gallery est remplacee par ses gabarits : les distances sont les scores du premier etage.
+        
+        Sortie:
+            d_min:
+                Le np array de la distance de chaque requete a l'image (ou au gabarit) le plus proche.
+            d_meme:
+                Le np array de la distance de chaque requete a l'image (ou au gabarit) le plus proche du meme individu.
+        """
+        
+        probes = NN_BF.as_matrix(probes)
+        ids_probes = self._ids_requetes(names)
+        scores = self.scores(probes)
+        d_min = np.full(len(probes), np.inf)
+        d_meme = np.full(len(probes), np.inf)
+        
+        if gabarits_seuls:
+            if scores.shape[1] > 0:
+                d_min = scores.min(axis = 1)
+            connues = ids_probes >= 0
+            d_meme[connues] = scores[np.flatnonzero(connues), ids_probes[connues]]
+            return d_min, d_meme
+        
+        for j, q in enumerate(probes):
+            positions, distances = self._exact(q, self._meilleurs(scores[j], np.arange(len(self.identites))))
+            if len(positions) > 0:
+                d_min[j] = distances.min()
+                meme = self.ids[positions] == ids_probes[j]
+                if meme.any():
+                    d_meme[j] = distances[meme].min()
+        return d_min, d_meme
+
+def comparaison_gabarits(D_reduced, data_names, names_known, names_unknown, probes_known_reduced, probes_unknown_reduced,
+                         methodes = METHODES, nb_candidats = 5, nb_radius = 1000, tracer = True):
+    """ 
+    Compare la gallery complete aux gallery compactees : pour chaque methode, la recherche sur les seuls gabarits
+    et la recherche en deux etages limitee a nb_candidats individus. Les metriques de chaque variante sont calculees
+    pour nb_radius radius (voir Metrics.metriques_balayage), et les courbes de ROC de trace_metrics superposees.
+    
+    Entree:
+        D_reduced, data_names, names_known, names_unknown, probes_known_reduced, probes_unknown_reduced:
+            La gallery reduite et les requetes reduites (voir Metrics.evaluation).
+        methodes:
+            Les types de gabarit compares.
+        nb_candidats:
+            Le nombre d'individus examines par le second etage.
+        nb_radius:
+            Le nombre de radius testes, de 0 a la plus grande distance minimale obtenue.
+        tracer:
+            Si True, les courbes de ROC sont tracees (voir Metrics.trace_roc_comparees).
+    
+    Sortie:
+        Le dictionnaire associant a chaque variante son np array de metriques (voir Metrics.evaluation).
+    """
+    
+    ids_data, ids_known, ids_unknown = Mt.identites_entieres(data_names, names_known, names_unknown)
+    
+    def metriques(recherche):
+        startTime = time.time()
+        d_min_known, d_meme_known, d_min_unknown = recherche()
+        tps_de_recherche = time.time() - startTime
+        radius = np.linspace(0, max(d_min_known.max(), d_min_unknown.max()), nb_radius)
+        return np.array(Mt.metriques_balayage(d_min_known, d_meme_known, d_min_unknown, radius, tps_de_recherche))
+    
+    res = {"force brute": metriques(lambda: Mt.distances_minimales(D_reduced, ids_data, ids_known, probes_known_reduced)
+                                    + (Mt.distances_minimales(D_reduced, ids_data, ids_unknown, probes_unknown_reduced)[0],))}
+    print("%-32s %5d lignes  aire ROC %.4f  recherche %.4f s" % ("force brute", len(D_reduced), Mt.aire_roc(res["force brute"]), res["force brute"][0,5]))
+    
+    for methode in methodes:
+        gallery = GalleryGabarits(D_reduced, data_names, methode, nb_candidats = nb_candidats)
+        for gabarits_seuls in (True, False):
+            nom = methode + (" (gabarits seuls)" if gabarits_seuls else " (deux etages)")
+            res[nom] = metriques(lambda: gallery.distances_minimales(names_known, probes_known_reduced, gabarits_seuls)
+                                 + (gallery.distances_minimales(names_unknown, probes_unknown_reduced, gabarits_seuls)[0],))
+            print("%-32s %5d lignes  aire ROC %.4f  recherche %.4f s" % (nom, len(gallery.gabarits), Mt.aire_roc(res[nom]), res[nom][0,5]))
+    
+    if tracer:
+        Mt.trace_roc_comparees(res)
+    return res
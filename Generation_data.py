@@ -7,11 +7,15 @@ source :
 """
 
 import os
+import time
 import matplotlib.pyplot as plt
-import random
 import numpy as np
+import Stockage
+import Profilage
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 
+@Profilage.etape
 def load_images_from_folder(folder):
     """ 
     Chargement des images et noms d'images contenues dans un dossier.
@@ -36,20 +40,149 @@ def load_images_from_folder(folder):
             database_names.append(filename.replace('.jpg', ''))
     return database, database_names
 
-def generation_data(database, database_names, nb_probes = 100):
+def _decoder_paquet(folder, paquet):
+    """ 
+    Decodage d'un paquet d'images, execute dans un processus du pool de load_images_parallel.
+    
+    Entree:
+        folder: Le dossier contenant les images.
+        paquet: La liste des couples (position, nom de fichier) a decoder.
+    
+    Sortie:
+        La liste des couples (position, image decodee).
+    """
+    return [(i, plt.imread(os.path.join(folder, filename))) for i, filename in paquet]
+
+@Profilage.etape
+def load_images_parallel(folder, nb_processus = None, chemin_memmap = None, taille_paquet = 32, verbose = True):
+    """ 
+    Chargement des images et noms d'images contenues dans un dossier, decodees en parallele par un pool de processus.
+    Les images sont ecrites au fur et a mesure de leur decodage dans un np array contigu de taille (n, p, p),
+    alloue une fois pour toutes, ou dans un fichier .npy projete en memoire.
+    Toutes les images doivent avoir la meme taille que la premiere.
+    
+    Entree:
+        folder: Le dossier contenant les images a charger.
+        nb_processus: Le nombre de processus decodant les images, par defaut le nombre de coeurs.
+        chemin_memmap: Si renseigne, le fichier .npy dans lequel ecrire les images (relisible par np.load(..., mmap_mode = "r")).
+        taille_paquet: Le nombre d'images decodees par tache envoyee a un processus.
+        verbose: Si True, affiche le debit de decodage en images par seconde.
+    
+    Sortie:
+        database: 
+            Le np array de taille (n, p, p) contenant chaque image initialement dans folder, dans l'ordre de os.listdir.
+        database_names: 
+            La liste contenant les noms de chaque image initialement dans folder.
+            Un nom est formate sous la forme X.Y.jpg 
+	"""
+    
+    startTime = time.time()
+    filenames = os.listdir(folder)
+    database_names = [filename.replace('.jpg', '') for filename in filenames]
+    
+    #La premiere image fixe la taille et le type du tableau
+    premiere = plt.imread(os.path.join(folder, filenames[0]))
+    forme = (len(filenames),) + premiere.shape
+    if chemin_memmap is None:
+        database = np.empty(forme, dtype = premiere.dtype)
+    else:
+        database = np.lib.format.open_memmap(chemin_memmap, mode = 'w+', dtype = premiere.dtype, shape = forme)
+    database[0] = premiere
+    
+    a_decoder = list(enumerate(filenames))[1:]
+    paquets = [a_decoder[i:i + taille_paquet] for i in range(0, len(a_decoder), taille_paquet)]
+    with ProcessPoolExecutor(max_workers = nb_processus) as pool:
+        #Chaque paquet est recopie dans le tableau des qu'il est decode
+        for future in as_completed([pool.submit(_decoder_paquet, folder, paquet) for paquet in paquets]):
+            for i, img in future.result():
+                database[i] = img
+    
+    if chemin_memmap is not None:
+        database.flush()
+    
+    if verbose:
+        duree = time.time() - startTime
+        print("%d images chargees en %.2f s (%.0f images/s)" % (len(filenames), duree, len(filenames)/duree))
+    
+    return database, database_names
+
+def index_identites(database_names):
+    """ 
+    Associe a chaque image l'indice entier de son identite, en une seule passe sur les noms.
+    L'identite est la partie X du nom X.Y, comparee exactement (et non par inclusion).
+    
+    Entree:
+        database_names:
+            La liste contenant les noms de chaque image.
+            Un nom est formate sous la forme X.Y
+    
+    Sortie:
+        identites:
+            Le np array des identites X distinctes.
+        ids:
+            Le np array de l'indice dans identites de chaque image.
+    """
+    
+    return np.unique([name.split(".")[0] for name in database_names], return_inverse = True)
+
+def _selection(database, indices):
+    """ 
+    Selection des elements d'indices donnes, en conservant le type de database (liste ou np array).
+    """
+    
+    if isinstance(database, np.ndarray):
+        return database[indices]
+    return [database[i] for i in indices]
+
+def _decoupage(database, database_names, inconnues, connues, masque_gallery):
+    """ 
+    Constitution des ensembles a partir des indices des requetes inconnues et connues et du masque de la gallery.
+    """
+    
+    gallery = np.flatnonzero(masque_gallery)
+    return (_selection(database, gallery), _selection(database_names, gallery),
+            _selection(database, inconnues), _selection(database_names, inconnues),
+            _selection(database, connues), _selection(database_names, connues))
+
+def _tirage_connues(rng, ids, masque_gallery, nb_probes):
+    """ 
+    Tirage sans remise des requetes connues parmi les images de la gallery, en laissant au moins une image
+    de chaque identite dans la gallery : une requete connue a toujours une image de la meme personne dans la gallery.
+    Les requetes tirees sont retirees du masque de la gallery.
+    """
+    
+    candidates = rng.permutation(np.flatnonzero(masque_gallery))
+    #La premiere image de chaque identite dans l'ordre aleatoire reste dans la gallery
+    gardees = np.unique(ids[candidates], return_index = True)[1]
+    candidates = np.delete(candidates, gardees)
+    if nb_probes > len(candidates):
+        raise ValueError("Pas assez d'images pour tirer %d requetes connues" % nb_probes)
+    connues = rng.choice(candidates, nb_probes, replace = False)
+    masque_gallery[connues] = False
+    return connues
+
+@Profilage.etape
+def generation_data(database, database_names, nb_probes = 100, seed = None):
     """ 
     Generation de la gallery, des requetes connues et inconnues, 
     ainsi que les noms associes pour constituer la verite terrain. 
     
+    Les requetes inconnues sont tirees image par image parmi les identites restantes, chaque tirage retirant
+    toutes les images de l'identite de la gallery ; les requetes connues sont ensuite tirees sans remise
+    parmi les images restantes, en laissant au moins une image de chaque identite dans la gallery.
+    Le decoupage est lineaire en le nombre d'images.
+    
     Entree:
         database: 
-            La liste contenant chaque image initialement dans folder.
+            La liste ou le np array contenant chaque image initialement dans folder.
             Une image est representee par un np array.
         database_names:
             La liste contenant les noms de chaque image initialement dans folder.
             Un nom est formate sous la forme X.Y.jpg
         nb_probes:
             Le nombre de requêtes connues et inconnues desire.
+        seed:
+            La graine du generateur aleatoire, pour un decoupage reproductible.
     
     Sortie:
         data:
@@ -72,31 +205,83 @@ def generation_data(database, database_names, nb_probes = 100):
             Un nom est formate sous la forme X.Y
 	"""
     
-    data = database.copy()
-    data_names = database_names.copy()
-    probes_unknown, names_unknown, probes_known, names_known = [], [], [], []
+    rng = np.random.default_rng(seed)
+    ids = index_identites(database_names)[1]
     
-    for i in range(nb_probes):
-        integer = random.randint(0, len(data)-1)
-        probes_unknown.append(data[integer])
-        names_unknown.append(data_names[integer])
-        
-        indices = [i for i, elem in enumerate(data_names) if data_names[integer].split(".")[0] in elem]
-        
-        for y in range(len(indices)):
-            data.pop(indices[0])
-            data_names.pop(indices[0])
-            
-    for j in range(nb_probes):
-        integer = random.randint(0, len(data)-1)
-        probes_known.append(data[integer])
-        names_known.append(data_names[integer])
-        data.pop(integer)
-        data_names.pop(integer)
+    #Parcourir les images dans un ordre aleatoire et garder la premiere image de chaque identite
+    #revient a tirer successivement une image parmi les identites non encore tirees
+    permutation = rng.permutation(len(ids))
+    premieres = np.sort(np.unique(ids[permutation], return_index = True)[1])[:nb_probes]
+    inconnues = permutation[premieres]
+    
+    masque_gallery = ~np.isin(ids, ids[inconnues])
+    connues = _tirage_connues(rng, ids, masque_gallery, nb_probes)
+    
+    return _decoupage(database, database_names, inconnues, connues, masque_gallery)
 
-    return data, data_names, probes_unknown, names_unknown, probes_known, names_known
+def generation_repetee(database, database_names, nb_repetitions, nb_probes = 100, seed = None):
+    """ 
+    Generation de plusieurs decoupages independants (voir generation_data), reproductibles a partir d'une seule graine.
+    
+    Entree:
+        database: 
+            La liste ou le np array contenant chaque image initialement dans folder.
+        database_names:
+            La liste contenant les noms de chaque image initialement dans folder.
+        nb_repetitions:
+            Le nombre de decoupages.
+        nb_probes:
+            Le nombre de requêtes connues et inconnues desire.
+        seed:
+            La graine du generateur aleatoire.
+    
+    Sortie:
+        Un generateur des decoupages, chacun sous la forme retournee par generation_data.
+    """
+    
+    for graine in np.random.SeedSequence(seed).spawn(nb_repetitions):
+        yield generation_data(database, database_names, nb_probes, graine)
 
+def generation_kfold(database, database_names, k = 5, nb_probes = 100, seed = None):
+    """ 
+    Generation de k decoupages ou les identites sont reparties en k groupes disjoints :
+    au i-eme decoupage, les identites du groupe i sont inconnues (une requete par identite, au plus nb_probes)
+    et toutes leurs images sont retirees de la gallery. Chaque identite est ainsi inconnue exactement une fois.
+    
+    Entree:
+        database: 
+            La liste ou le np array contenant chaque image initialement dans folder.
+        database_names:
+            La liste contenant les noms de chaque image initialement dans folder.
+        k:
+            Le nombre de groupes d'identites.
+        nb_probes:
+            Le nombre de requêtes connues et le nombre maximal de requetes inconnues.
+        seed:
+            La graine du generateur aleatoire.
+    
+    Sortie:
+        Un generateur des k decoupages, chacun sous la forme retournee par generation_data.
+    """
+    
+    rng = np.random.default_rng(seed)
+    identites, ids = index_identites(database_names)
+    groupes = np.array_split(rng.permutation(len(identites)), k)
+    
+    #Une image tiree au hasard par identite
+    permutation = rng.permutation(len(ids))
+    une_par_identite = np.empty(len(identites), dtype = np.int64)
+    une_par_identite[ids[permutation]] = permutation
+    
+    for groupe in groupes:
+        inconnues = une_par_identite[groupe[:nb_probes]]
+        masque_gallery = ~np.isin(ids, groupe)
+        connues = _tirage_connues(rng, ids, masque_gallery, nb_probes)
+        
+        yield _decoupage(database, database_names, inconnues, connues, masque_gallery)
 
+
+@Profilage.etape
 def save_data(data, data_names, probes_unknown, names_unknown, probes_known, names_known):
     """ 
     Sauvegarde des informations de la gallery, des requetes connues et inconnues
@@ -122,26 +307,24 @@ def save_data(data, data_names, probes_unknown, names_unknown, probes_known, nam
             Un nom est formate sous la forme X.Y
     
     Sortie:
-        data.npy: 
-            Le fichier contenant un np array de la gallery et des noms de chaque image associees.
-        unknown.npy: 
-            Le fichier contenant un np array des requetes inconnues et des noms de chaque image associees. 
-        known.npy:
-            Le fichier contenant un np array des requetes connues et des noms de chaque image associees. 
+        data.gal: 
+            Le fichier contenant la gallery et les noms de chaque image associees (voir Stockage.ecrire_gallery).
+        unknown.gal: 
+            Le fichier contenant les requetes inconnues et les noms de chaque image associees. 
+        known.gal:
+            Le fichier contenant les requetes connues et les noms de chaque image associees. 
 	"""
     
-    with open('data_npy/data.npy', 'wb') as f:
-        np.save(f, np.array([data, data_names]))
-        
-    with open('data_npy/unknown.npy', 'wb') as f:
-        np.save(f, np.array([probes_unknown, names_unknown]))
-        
-    with open('data_npy/known.npy', 'wb') as f:
-        np.save(f, np.array([probes_known, names_known]))
-        
+    Stockage.ecrire_gallery('data_npy/data.gal', data, data_names)
+    Stockage.ecrire_gallery('data_npy/unknown.gal', probes_unknown, names_unknown)
+    Stockage.ecrire_gallery('data_npy/known.gal', probes_known, names_known)
+
+@Profilage.etape
 def load_data():
     """ 
     Chargement des informations de la gallery, des requetes connues et inconnues.
+    Les images sont projetees en memoire depuis les fichiers .gal, sans copie.
+    Les anciens fichiers .npy peuvent etre convertis par Stockage.convertir_dossier.
     
     Sortie:
         data:
@@ -163,17 +346,10 @@ def load_data():
             La liste contenant les noms de chaque requetes supposees connues.
             Un nom est formate sous la forme X.Y
     """
-    with open('data_npy/data.npy', 'rb') as f:
-        temp = np.load(f,  allow_pickle=True)
-        data = temp[0]
-        data_names = temp[1]
-    with open('data_npy/unknown.npy', 'rb') as f:
-        temp = np.load(f,  allow_pickle=True)
-        probes_unknown = temp[0]
-        names_unknown = temp[1]
-    with open('data_npy/known.npy', 'rb') as f:
-        temp = np.load(f,  allow_pickle=True)
-        probes_known = temp[0]
-        names_known = temp[1]
-        
+    donnees = []
+    for nom in ('data', 'unknown', 'known'):
+        images, identites, etiquettes, echantillons = Stockage.lire_gallery('data_npy/' + nom + '.gal')
+        donnees += [images, Stockage.reconstruire_noms(identites, etiquettes, echantillons)]
+    data, data_names, probes_unknown, names_unknown, probes_known, names_known = donnees
+    
     return data, data_names, probes_unknown, names_unknown, probes_known, names_known
\ No newline at end of file
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+Binome : DELECLUSE Raphael, CEUNINCK Guillaume
+"""
+
+import numpy as np
+import NN_brute_force as NN_BF
+
+def plus_proches_centres(centres, data):
+    """ 
+    Affecte chaque donnee au centre le plus proche, par tuiles (voir NN_brute_force.distance_tiles).
+    
+    Entree:
+        centres:
+            Le np array de taille (k, dim) des centres.
+        data:
+            Le np array de taille (n, dim) des donnees.
+    
+    Sortie:
+        Le np array de l'indice du centre le plus proche de chaque donnee.
+    """
+    
+    meilleures = np.full(len(data), np.inf)
+    affectation = np.zeros(len(data), dtype = np.int64)
+    for lignes, colonnes, tuile in NN_BF.distance_tiles(centres, data):
+        argmin = np.argmin(tuile, axis = 1)
+        minimum = tuile[np.arange(len(tuile)), argmin]
+        meilleur = minimum < meilleures[lignes]
+        affectation[lignes][meilleur] = argmin[meilleur] + colonnes.start
+        meilleures[lignes][meilleur] = minimum[meilleur]
+    return affectation
+
+def kmeans(data, k, nb_iterations = 10, seed = 0):
+    """ 
+    Partitionnement des donnees en k groupes par l'algorithme de Lloyd.
+    
+    Entree:
+        data:
+            Le np array de taille (n, dim) des donnees.
+        k:
+            Le nombre de groupes.
+        nb_iterations:
+            Le nombre d'iterations de l'algorithme.
+        seed:
+            La graine du generateur aleatoire choisissant les centres initiaux.
+    
+    Sortie:
+        centres:
+            Le np array de taille (k, dim) des centres des groupes.
+        affectation:
+            Le np array du groupe de chaque donnee.
+    """
+    
+    data = NN_BF.as_matrix(data)
+    rng = np.random.default_rng(seed)
+    centres = data[rng.choice(len(data), k, replace = False)]
+    
+    for i in range(nb_iterations + 1):
+        affectation = plus_proches_centres(centres, data)
+        if i == nb_iterations:
+            break
+        
+        effectifs = np.bincount(affectation, minlength = k)
+        sommes = np.zeros(centres.shape)
+        np.add.at(sommes, affectation, data)
+        #Un groupe vide garde son centre precedent
+        non_vides = effectifs > 0
+        centres[non_vides] = sommes[non_vides]/effectifs[non_vides, None]
+    
+    return centres, affectation
+
+class IndexIVF:
+    """ 
+    Index approche par listes inversees (IVF), respectant le meme contrat que NN_brute_force
+    (radius_search, NN_search) et Index_arbre.KDTree (existe).
+    
+    La gallery est partitionnee par k-means en nb_listes groupes. Une requete n'est comparee
+    qu'aux images des nb_sondes groupes dont les centres sont les plus proches : les voisins retournes
+    sont exacts, mais des voisins situes dans les autres groupes peuvent etre manques.
+    Augmenter nb_sondes ameliore le rappel au prix du temps de recherche (nb_sondes = nb_listes equivaut a la force brute).
+    """
+    
+    def __init__(self, data, nb_listes = None, nb_sondes = 8, nb_iterations = 10, seed = 0):
+        """ 
+        Construction de l'index.
+        
+        Entree:
+            data:
+                La liste ou la gallery d'images, de preference reduite.
+                Une image est representee par un np array.
+            nb_listes:
+                Le nombre de groupes, par defaut la racine carree du nombre d'images.
+            nb_sondes:
+                Le nombre de groupes parcourus par requete.
+            nb_iterations:
+                Le nombre d'iterations du k-means.
+            seed:
+                La graine du generateur aleatoire.
+        """
+        
+        data = NN_BF.as_matrix(data)
+        if nb_listes is None:
+            nb_listes = max(1, int(np.sqrt(len(data))))
+        self.nb_sondes = nb_sondes
+        self.centres, affectation = kmeans(data, nb_listes, nb_iterations, seed)
+        
+        #Gallery reordonnee par groupe : le groupe i occupe la tranche debuts[i]:debuts[i+1]
+        self.ordre = np.argsort(affectation, kind = "stable")
+        self.debuts = np.concatenate(([0], np.cumsum(np.bincount(affectation, minlength = nb_listes))))
+        self.data = data[self.ordre]
+        self.norms = NN_BF.squared_norms(self.data)
+    
+    def _listes_sondees(self, distances_centres):
+        nb_sondes = min(self.nb_sondes, len(self.centres))
+        return np.argpartition(distances_centres, nb_sondes - 1)[:nb_sondes]
+    
+    def _recherche(self, q, r, listes):
+        positions = np.concatenate([np.arange(self.debuts[l], self.debuts[l + 1]) for l in listes])
+        distances = np.maximum(self.norms[positions] + np.dot(q, q) - 2*self.data[positions].dot(q), 0)
+        return np.sort(self.ordre[positions[distances <= r]])
+    
+    def radius_search(self, q, r):
+        """ 
+        Retourne la liste des indices des plus proches voisins de la requete q dont la distance est inferieure au rayon r,
+        parmi les groupes sondes.
+        
+        Entree:
+            q:
+                La requete.
+                Une image est representee par un np array.
+            r:
+                Le rayon delimitant la distance maximale requise pour etre considere comme l'un des plus proches voisins.
+        
+        Sortie:
+            indices:
+                La liste triee des indices plus proches voisins trouves de la requete q selon r.
+        """
+        
+        return self.NN_search([q], r)[0]
+    
+    def NN_search(self, queries, r):
+        """ 
+        Retourne la liste des indices des plus proches voisins sur l'ensemble des requetes, dont la distance est inferieure au rayon r,
+        parmi les groupes sondes.
+        
+        Entree:
+            queries:
+                La liste des requetes.
+                Une image est representee par un np array.
+            r:
+                Le rayon delimitant la distance maximale requise pour etre considere comme l'un des plus proches voisins.
+        
+        Sortie:
+            indices:
+                La liste des indices des plus proches voisins trouves sur l'ensemble des requetes, selon r.
+        """
+        
+        queries = NN_BF.as_matrix(queries)
+        distances_centres = NN_BF.batch_euclidean_distances(self.centres, queries)
+        return [self._recherche(q, r, self._listes_sondees(d)) for q, d in zip(queries, distances_centres)]
+    
+    def existe(self, q, r):
+        """ 
+        Indique si au moins une image des groupes sondes est a une distance inferieure au rayon r de la requete q.
+        Les groupes sont parcourus du plus proche au plus eloigne et le parcours s'arrete au premier voisin trouve.
+        
+        Entree:
+            q:
+                La requete.
+                Une image est representee par un np array.
+            r:
+                Le rayon delimitant la distance maximale requise pour etre considere comme l'un des plus proches voisins.
+        
+        Sortie:
+            True si un voisin est trouve.
+        """
+        
+        q = np.ravel(q).astype(np.float64)
+        distances_centres = NN_BF.euclidean_distances(self.centres, q)
+        listes = self._listes_sondees(distances_centres)
+        for l in listes[np.argsort(distances_centres[listes])]:
+            if len(self._recherche(q, r, [l])) > 0:
+                return True
+        return False
+
+def rappel_recherche(indices_exacts, indices_approches):
+    """ 
+    Mesure la part des voisins trouves par la force brute qui sont aussi trouves par une recherche approchee.
+    
+    Entree:
+        indices_exacts:
+            La liste des indices des plus proches voisins de chaque requete selon la force brute.
+        indices_approches:
+            La liste des indices des plus proches voisins de chaque requete selon la recherche approchee.
+    
+    Sortie:
+        rappel:
+            Le taux de voisins retrouves (1 si la force brute ne trouve aucun voisin).
+    """
+    
+    nb_exacts, nb_retrouves = 0, 0
+    for exacts, approches in zip(indices_exacts, indices_approches):
+        nb_exacts += len(exacts)
+        nb_retrouves += len(np.intersect1d(exacts, approches, assume_unique = True))
+    
+    rappel = 1
+    if nb_exacts != 0:
+        rappel = nb_retrouves/nb_exacts
+    return rappel
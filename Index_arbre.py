@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+"""
+Binome : DELECLUSE Raphael, CEUNINCK Guillaume
+"""
+
+import time
+import heapq
+import numpy as np
+import NN_brute_force as NN_BF
+
+class KDTree:
+    """ 
+    Index par arbre k-d sur la gallery reduite, respectant le meme contrat que NN_brute_force
+    (radius_search, NN_search) et offrant une recherche avec arret anticipe (existe).
+    
+    Chaque noeud couvre une tranche contigue de la gallery reordonnee et conserve sa boite englobante.
+    Un noeud dont la boite est a une distance superieure au rayon est elague ; les feuilles restantes
+    sont parcourues par force brute. Les indices retournes sont ceux de la force brute, aux arrondis pres
+    pour les images situees exactement sur le rayon.
+    """
+    
+    def __init__(self, data, taille_feuille = 64):
+        """ 
+        Construction de l'arbre.
+        
+        Entree:
+            data:
+                La liste ou la gallery d'images, de preference reduite (10 a 50 dimensions).
+                Une image est representee par un np array.
+            taille_feuille:
+                Le nombre maximal d'images dans une feuille.
+        """
+        
+        data = NN_BF.as_matrix(data)
+        self.taille_feuille = taille_feuille
+        self.ordre = np.arange(len(data))
+        self.debut, self.fin, self.enfants, self.bornes_min, self.bornes_max = [], [], [], [], []
+        
+        a_traiter = [self._nouveau_noeud(data, 0, len(data))] if len(data) > 0 else []
+        while a_traiter:
+            noeud = a_traiter.pop()
+            debut, fin = self.debut[noeud], self.fin[noeud]
+            if fin - debut <= taille_feuille:
+                continue
+            
+            #Coupe selon la dimension la plus etendue, a la mediane
+            dim = np.argmax(self.bornes_max[noeud] - self.bornes_min[noeud])
+            milieu = (debut + fin)//2
+            tranche = self.ordre[debut:fin]
+            self.ordre[debut:fin] = tranche[np.argpartition(data[tranche, dim], milieu - debut)]
+            
+            gauche = self._nouveau_noeud(data, debut, milieu)
+            droite = self._nouveau_noeud(data, milieu, fin)
+            self.enfants[noeud] = (gauche, droite)
+            a_traiter.extend((gauche, droite))
+        
+        self.bornes_min, self.bornes_max = np.array(self.bornes_min), np.array(self.bornes_max)
+        
+        #Gallery reordonnee pour que chaque feuille soit contigue en memoire
+        self.data = data[self.ordre]
+        self.norms = NN_BF.squared_norms(self.data)
+    
+    def _nouveau_noeud(self, data, debut, fin):
+        points = data[self.ordre[debut:fin]]
+        self.debut.append(debut)
+        self.fin.append(fin)
+        self.enfants.append(None)
+        self.bornes_min.append(points.min(axis = 0))
+        self.bornes_max.append(points.max(axis = 0))
+        return len(self.debut) - 1
+    
+    def _distance_boite(self, q, noeud):
+        ecart = np.maximum(self.bornes_min[noeud] - q, 0) + np.maximum(q - self.bornes_max[noeud], 0)
+        return np.dot(ecart, ecart)
+    
+    def _distances_feuille(self, q, noeud):
+        debut, fin = self.debut[noeud], self.fin[noeud]
+        #Memes operations que la force brute (voir NN_brute_force.distance_tiles), avec les normes calculees a la construction :
+        #un point situe exactement sur le rayon est retenu ou non de la meme maniere que par NN_brute_force.NN_bf_search
+        return np.concatenate([tuile[0] for lignes, colonnes, tuile in
+                               NN_BF.distance_tiles(self.data[debut:fin], q[None], self.norms[debut:fin])])
+    
+    def _feuille(self, q, r, noeud):
+        return self.ordre[self.debut[noeud]:self.fin[noeud]][self._distances_feuille(q, noeud) <= r]
+    
+    def _parcours(self, q, r, arret_au_premier):
+        if len(self.debut) == 0:
+            return
+        #Petite marge pour ne jamais elaguer un point situe exactement sur le rayon
+        r_elagage = r*(1 + 1e-9) + 1e-9
+        pile = [0]
+        while pile:
+            noeud = pile.pop()
+            if self._distance_boite(q, noeud) > r_elagage:
+                continue
+            if self.enfants[noeud] is None:
+                trouves = self._feuille(q, r, noeud)
+                if len(trouves) > 0:
+                    yield trouves
+                    if arret_au_premier:
+                        return
+            else:
+                #Le fils le plus proche est visite en premier
+                gauche, droite = self.enfants[noeud]
+                if self._distance_boite(q, gauche) <= self._distance_boite(q, droite):
+                    pile.extend((droite, gauche))
+                else:
+                    pile.extend((gauche, droite))
+    
+    def radius_search(self, q, r):
+        """ 
+        Retourne la liste des indices des plus proches voisins de la requete q dont la distance est inferieure au rayon r.
+        
+        Entree:
+            q:
+                La requete.
+                Une image est representee par un np array.
+            r:
+                Le rayon delimitant la distance maximale requise pour etre considere comme l'un des plus proches voisins.
+        
+        Sortie:
+            indices:
+                La liste triee des indices plus proches voisins de la requete q selon r, identique a NN_brute_force.radius_search.
+        """
+        
+        q = np.ravel(q).astype(np.float64)
+        trouves = list(self._parcours(q, r, False))
+        if len(trouves) == 0:
+            return np.array([], dtype = np.int64)
+        return np.sort(np.concatenate(trouves))
+    
+    def NN_search(self, queries, r):
+        """ 
+        Retourne la liste des indices des plus proches voisins sur l'ensemble des requetes, dont la distance est inferieure au rayon r.
+        
+        Entree:
+            queries:
+                La liste des requetes.
+                Une image est representee par un np array.
+            r:
+                Le rayon delimitant la distance maximale requise pour etre considere comme l'un des plus proches voisins.
+        
+        Sortie:
+            indices:
+                La liste des indices des plus proches voisins sur l'ensemble des requetes, selon r.
+        """
+        
+        return [self.radius_search(q, r) for q in queries]
+    
+    def existe(self, q, r):
+        """ 
+        Indique si au moins une image de la gallery est a une distance inferieure au rayon r de la requete q.
+        Le parcours s'arrete a la premiere feuille contenant un voisin.
+        
+        Entree:
+            q:
+                La requete.
+                Une image est representee par un np array.
+            r:
+                Le rayon delimitant la distance maximale requise pour etre considere comme l'un des plus proches voisins.
+        
+        Sortie:
+            True si un voisin existe.
+        """
+        
+        q = np.ravel(q).astype(np.float64)
+        for trouves in self._parcours(q, r, True):
+            return True
+        return False
+    
+    def _knn(self, q, k):
+        #Tas des k meilleurs candidats (-distance, -indice) : la racine est le moins bon
+        meilleurs = []
+        #File de priorite des noeuds a visiter, par distance a leur boite
+        a_visiter = [(self._distance_boite(q, 0), 0)] if len(self.debut) > 0 and k > 0 else []
+        while a_visiter:
+            distance_boite, noeud = heapq.heappop(a_visiter)
+            if len(meilleurs) == k and distance_boite > -meilleurs[0][0]:
+                break
+            if self.enfants[noeud] is None:
+                debut, fin = self.debut[noeud], self.fin[noeud]
+                distances = self._distances_feuille(q, noeud)
+                for d, i in zip(distances.tolist(), self.ordre[debut:fin].tolist()):
+                    if len(meilleurs) < k:
+                        heapq.heappush(meilleurs, (-d, -i))
+                    elif (-d, -i) > meilleurs[0]:
+                        heapq.heapreplace(meilleurs, (-d, -i))
+            else:
+                for enfant in self.enfants[noeud]:
+                    heapq.heappush(a_visiter, (self._distance_boite(q, enfant), enfant))
+        
+        meilleurs = sorted((-d, -i) for d, i in meilleurs)
+        return [i for d, i in meilleurs], [d for d, i in meilleurs]
+    
+    def knn_search(self, queries, k, identites = None):
+        """ 
+        Identification : retourne pour chaque requete ses k plus proches voisins, tries par distance croissante
+        (meme resultat que NN_brute_force.knn_search sans regroupement par identite).
+        Les noeuds sont visites par distance croissante a leur boite et les k meilleurs candidats sont gardes dans un tas borne :
+        le parcours s'arrete des que la boite la plus proche restante est plus loin que le k-ieme candidat.
+        
+        Entree:
+            queries:
+                La liste des requetes.
+                Une image est representee par un np array.
+            k:
+                Le nombre de voisins recherches (ramene au nombre d'images).
+            identites:
+                L'identite de chaque image de la gallery, dans l'ordre d'origine.
+        
+        Sortie:
+            indices:
+                Le np array de taille (nb requetes, k) des indices des voisins dans la gallery.
+            distances:
+                Le np array de taille (nb requetes, k) des distances au carre correspondantes.
+            identites_voisins:
+                Le np array de taille (nb requetes, k) des identites des voisins, None si identites n'est pas fourni.
+        """
+        
+        queries = NN_BF.as_matrix(queries)
+        k = min(k, len(self.ordre))
+        indices = np.empty((len(queries), k), dtype = np.int64)
+        distances = np.empty((len(queries), k))
+        for j, q in enumerate(queries):
+            indices[j], distances[j] = self._knn(q, k)
+        
+        identites_voisins = None
+        if identites is not None:
+            identites_voisins = np.asarray(identites)[indices]
+        return indices, distances, identites_voisins
+
+def benchmark(tailles = (1000, 4000, 16000, 64000), dimensions = (10, 20, 50), nb_requetes = 100, images_par_personne = 10, seed = 0):
+    """ 
+    Compare les temps de recherche par rayon de la force brute et de l'arbre k-d, requete par requete
+    comme dans Projet.is_authorised, sur des gallery synthetiques : des groupes d'images par personne,
+    dont la variance decroit avec la dimension comme apres une ACP.
+    Le rayon est la distance moyenne d'une image a une autre image de la meme personne.
+    
+    Entree:
+        tailles:
+            Les nombres d'images des gallery testees.
+        dimensions:
+            Les dimensions des gallery testees.
+        nb_requetes:
+            Le nombre de requetes par test, la moitie de personnes connues et la moitie de personnes inconnues.
+        images_par_personne:
+            Le nombre d'images de chaque personne.
+        seed:
+            La graine du generateur aleatoire.
+    
+    Sortie:
+        resultats:
+            La liste des [taille, dimension, tps force brute, tps construction arbre, tps arbre, tps existe],
+            les temps de recherche etant donnes par requete.
+        croisement:
+            Le dictionnaire associant a chaque dimension la plus petite taille a partir de laquelle l'arbre est plus rapide.
+    """
+    
+    rng = np.random.default_rng(seed)
+    resultats, croisement = [], {}
+    
+    for d in dimensions:
+        echelle = np.sqrt(np.linspace(1, 0.05, d))
+        for n in tailles:
+            centres = rng.standard_normal((n//images_par_personne + nb_requetes, d))*echelle
+            bruit = 0.15*echelle
+            data = np.repeat(centres[:n//images_par_personne], images_par_personne, axis = 0)
+            data += rng.standard_normal(data.shape)*bruit
+            queries = np.concatenate((centres[rng.integers(0, n//images_par_personne, nb_requetes//2)],
+                                      centres[n//images_par_personne:][:nb_requetes - nb_requetes//2]))
+            queries += rng.standard_normal(queries.shape)*bruit
+            r = 2*np.sum(bruit**2)
+            
+            startTime = time.time()
+            ref = [NN_BF.radius_search(data, q, r) for q in queries]
+            tps_bf = (time.time() - startTime)/nb_requetes
+            
+            startTime = time.time()
+            arbre = KDTree(data)
+            tps_construction = time.time() - startTime
+            
+            startTime = time.time()
+            res = arbre.NN_search(queries, r)
+            tps_arbre = (time.time() - startTime)/nb_requetes
+            
+            startTime = time.time()
+            for q in queries:
+                arbre.existe(q, r)
+            tps_existe = (time.time() - startTime)/nb_requetes
+            
+            assert all(np.array_equal(a, b) for a, b in zip(ref, res))
+            resultats.append([n, d, tps_bf, tps_construction, tps_arbre, tps_existe])
+            if tps_arbre < tps_bf and d not in croisement:
+                croisement[d] = n
+            
+            print("n = %6d  d = %3d  force brute %.2e s  arbre %.2e s  existe %.2e s  (construction %.3f s)"
+                  % (n, d, tps_bf, tps_arbre, tps_existe, tps_construction))
+    
+    return resultats, croisement
+
+if __name__ == "__main__":
+    print(benchmark()[1])
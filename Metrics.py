@@ -4,10 +4,41 @@ Binome : DELECLUSE Raphael, CEUNINCK Guillaume
 """
 
 import NN_brute_force as NN_BF
+import Index_IVF
 import numpy as np
 import matplotlib.pyplot as plt
 import time
+import Profilage
 
+def identites_entieres(data_names, *names):
+    """ 
+    Convertit une seule fois les noms X.Y en indices entiers d'identite, communs a la gallery et aux requetes,
+    afin que le comptage des cas se fasse par comparaison d'entiers.
+    Une requete dont l'identite est absente de la gallery recoit l'indice -1.
+    Des indices deja entiers sont retournes tels quels.
+    
+    Entree:
+        data_names:
+            La liste contenant les noms de chaque image de la gallery.
+            Un nom est formate sous la forme X.Y
+        names:
+            Une ou plusieurs listes contenant les noms des requetes.
+            Un nom est formate sous la forme X.Y
+    
+    Sortie:
+        La liste des np array d'indices d'identite : celui de la gallery, puis celui de chaque liste de requetes.
+    """
+    
+    if np.asarray(data_names).dtype.kind in "iu":
+        return [np.asarray(data_names)] + [np.asarray(n) for n in names]
+    
+    table = {}
+    res = [np.array([table.setdefault(name.split(".")[0], len(table)) for name in data_names], dtype = np.int64)]
+    for noms in names:
+        res.append(np.array([table.get(name.split(".")[0], -1) for name in noms], dtype = np.int64))
+    return res
+
+@Profilage.etape
 def mesure_cas(data_names, names_known, names_unknown, indices_probes_known, indices_probes_unknown):
     """ 
     Mesure des nombres de True Positif, True Negatif, False Positiv, False Negativ, necessaires pour le calcul des metriques.
@@ -32,6 +63,8 @@ def mesure_cas(data_names, names_known, names_unknown, indices_probes_known, ind
             La liste contenant les noms de chaque requetes supposees connues.
             Un nom est formate sous la forme X.Y
     
+    Les noms peuvent aussi etre fournis sous forme d'indices entiers (voir identites_entieres).
+    
     Sortie:
         TP:
             Nombre de fois où le système autorise l'accès à un utilisateur auquel l'accès doit être autorisé pour des motifs légitimes
@@ -44,35 +77,30 @@ def mesure_cas(data_names, names_known, names_unknown, indices_probes_known, ind
     """
     
     
-    TP, TN, FP, FN = 0, 0, 0, 0
+    ids_data, ids_known = identites_entieres(data_names, names_known)
     
-    for i, probes in enumerate(indices_probes_known):
-        if probes.shape[-1] == 0:
-            FN +=1
-        else:
-            stop = 0
-            index_NN = 0
-            while stop == 0 and index_NN < len(probes):
-                if data_names[probes[index_NN]].split(".")[0] == names_known[i].split(".")[0]:
-                    TP +=1
-                    stop = 1
-                index_NN += 1
-            if stop == 0:
-                FP +=1
-                
-    #Pour les unknown :
+    #Requetes connues : toutes les paires (requete, voisin) sont comparees en une seule passe
+    nb_voisins = np.array([len(probes) for probes in indices_probes_known], dtype = np.int64)
+    voisins = np.concatenate([np.zeros(0, dtype = np.int64)] + [np.asarray(probes, dtype = np.int64) for probes in indices_probes_known])
+    requete_du_voisin = np.repeat(np.arange(len(nb_voisins)), nb_voisins)
+    bons = ids_data[voisins] == ids_known[requete_du_voisin]
+    trouve = np.bincount(requete_du_voisin[bons], minlength = len(nb_voisins)) > 0
+    
+    TP = int(np.sum(trouve))
+    FN = int(np.sum(nb_voisins == 0))
+    FP = int(np.sum((nb_voisins > 0) & ~trouve))
     
-    for y in indices_probes_unknown:
-        #Si le tableau est vide, alors on n'a rien trouvé : Vrai négatif
-        if y.shape[-1] == 0:
-            TN +=1
-        #Sinon, on a trouvé une image pour un utilisateur non-enregistré : Faux positif
-        else :
-            FP +=1
+    #Pour les unknown :
+    #Si le tableau est vide, alors on n'a rien trouvé : Vrai négatif
+    #Sinon, on a trouvé une image pour un utilisateur non-enregistré : Faux positif
+    nb_vides = sum(1 for y in indices_probes_unknown if y.shape[-1] == 0)
+    TN = nb_vides
+    FP += len(indices_probes_unknown) - nb_vides
     
     return TP, TN, FP, FN
 
-def calc_metrics(D, data_names, names_known, names_unknown, probes_known, probes_unknown, radius):
+@Profilage.etape
+def calc_metrics(D, data_names, names_known, names_unknown, probes_known, probes_unknown, radius, index = None):
     """ 
     Retourne la liste de l'evaluation des performances a l'aide de differentes metriques pour un radius de plus proches voisins choisi.
     
@@ -97,6 +125,8 @@ def calc_metrics(D, data_names, names_known, names_unknown, probes_known, probes
             Un nom est formate sous la forme X.Y
         radius:
             Le rayon delimitant la distance maximale requise pour etre considere comme l'un des plus proches voisins.
+        index:
+            Un index de recherche approchee construit sur D (voir Index_IVF.IndexIVF), utilise a la place de la force brute.
     
     Sortie:
         La liste contenant le radius et les performances suivantes:
@@ -105,12 +135,19 @@ def calc_metrics(D, data_names, names_known, names_unknown, probes_known, probes
         *rapp: Mesure le taux de personnes correctement autorisees parmi l'ensemble des personnes qui devraient etre autorisees par le systeme.
         *spec: Mesure le taux de personnes correctement refusees parmi l'ensemble des personnes refusees par le systeme.
         *tps_de_recherche: Le temps qu'a pris le systeme pour trouver les plus proches voisins des requetes connues et inconnues.
+        Si un index est fourni, la liste contient en plus:
+        *rappel_recherche: La part des voisins trouves par la force brute qui sont aussi trouves par l'index.
+        *tps_force_brute: Le temps qu'a pris la force brute pour la meme recherche.
     """
     
     startTime = time.time()
     
-    indices_probes_known = NN_BF.NN_bf_search(D, probes_known, radius)
-    indices_probes_unknown = NN_BF.NN_bf_search(D, probes_unknown, radius)
+    if index is None:
+        indices_probes_known = NN_BF.NN_bf_search(D, probes_known, radius)
+        indices_probes_unknown = NN_BF.NN_bf_search(D, probes_unknown, radius)
+    else:
+        indices_probes_known = index.NN_search(probes_known, radius)
+        indices_probes_unknown = index.NN_search(probes_unknown, radius)
     
     tps_de_recherche = time.time() - startTime
     
@@ -120,10 +157,260 @@ def calc_metrics(D, data_names, names_known, names_unknown, probes_known, probes
     prec = precision(TP, FP)
     rapp = rappel(TP, FN)
     spec = specificite(TN, FP)
+    
+    if index is not None:
+        #Comparaison a la force brute pour mesurer les voisins manques par l'index
+        startTime = time.time()
+        exacts = NN_BF.NN_bf_search(D, probes_known, radius) + NN_BF.NN_bf_search(D, probes_unknown, radius)
+        tps_force_brute = time.time() - startTime
+        
+        rappel_recherche = Index_IVF.rappel_recherche(exacts, indices_probes_known + indices_probes_unknown)
         
+        return [radius,exac,prec,rapp,spec,tps_de_recherche,rappel_recherche,tps_force_brute]
+    
     return [radius,exac,prec,rapp,spec,tps_de_recherche]
 
-def evaluation(D_reduced, data_names, names_known, names_unknown, probes_known_reduced, probes_unknown_reduced, pas, radius_max):
+@Profilage.etape
+def distances_minimales(D, data_names, names, probes, dtype = np.float64):
+    """ 
+    Calcule pour chaque requete la distance a l'image la plus proche de la gallery,
+    ainsi que la distance a l'image la plus proche appartenant au meme individu.
+    Les distances sont calculees une seule fois, par tuiles, quel que soit le nombre de radius testes ensuite.
+    
+    Entree:
+        D:
+            La liste ou la gallery d'images.
+            Une image est representee par un np array.
+        data_names:
+            La liste contenant les noms de chaque image de la gallery.
+            Un nom est formate sous la forme X.Y
+        names:
+            La liste contenant les noms de chaque requete.
+            Un nom est formate sous la forme X.Y
+        probes:
+            La liste des requetes.
+            Une image est representee par un np array.
+        dtype:
+            Le type flottant des calculs de distances (voir NN_brute_force.distance_tiles).
+    
+    Sortie:
+        d_min:
+            Le np array de la distance de chaque requete a l'image la plus proche de la gallery.
+        d_meme:
+            Le np array de la distance de chaque requete a l'image la plus proche du meme individu (inf si absent).
+    """
+    
+    ids_data, ids_probes = identites_entieres(data_names, names)
+    
+    d_min = np.full(len(probes), np.inf)
+    d_meme = np.full(len(probes), np.inf)
+    
+    for lignes, colonnes, tuile in NN_BF.distance_tiles(D, probes, dtype = dtype):
+        np.minimum(d_min[lignes], tuile.min(axis = 1), out = d_min[lignes])
+        meme = ids_data[colonnes][None,:] == ids_probes[lignes][:,None]
+        np.minimum(d_meme[lignes], np.where(meme, tuile, np.inf).min(axis = 1), out = d_meme[lignes])
+    
+    return d_min, d_meme
+
+@Profilage.etape
+def taux_identification(D, data_names, names_known, probes_known, k = 10):
+    """ 
+    Mesure du mode identification ("qui est-ce ?") : taux de requetes connues dont l'identite figure parmi
+    les r identites les plus proches, pour r allant de 1 a k (courbe CMC), a l'aide de NN_brute_force.knn_search.
+    
+    Entree:
+        D:
+            La liste ou la gallery d'images.
+            Une image est representee par un np array.
+        data_names:
+            La liste contenant les noms de chaque image de la gallery.
+            Un nom est formate sous la forme X.Y
+        names_known:
+            La liste contenant les noms de chaque requete connue.
+            Un nom est formate sous la forme X.Y
+        probes_known:
+            La liste des requetes connues.
+            Une image est representee par un np array.
+        k:
+            Le rang maximal.
+    
+    Sortie:
+        Le np array des taux d'identification aux rangs 1 a k.
+    """
+    
+    ids_data, ids_known = identites_entieres(data_names, names_known)
+    identites_voisins = NN_BF.knn_search(D, probes_known, k, ids_data, par_identite = True)[2]
+    
+    #Rang de la bonne identite pour chaque requete (k si absente)
+    trouve = identites_voisins == ids_known[:, None]
+    rangs = np.where(trouve.any(axis = 1), trouve.argmax(axis = 1), k)
+    return np.cumsum(np.bincount(rangs, minlength = k + 1)[:k])/max(len(ids_known), 1)
+
+@Profilage.etape
+def mesure_cas_balayage(d_min_known, d_meme_known, d_min_unknown, radius):
+    """ 
+    Mesure des nombres de True Positif, True Negatif, False Positiv, False Negativ pour plusieurs radius a la fois,
+    a partir des distances minimales des requetes (voir distances_minimales).
+    Une requete a au moins un voisin dans le radius r si et seulement si sa distance minimale est inferieure a r.
+    
+    Entree:
+        d_min_known:
+            Les distances minimales des requetes connues a la gallery.
+        d_meme_known:
+            Les distances minimales des requetes connues aux images du meme individu.
+        d_min_unknown:
+            Les distances minimales des requetes inconnues a la gallery.
+        radius:
+            Le np array des radius pour lesquels compter les cas.
+    
+    Sortie:
+        TP, TN, FP, FN:
+            Les np array des nombres de cas pour chaque radius.
+    """
+    
+    return _cas_tries(np.sort(d_min_known), np.sort(d_meme_known), np.sort(d_min_unknown), np.asarray(radius))
+
+def _cas_tries(d_min_known, d_meme_known, d_min_unknown, radius):
+    """ 
+    mesure_cas_balayage pour des distances deja triees, en O(log n) par radius.
+    """
+    
+    #Nombre de requetes ayant une distance inferieure ou egale a chaque radius
+    nb_trouves_known = np.searchsorted(d_min_known, radius, side = "right")
+    TP = np.searchsorted(d_meme_known, radius, side = "right")
+    nb_trouves_unknown = np.searchsorted(d_min_unknown, radius, side = "right")
+    
+    FN = len(d_min_known) - nb_trouves_known
+    FP = (nb_trouves_known - TP) + nb_trouves_unknown
+    TN = len(d_min_unknown) - nb_trouves_unknown
+    
+    return TP, TN, FP, FN
+
+def metriques_balayage(d_min_known, d_meme_known, d_min_unknown, radius, tps_de_recherche):
+    """ 
+    Calcule les metriques pour chaque radius a partir des distances minimales des requetes (voir mesure_cas_balayage),
+    au format de evaluation.
+    
+    Entree:
+        d_min_known, d_meme_known, d_min_unknown:
+            Les distances minimales des requetes (voir distances_minimales).
+        radius:
+            Le np array des radius testes.
+        tps_de_recherche:
+            Le temps de recherche rapporte pour tous les radius.
+    
+    Sortie:
+        La liste des [radius, exac, prec, rapp, spec, tps_de_recherche] (voir evaluation).
+    """
+    
+    res = []
+    TP, TN, FP, FN = mesure_cas_balayage(d_min_known, d_meme_known, d_min_unknown, radius)
+    
+    for i, r in enumerate(radius):
+        res.append([r, exactitude(TP[i], TN[i], FP[i], FN[i]), precision(TP[i], FP[i]), 
+                    rappel(TP[i], FN[i]), specificite(TN[i], FP[i]), tps_de_recherche])
+    
+    return res
+
+#Criteres de seuil_bissection
+CRITERES_SEUIL = ("eer", "fpr", "tpr")
+
+def seuils_exacts(d_min_known, d_meme_known, d_min_unknown):
+    """ 
+    Retourne les seuls radius ou les metriques changent : les comptages de mesure_cas_balayage sont constants
+    entre deux distances observees, et changent exactement en chacune d'elles. Evaluer ces radius donne la courbe ROC exacte,
+    sans pas ni radius maximal a choisir.
+    
+    Entree:
+        d_min_known, d_meme_known, d_min_unknown:
+            Les distances minimales des requetes (voir distances_minimales).
+    
+    Sortie:
+        Le np array trie des radius distincts : 0 puis chaque distance observee.
+    """
+    
+    distances = np.concatenate((np.ravel(d_min_known), np.ravel(d_meme_known), np.ravel(d_min_unknown)))
+    distances = distances[np.isfinite(distances)]
+    return np.unique(np.concatenate(([0], distances)))
+
+def seuil_bissection(d_min_known, d_meme_known, d_min_unknown, critere = "eer", cible = None):
+    """ 
+    Recherche par dichotomie parmi les radius de seuils_exacts du radius atteignant un point de fonctionnement :
+    * eer : le radius ou le taux de faux positifs (1 - spec) et le taux de faux negatifs (1 - rapp) sont les plus proches (taux d'egale erreur) ;
+    * fpr : le plus grand radius dont le taux de faux positifs ne depasse pas cible ;
+    * tpr : le plus petit radius dont le taux de vrais positifs (rapp) atteint cible.
+    Les distances sont triees une seule fois, puis chaque radius evalue ne coute que O(log n).
+    Le rappel croit avec le radius ; le taux de faux positifs aussi, sauf lorsqu'une requete connue passe d'un mauvais
+    plus proche voisin au bon, auquel cas la dichotomie retourne l'un des radius ou le critere bascule.
+    
+    Entree:
+        d_min_known, d_meme_known, d_min_unknown:
+            Les distances minimales des requetes (voir distances_minimales).
+        critere:
+            Le critere (voir CRITERES_SEUIL).
+        cible:
+            Le taux vise pour les criteres fpr et tpr.
+    
+    Sortie:
+        seuil:
+            Le radius trouve.
+        tpr, fpr:
+            Les taux de vrais positifs et de faux positifs a ce radius.
+        nb_evaluations:
+            Le nombre de radius evalues.
+        None si la cible est inatteignable (taux de faux positifs superieur a cible des le radius 0,
+        ou taux de vrais positifs inferieur a cible pour tous les radius).
+    """
+    
+    if critere not in CRITERES_SEUIL:
+        raise ValueError("Critere inconnu : " + str(critere))
+    if critere != "eer" and cible is None:
+        raise ValueError("Une cible est necessaire pour le critere " + critere)
+    
+    seuils = seuils_exacts(d_min_known, d_meme_known, d_min_unknown)
+    d_min_known, d_meme_known, d_min_unknown = np.sort(d_min_known), np.sort(d_meme_known), np.sort(d_min_unknown)
+    taux = {}
+    
+    def evaluer(i):
+        if i not in taux:
+            TP, TN, FP, FN = _cas_tries(d_min_known, d_meme_known, d_min_unknown, seuils[i:i + 1])
+            taux[i] = rappel(TP[0], FN[0]), 1 - specificite(TN[0], FP[0])
+        return taux[i]
+    
+    #Condition fausse pour les petits radius, vraie pour les grands
+    if critere == "eer":
+        condition = lambda i: evaluer(i)[1] >= 1 - evaluer(i)[0]
+    elif critere == "fpr":
+        condition = lambda i: evaluer(i)[1] > cible
+    else:
+        condition = lambda i: evaluer(i)[0] >= cible
+    
+    #Plus petit indice verifiant la condition (len(seuils) si aucun)
+    debut, fin = 0, len(seuils)
+    while debut < fin:
+        milieu = (debut + fin)//2
+        if condition(milieu):
+            fin = milieu
+        else:
+            debut = milieu + 1
+    
+    if critere == "eer":
+        candidats = [i for i in (debut - 1, debut) if 0 <= i < len(seuils)]
+        i = min(candidats, key = lambda i: abs(evaluer(i)[1] - (1 - evaluer(i)[0])))
+    elif critere == "fpr":
+        if debut == 0:
+            return None
+        i = debut - 1
+    else:
+        if debut == len(seuils):
+            return None
+        i = debut
+    
+    tpr, fpr = evaluer(i)
+    return seuils[i], tpr, fpr, len(taux)
+
+@Profilage.etape
+def evaluation(D_reduced, data_names, names_known, names_unknown, probes_known_reduced, probes_unknown_reduced, pas, radius_max, mode = "grille", index = None, critere = "eer", cible = None):
     """ 
     Retourne la liste de l'ensemble des evaluations des performances a l'aide de differentes metriques 
     pour un radius de plus proches voisins variant de 0 a radius_max avec un certain pas.
@@ -151,6 +438,18 @@ def evaluation(D_reduced, data_names, names_known, names_unknown, probes_known_r
             La borne maximale que le radius va pouvoir varier.
         pas:
             Le pas pour lequel le radius va etre incremente.
+        mode:
+            La maniere de parcourir les radius.
+            * grille : Une recherche complete est realisee pour chaque radius (voir calc_metrics).
+            * balayage : Les distances sont calculees une seule fois, puis les cas sont comptes pour tous les radius (voir mesure_cas_balayage).
+              Le temps de recherche rapporte est alors celui de l'unique recherche, commun a tous les radius.
+            * seuils : Comme balayage, mais pour les seuls radius ou les metriques changent (voir seuils_exacts) ; pas et radius_max sont ignores.
+            * bissection : Comme balayage, pour le seul radius atteignant le critere (voir seuil_bissection) ; pas et radius_max sont ignores.
+              Une ValueError est levee si la cible est inatteignable.
+        index:
+            Un index de recherche approchee utilise en mode grille a la place de la force brute (voir calc_metrics).
+        critere, cible:
+            Le point de fonctionnement recherche en mode bissection (voir seuil_bissection).
     
     Sortie:
         La liste contenant l'ensemble des radius testes et performances suivantes:
@@ -163,12 +462,37 @@ def evaluation(D_reduced, data_names, names_known, names_unknown, probes_known_r
     
     res = []
     
+    if mode in ("balayage", "seuils", "bissection"):
+        
+        startTime = time.time()
+        
+        data_names, names_known, names_unknown = identites_entieres(data_names, names_known, names_unknown)
+        d_min_known, d_meme_known = distances_minimales(D_reduced, data_names, names_known, probes_known_reduced)
+        d_min_unknown = distances_minimales(D_reduced, data_names, names_unknown, probes_unknown_reduced)[0]
+        
+        tps_de_recherche = time.time() - startTime
+        
+        if mode == "seuils":
+            radius = seuils_exacts(d_min_known, d_meme_known, d_min_unknown)
+        elif mode == "bissection":
+            res = seuil_bissection(d_min_known, d_meme_known, d_min_unknown, critere, cible)
+            if res is None:
+                raise ValueError("Aucun radius n'atteint la cible %s = %s" % (critere, cible))
+            radius = np.array(res[:1])
+        else:
+            radius = np.arange(0, radius_max, pas)
+        
+        return metriques_balayage(d_min_known, d_meme_known, d_min_unknown, radius, tps_de_recherche)
+    
+    #Les noms sont convertis une seule fois pour tous les radius
+    data_names, names_known, names_unknown = identites_entieres(data_names, names_known, names_unknown)
+    
     for r in range(0, radius_max, pas):
         
-        metrics = calc_metrics(D_reduced, data_names, names_known, names_unknown, probes_known_reduced, probes_unknown_reduced, r)
+        metrics = calc_metrics(D_reduced, data_names, names_known, names_unknown, probes_known_reduced, probes_unknown_reduced, r, index)
         
         res.append(metrics)
-        
+    
     return res
 
 def exactitude(TP,TN,FP,FN):
@@ -284,7 +608,7 @@ def save_metrics(metrics):
     
     with open('data_npy/metrics.npy', 'wb') as f:
         np.save(f, np.array(metrics))
-        
+
 def load_metrics():
     """ 
     Chargement des informations des metrics pour les differents radius.
@@ -366,7 +690,52 @@ def trace_metrics(metrics):
     plt.xlabel("R")
     plt.ylabel("Temps d'execution")
     plt.title("Temps d'execution par rapport a R")
-     
+
+def aire_roc(metrics):
+    """ 
+    Aire sous la courbe de ROC tracee par trace_metrics (taux de faux positifs 1 - spec, taux de vrais positifs rapp),
+    par la methode des trapezes.
+    
+    Entree:
+        metrics:
+            Le np array des metriques (voir evaluation).
+    
+    Sortie:
+        L'aire sous la courbe, entre 0 et 1.
+    """
+    
+    metrics = np.asarray(metrics, dtype = np.float64)
+    fpr, tpr = 1 - metrics[:,4], metrics[:,3]
+    ordre = np.lexsort((tpr, fpr))
+    fpr, tpr = fpr[ordre], tpr[ordre]
+    return float(np.sum(np.diff(fpr)*(tpr[1:] + tpr[:-1])/2))
+
+def trace_roc_comparees(metrics_par_nom):
+    """ 
+    Superposition des courbes de ROC de plusieurs evaluations (voir trace_metrics).
+    
+    Entree:
+        metrics_par_nom:
+            Le dictionnaire associant a chaque nom de courbe son np array de metriques.
+    
+    Sortie:
+        Graphique des courbes de ROC, avec l'aire sous chaque courbe en legende.
+    """
+    
+    fig_roc, ax_roc = plt.subplots(figsize = (5,5))
+    x,y = np.arange(0, 1.1, 0.1), np.arange(0, 1.1, 0.1)
+    
+    for nom, metrics in metrics_par_nom.items():
+        metrics = np.asarray(metrics, dtype = np.float64)
+        ax_roc.plot(1 - metrics[:,4],metrics[:,3], label = "%s (aire %.3f)" % (nom, aire_roc(metrics)))
+    ax_roc.plot(x, y, ":", label="Random guess curve")
+    ax_roc.xaxis.set_ticks(x)
+    ax_roc.yaxis.set_ticks(y)
+    ax_roc.legend()
+    plt.xlabel("False Positive Rate")
+    plt.ylabel("True Positive Rate")
+    plt.title("Courbes de ROC")
+
 def speedup(metrics_bf,metrics_kaiser,metrics_inertie,metrics_coude):
     """ 
     Generation du graphique representant l'evolution du speedup en fonction du radius, pour les trois systemes suivants:
@@ -397,4 +766,3 @@ def speedup(metrics_bf,metrics_kaiser,metrics_inertie,metrics_coude):
     plt.xlabel("R")
     plt.ylabel("Speedup")
     plt.title("Speedup par rapport a R")
-    
\ No newline at end of file
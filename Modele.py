@@ -0,0 +1,349 @@
+# -*- coding: utf-8 -*-
+"""
+Binome : DELECLUSE Raphael, CEUNINCK Guillaume
+"""
+
+import os
+import numpy as np
+import Eigenfaces as EG
+import NN_brute_force as NN_BF
+
+#Fichiers .npy non compresses composant un modele sauvegarde
+FICHIERS_MODELE = ("moyenne", "w_significatif", "mu", "D_reduced", "data_names", "residu_reference", "regle", "solveur")
+
+#Fichiers absents des modeles sauvegardes par les versions precedentes, remplaces par leur valeur par defaut au chargement
+FICHIERS_FACULTATIFS = ("residu_reference", "regle", "solveur")
+
+class ModeleEigenfaces:
+    """ 
+    Modele Eigenfaces regroupant tout ce qui est necessaire a l'authentification:
+    le visage moyen, les vecteurs principaux, les valeurs propres, la gallery reduite et les noms associes.
+    
+    Le modele est sauvegarde dans un dossier sous forme de fichiers .npy non compresses,
+    afin de pouvoir etre recharge par projection en memoire (mmap) :
+    le chargement est alors quasi immediat et plusieurs processus partagent les memes pages de la gallery.
+    
+    De nouvelles personnes peuvent etre enrolees sans refaire l'ACP (voir enroler).
+    """
+    
+    def __init__(self, moyenne, w_significatif, mu, D_reduced, data_names, residu_reference = None, regle = None, solveur = None):
+        """ 
+        Entree:
+            moyenne:
+                Le visage d’un individu moyen de la gallery, linearise.
+            w_significatif:
+                Les k premiers vecteurs principaux permettant la reduction de la dimension des donnees.
+            mu:
+                Les valeurs propres associees a la gallery.
+            D_reduced:
+                La gallery dont la dimension a ete reduite.
+            data_names:
+                La liste contenant les noms de chaque image de la gallery.
+                Un nom est formate sous la forme X.Y
+            residu_reference:
+                La part de l'inertie de la gallery non captee par les vecteurs principaux (voir residu_relatif).
+                Par defaut, elle est deduite de mu, qui doit alors contenir toutes les valeurs propres.
+            regle:
+                Le critere de selection des vecteurs principaux utilise pour l'ajustement, None s'il est inconnu.
+            solveur:
+                La methode de decomposition utilisee pour l'ajustement ("lots" pour Eigenfaces.ACP_par_lots),
+                None si elle est inconnue.
+        """
+        
+        self.moyenne = moyenne
+        self.w_significatif = w_significatif
+        self.mu = mu
+        self.data_names = data_names
+        
+        #La gallery reduite est stockee dans un tampon agrandi par doublement lors des enrolements
+        self._tampon = D_reduced
+        self.n = len(D_reduced)
+        
+        if residu_reference is None:
+            residu_reference = 1 - np.sum(mu[:w_significatif.shape[1]])/np.sum(mu)
+        self.residu_reference = np.asarray(residu_reference)
+        
+        #Parametres d'ajustement, conserves pour savoir si un modele sauvegarde peut etre reutilise (voir ajuste_avec)
+        self.regle = None if regle is None else np.asarray(regle).item()
+        self.solveur = None if solveur is None else np.asarray(solveur).item()
+        
+        #Inerties cumulees des images enrolees depuis l'ajustement, pour le calcul de la derive
+        self.inertie_enrolee = 0.
+        self.residu_enrole = 0.
+    
+    @property
+    def D_reduced(self):
+        """ 
+        La gallery dont la dimension a ete reduite.
+        """
+        
+        return self._tampon[:self.n]
+    
+    @classmethod
+    def ajuster(cls, data, data_names, rule = "Kaiser", solveur = "eigh", taille_lot = None, cache = None):
+        """ 
+        Construction du modele par l'ACP efficace de la gallery.
+        
+        Entree:
+            data: 
+                La liste d'images correspondant a la gallery.
+                Une image est representee par un np array.
+            data_names:
+                La liste contenant les noms de chaque image de la gallery.
+                Un nom est formate sous la forme X.Y
+            rule:
+                Le critere choisi pour selectionner les premiers vecteurs principaux (voir Eigenfaces.ACP_efficace).
+            solveur:
+                La methode de decomposition utilisee (voir Eigenfaces.Calc_valeurs_vecteurs_propres).
+            taille_lot:
+                Si renseigne, la gallery est lue par lots de cette taille (voir Eigenfaces.ACP_par_lots)
+                et le solveur est ignore.
+            cache:
+                Le cache des decompositions (voir Eigenfaces.decomposition).
+        
+        Sortie:
+            Le modele construit.
+        """
+        
+        if taille_lot is None:
+            D_reduced, w_significatif, mu, moyenne = EG.ACP_efficace_complete(data, rule, solveur, cache = cache)
+        else:
+            D_reduced, w_significatif, mu, moyenne = EG.ACP_par_lots(data, rule, taille_lot = taille_lot)
+        
+        #Les solveurs partiels ne fournissent pas toutes les valeurs propres : l'inertie totale est recalculee
+        inertie_totale = 0
+        for lot in EG.iter_lots(data, taille_lot or 256):
+            lot -= moyenne
+            inertie_totale += np.einsum("ij,ij->", lot, lot)
+        inertie_totale /= (len(D_reduced) -1)
+        residu_reference = 1 - np.sum(mu[:w_significatif.shape[1]])/inertie_totale
+        
+        return cls(moyenne, w_significatif, mu, D_reduced, np.array(data_names, dtype = str), residu_reference,
+                   rule, solveur if taille_lot is None else "lots")
+    
+    def ajuste_avec(self, rule, solveur = "eigh"):
+        """ 
+        Indique si le modele a ete ajuste avec ce critere et ce solveur.
+        Un modele dont les parametres d'ajustement sont inconnus (sauvegarde par une version precedente) n'est reutilisable
+        pour aucun. La metrique n'en fait pas partie : elle est appliquee au modele lors de son utilisation (voir gallery).
+        
+        Entree:
+            rule:
+                Le critere de selection des vecteurs principaux (voir Eigenfaces.ACP_efficace).
+            solveur:
+                La methode de decomposition (voir Eigenfaces.Calc_valeurs_vecteurs_propres).
+        
+        Sortie:
+            True si le modele correspond a ces parametres, False sinon.
+        """
+        
+        return self.regle == rule and self.solveur == solveur
+    
+    def projeter(self, probes):
+        """ 
+        Projection de requetes dans l'espace reduit, en les centrant par rapport au visage moyen de la gallery.
+        
+        Entree:
+            probes:
+                La liste des requetes.
+                Une image est representee par un np array.
+        
+        Sortie:
+            Les requetes projetees sur les vecteurs principaux du modele.
+        """
+        
+        return EG.projection(EG.linearisation(probes) - self.moyenne, self.w_significatif)
+    
+    def transformateur(self, dtype = np.float32, metrique = "euclidienne"):
+        """ 
+        Retourne le transformateur projetant des requetes avec le visage moyen et les vecteurs principaux du modele
+        (voir Eigenfaces.TransformateurEigenfaces), dans l'espace de la metrique choisie.
+        """
+        
+        return EG.TransformateurEigenfaces(self.moyenne, self.w_significatif, dtype, metrique, self.mu)
+    
+    def gallery(self, metrique = "euclidienne"):
+        """ 
+        Retourne la gallery reduite preparee pour la metrique choisie (voir NN_brute_force.preparer),
+        a comparer aux requetes projetees par transformateur(metrique = metrique).
+        """
+        
+        if metrique == "euclidienne":
+            return self.D_reduced
+        return NN_BF.preparer(self.D_reduced, metrique, self.mu)
+    
+    def residu_relatif(self, probes):
+        """ 
+        Mesure, pour chaque requete centree, la part de son inertie qui n'est pas captee par les vecteurs principaux.
+        
+        Entree:
+            probes:
+                La liste des requetes.
+                Une image est representee par un np array.
+        
+        Sortie:
+            inertie:
+                Le np array de l'inertie de chaque requete centree.
+            residu:
+                Le np array de l'inertie de chaque requete perdue par la projection.
+        """
+        
+        X = EG.linearisation(probes) - self.moyenne
+        Y = EG.projection(X, self.w_significatif)
+        inertie = np.einsum("ij,ij->i", X, X)
+        residu = inertie - np.einsum("ij,ij->i", Y, Y)
+        return inertie, residu
+    
+    def enroler(self, images, noms, mise_a_jour_base = False):
+        """ 
+        Ajout de nouvelles images a la gallery sans refaire l'ACP.
+        Chaque image est projetee avec le visage moyen et les vecteurs principaux existants, en O(k*p*p),
+        puis ajoutee a la gallery reduite (en O(k) amorti) et aux noms.
+        
+        Entree:
+            images:
+                La liste des images a enroler.
+                Une image est representee par un np array.
+            noms:
+                La liste contenant les noms de chaque image a enroler.
+                Un nom est formate sous la forme X.Y
+            mise_a_jour_base:
+                Si True, le visage moyen et les vecteurs principaux sont mis a jour par SVD incrementale
+                (voir mise_a_jour_incrementale) avant la projection.
+        
+        Sortie:
+            Les images enrolees projetees dans l'espace reduit.
+        """
+        
+        inertie, residu = self.residu_relatif(images)
+        self.inertie_enrolee += np.sum(inertie)
+        self.residu_enrole += np.sum(residu)
+        
+        if mise_a_jour_base:
+            self.mise_a_jour_incrementale(images)
+        
+        Y = self.projeter(images)
+        
+        #Agrandissement du tampon par doublement (le tampon charge par mmap est en lecture seule)
+        if self.n + len(Y) > len(self._tampon) or not self._tampon.flags.writeable:
+            tampon = np.empty((max(2*len(self._tampon), self.n + len(Y)), Y.shape[1]), dtype = Y.dtype)
+            tampon[:self.n] = self.D_reduced
+            self._tampon = tampon
+        self._tampon[self.n:self.n + len(Y)] = Y
+        self.n += len(Y)
+        
+        if not isinstance(self.data_names, list):
+            self.data_names = list(self.data_names)
+        self.data_names.extend(noms)
+        
+        return Y
+    
+    def derive(self):
+        """ 
+        Mesure de la derive du modele : rapport entre la part d'inertie perdue par la projection des images enrolees
+        et celle de la gallery initiale. Une derive proche de 1 signifie que les vecteurs principaux decrivent
+        aussi bien les nouvelles personnes que les anciennes.
+        
+        Sortie:
+            La derive du modele (0 si aucune image n'a ete enrolee).
+        """
+        
+        if self.inertie_enrolee == 0:
+            return 0.
+        return (self.residu_enrole/self.inertie_enrolee)/self.residu_reference
+    
+    def reajustement_conseille(self, seuil = 1.5):
+        """ 
+        Indique si une nouvelle ACP complete de la gallery est conseillee.
+        
+        Entree:
+            seuil:
+                La derive (voir derive) au-dela de laquelle les vecteurs principaux sont consideres comme obsoletes.
+        
+        Sortie:
+            True si la derive depasse le seuil.
+        """
+        
+        return self.derive() > seuil
+    
+    def mise_a_jour_incrementale(self, images):
+        """ 
+        Mise a jour du visage moyen et des k vecteurs principaux par SVD incrementale,
+        a partir des valeurs singulieres actuelles et des nouvelles images seulement.
+        La gallery reduite existante est reexprimee dans la nouvelle base, en O(n*k*k),
+        a partir de sa reconstruction dans l'ancienne base.
+        
+        Entree:
+            images:
+                La liste des nouvelles images.
+                Une image est representee par un np array.
+        """
+        
+        X = EG.linearisation(images).astype(np.float64)
+        n, m, k = self.n, X.shape[0], self.w_significatif.shape[1]
+        moyenne_lot = X.mean(axis = 0)
+        nouvelle_moyenne = (n*self.moyenne + m*moyenne_lot)/(n + m)
+        
+        valeurs_singulieres = np.sqrt(np.maximum(self.mu[:k], 0)*(n -1))
+        M = np.vstack((valeurs_singulieres[:, None]*self.w_significatif.transpose(),
+                       X - moyenne_lot,
+                       np.sqrt(n*m/(n + m))*(moyenne_lot - self.moyenne)))
+        s, Vt = np.linalg.svd(M, full_matrices = False)[1:]
+        nouvelle_base = Vt[:k].transpose()
+        
+        #Reexpression de la gallery reduite : Y' = (Y.W_t + moyenne - nouvelle_moyenne).W'
+        changement = self.w_significatif.transpose().dot(nouvelle_base)
+        decalage = (self.moyenne - nouvelle_moyenne).dot(nouvelle_base)
+        self._tampon = self.D_reduced.dot(changement) + decalage
+        
+        self.moyenne = nouvelle_moyenne
+        self.w_significatif = nouvelle_base
+        self.mu = s[:k]**2/(n + m -1)
+    
+    def sauvegarder(self, dossier):
+        """ 
+        Sauvegarde du modele dans un dossier, un fichier .npy non compresse par tableau.
+        Les noms sont stockes en chaines de taille fixe, ce qui evite tout recours a pickle.
+        Chaque fichier est ecrit a cote puis renomme, pour ne pas modifier les pages d'un modele deja charge par mmap.
+        
+        Entree:
+            dossier:
+                Le dossier dans lequel sauvegarder le modele, cree si besoin.
+        """
+        
+        os.makedirs(dossier, exist_ok = True)
+        for nom in FICHIERS_MODELE:
+            chemin = os.path.join(dossier, nom + ".npy")
+            #Un parametre inconnu n'est pas ecrit, et ne doit pas etre lu dans une sauvegarde precedente
+            if getattr(self, nom) is None:
+                if os.path.exists(chemin):
+                    os.remove(chemin)
+                continue
+            with open(chemin + ".tmp", "wb") as f:
+                np.save(f, np.asarray(getattr(self, nom)), allow_pickle = False)
+            os.replace(chemin + ".tmp", chemin)
+    
+    @classmethod
+    def charger(cls, dossier, mmap_mode = "r"):
+        """ 
+        Chargement d'un modele sauvegarde par sauvegarder.
+        Un fichier facultatif absent (voir FICHIERS_FACULTATIFS) prend la valeur par defaut du constructeur :
+        residu_reference est alors deduit de mu, qui contient toutes les valeurs propres pour les anciens modeles.
+        
+        Entree:
+            dossier:
+                Le dossier contenant le modele.
+            mmap_mode:
+                Le mode de projection en memoire passe a np.load ("r" par defaut, None pour tout charger en memoire).
+        
+        Sortie:
+            Le modele charge.
+        """
+        
+        tableaux = {}
+        for nom in FICHIERS_MODELE:
+            chemin = os.path.join(dossier, nom + ".npy")
+            if nom in FICHIERS_FACULTATIFS and not os.path.exists(chemin):
+                continue
+            tableaux[nom] = np.load(chemin, mmap_mode = mmap_mode, allow_pickle = False)
+        return cls(**tableaux)
@@ -4,6 +4,204 @@ Binome : DELECLUSE Raphael, CEUNINCK Guillaume
 """
 
 import numpy as np
+import Profilage
+
+#Nombre maximal d'elements d'une tuile de distances (2**22 float64 = 32 Mo)
+TAILLE_TUILE = 2**22
+
+def as_matrix(data, dtype = np.float64):
+    """ 
+    Mise sous forme d'une matrice (n, dim) d'une liste ou d'un np array d'images.
+    
+    Entree:
+        data: 
+            La liste ou la gallery d'images.
+            Une image est representee par un np array, eventuellement deja linearisee.
+        dtype:
+            Le type des elements de la matrice, None pour conserver celui de data (sans copie).
+    
+    Sortie:
+        Le np array de taille (n, dim) contenant chaque image linearisee.
+    """
+    
+    data = np.asarray(data, dtype = dtype)
+    return data.reshape(len(data), -1)
+
+#Metriques disponibles : chacune se ramene a la distance euclidienne au carre entre vecteurs transformes (voir preparer)
+METRIQUES = ("euclidienne", "blanchie", "cosinus")
+
+def echelle_metrique(metrique, mu = None, k = None):
+    """ 
+    Facteur multipliant chaque composante reduite pour la metrique choisie (voir preparer).
+    
+    Entree:
+        metrique:
+            La metrique (voir METRIQUES).
+        mu:
+            Les valeurs propres de l'ACP, par ordre decroissant (voir Eigenfaces.Calc_valeurs_vecteurs_propres).
+        k:
+            Le nombre de composantes reduites.
+    
+    Sortie:
+        Le np array des k facteurs, ou None si les composantes sont inchangees.
+    """
+    
+    if metrique not in METRIQUES:
+        raise ValueError("Metrique inconnue : " + str(metrique))
+    if metrique != "blanchie":
+        return None
+    if mu is None:
+        raise ValueError("Les valeurs propres mu sont necessaires pour la metrique blanchie")
+    return 1/np.sqrt(np.maximum(np.asarray(mu, dtype = np.float64)[:k], np.finfo(np.float64).tiny))
+
+def normaliser_lignes(data):
+    """ 
+    Normalisation sur place de chaque ligne d'un np array flottant (les lignes nulles sont laissees nulles).
+    """
+    
+    normes = np.sqrt(np.einsum("ij,ij->i", data, data))
+    normes[normes == 0] = 1
+    data /= normes[:, None]
+    return data
+
+def preparer(data, metrique = "euclidienne", mu = None, dtype = np.float64):
+    """ 
+    Transformation de vecteurs reduits dans l'espace ou la metrique choisie est la distance euclidienne au carre,
+    ce qui permet d'utiliser toutes les recherches de ce module sans modification :
+    * euclidienne : vecteurs inchanges ;
+    * blanchie : chaque composante divisee par son ecart type sqrt(mu), soit la distance de Mahalanobis dans l'espace de l'ACP ;
+    * cosinus : vecteurs normalises, la distance valant alors 2(1 - cos).
+    La gallery est preparee une seule fois et conservee ainsi ; les requetes le sont directement a la projection
+    (voir Eigenfaces.TransformateurEigenfaces), sans cout supplementaire par requete pour la metrique blanchie.
+    
+    Entree:
+        data:
+            La gallery ou les requetes reduites, de taille (n, k).
+        metrique:
+            La metrique (voir METRIQUES).
+        mu:
+            Les valeurs propres de l'ACP, necessaires pour la metrique blanchie.
+        dtype:
+            Le type flottant du resultat.
+    
+    Sortie:
+        Une copie transformee de data, de taille (n, k).
+    """
+    
+    data = np.array(as_matrix(data, None), dtype = dtype)
+    echelle = echelle_metrique(metrique, mu, data.shape[1])
+    if echelle is not None:
+        data *= echelle
+    if metrique == "cosinus":
+        normaliser_lignes(data)
+    return data
+
+@Profilage.etape
+def squared_norms(data, dtype = np.float64, taille_tuile = TAILLE_TUILE):
+    """ 
+    Calcule les normes au carre de chaque image de la gallery.
+    Ces normes peuvent etre calculees une seule fois et reutilisees pour toutes les requetes.
+    Une gallery stockee dans un type plus court que dtype (float16, int8) est convertie par tranches.
+    
+    Entree:
+        data: 
+            La liste ou la gallery d'images.
+            Une image est representee par un np array.
+        dtype:
+            Le type flottant des calculs.
+        taille_tuile:
+            Le nombre maximal d'elements d'une tranche convertie.
+    
+    Sortie:
+        Le np array contenant la norme au carre de chaque image.
+    """
+    
+    data = as_matrix(data, None)
+    norms = np.empty(len(data), dtype = dtype)
+    pas = max(1, taille_tuile // max(1, data.shape[1]))
+    for i in range(0, len(data), pas):
+        bloc = np.asarray(data[i:i + pas], dtype = dtype)
+        norms[i:i + pas] = np.einsum("ij,ij->i", bloc, bloc)
+    return norms
+
+def distance_tiles(data, queries, data_norms = None, taille_tuile = TAILLE_TUILE, dtype = np.float64):
+    """ 
+    Genere par tuiles la matrice des distances euclidiennes au carre entre les requetes et la gallery,
+    a l'aide du developpement ||a||² + ||b||² - 2ab.
+    Une tuile ne depasse jamais taille_tuile elements, ce qui borne la memoire utilisee.
+    
+    Entree:
+        data: 
+            La liste ou la gallery d'images.
+            Une image est representee par un np array. 
+        queries: 
+            La liste des requetes dont on cherche a calculer les distances qui les separent de chaque image.
+            Une image est representee par un np array.
+        data_norms:
+            Les normes au carre des images de la gallery (voir squared_norms), recalculees si absentes.
+        taille_tuile:
+            Le nombre maximal d'elements d'une tuile.
+        dtype:
+            Le type flottant des calculs et des tuiles. La gallery conserve son type de stockage
+            et n'est convertie qu'une tuile a la fois.
+    
+    Sortie:
+        Un generateur de triplets (lignes, colonnes, tuile):
+        *lignes: La tranche des requetes concernees.
+        *colonnes: La tranche des images de la gallery concernees.
+        *tuile: Le np array des distances au carre de taille (nb requetes, nb images).
+    """
+    
+    data = as_matrix(data, None)
+    queries = as_matrix(queries, dtype)
+    if data_norms is None:
+        data_norms = squared_norms(data, dtype, taille_tuile)
+    
+    n_data, n_queries = data.shape[0], queries.shape[0]
+    pas_colonnes = max(1, min(n_data, taille_tuile))
+    pas_lignes = max(1, taille_tuile // pas_colonnes)
+    
+    for i in range(0, n_queries, pas_lignes):
+        lignes = slice(i, min(i + pas_lignes, n_queries))
+        q = queries[lignes]
+        q_norms = np.einsum("ij,ij->i", q, q)
+        
+        for j in range(0, n_data, pas_colonnes):
+            colonnes = slice(j, min(j + pas_colonnes, n_data))
+            tuile = q.dot(np.asarray(data[colonnes], dtype = dtype).T)
+            tuile *= -2
+            tuile += q_norms[:, None]
+            tuile += data_norms[colonnes]
+            #Les erreurs d'arrondi peuvent rendre une distance legerement negative
+            np.maximum(tuile, 0, out = tuile)
+            yield lignes, colonnes, tuile
+
+@Profilage.etape
+def batch_euclidean_distances(data, queries, data_norms = None, taille_tuile = TAILLE_TUILE):
+    """ 
+    Calcule la matrice des distances euclidiennes au carre entre chaque requete et chaque image de la gallery.
+    
+    Entree:
+        data: 
+            La liste ou la gallery d'images.
+            Une image est representee par un np array. 
+        queries: 
+            La liste des requetes dont on cherche a calculer les distances qui les separent de chaque image.
+            Une image est representee par un np array.
+        data_norms:
+            Les normes au carre des images de la gallery (voir squared_norms), recalculees si absentes.
+        taille_tuile:
+            Le nombre maximal d'elements d'une tuile.
+    
+    Sortie:
+        distances:
+            Le np array de taille (nb requetes, nb images) des distances au carre.
+    """
+    
+    distances = np.empty((len(queries), len(data)))
+    for lignes, colonnes, tuile in distance_tiles(data, queries, data_norms, taille_tuile):
+        distances[lignes, colonnes] = tuile
+    return distances
 
 def euclidean_distances(data, q):
     """ 
@@ -21,11 +219,8 @@ def euclidean_distances(data, q):
         distances:
             Le np array contenant l'ensemble des distances qui separent la requete de chaque image de la gallery.
 	"""
-    distances = np.zeros(len(data))
-    for i, d in enumerate(data):
-        distances[i] = np.sum((d-q)**2)
-    return distances
-    
+    return batch_euclidean_distances(data, [q])[0]
+
 def radius_search(data, q, r):
 	""" 
     Retourne la liste des indices des plus proches voisins de la requete q dont la distance est inferieure au rayon r.
@@ -44,14 +239,14 @@ def radius_search(data, q, r):
         indices:
             La liste des indices plus proches voisins de la requete q selon r.
     """
-    
-	distances = euclidean_distances(data, q)
-	indices = np.where(distances <= r)[0]
-	return indices
 
-def NN_bf_search(data, queries, r):
+	return NN_bf_search(data, [q], r)[0]
+
+@Profilage.etape
+def NN_bf_search(data, queries, r, data_norms = None, taille_tuile = TAILLE_TUILE, dtype = np.float64):
     """ 
     Retourne la liste des indices des plus proches voisins sur l'ensemble des requetes, dont la distance est inferieure au rayon r.
+    Les distances sont calculees par tuiles (voir distance_tiles) sans jamais construire la matrice complete.
     
     Entree:
         data: 
@@ -62,15 +257,157 @@ def NN_bf_search(data, queries, r):
             Une image est representee par un np array.
         r:
             Le rayon delimitant la distance maximale requise pour etre considere comme l'un des plus proches voisins.
+        data_norms:
+            Les normes au carre des images de la gallery (voir squared_norms), recalculees si absentes.
+        taille_tuile:
+            Le nombre maximal d'elements d'une tuile.
+        dtype:
+            Le type flottant des calculs (voir distance_tiles).
     
     Sortie:
         indices:
             La liste des indices des plus proches voisins sur l'ensemble des requetes, selon r.
     """
+    hits = [[] for q in range(len(queries))]
+    
+    for lignes, colonnes, tuile in distance_tiles(data, queries, data_norms, taille_tuile, dtype):
+        rows, cols = np.nonzero(tuile <= r)
+        coupures = np.searchsorted(rows, np.arange(1, tuile.shape[0]))
+        for i, cols_i in enumerate(np.split(cols, coupures)):
+            hits[lignes.start + i].append(cols_i + colonnes.start)
+    
     indices = []
-
-    for i, q in enumerate(queries):
-        ind = radius_search(data, q, r)
-        indices.append(ind)
+    for h in hits:
+        indices.append(np.concatenate(h) if len(h) > 0 else np.array([], dtype = np.int64))
     
     return indices
+
+def _segments_identites(ids):
+    """ 
+    Ordre stable regroupant les images par identite, debut de chaque groupe dans cet ordre et identite de chaque groupe.
+    """
+    
+    ordre = np.argsort(ids, kind = "stable")
+    ids_tries = ids[ordre]
+    debuts = np.flatnonzero(np.concatenate(([True], ids_tries[1:] != ids_tries[:-1])))
+    return ordre, debuts, ids_tries[debuts]
+
+def _tri_candidats(distances, indices):
+    #Tri de chaque ligne par distance croissante, puis par indice en cas d'egalite
+    ordre = np.lexsort((indices, distances), axis = 1)
+    return np.take_along_axis(distances, ordre, axis = 1), np.take_along_axis(indices, ordre, axis = 1)
+
+def _k_meilleurs(distances, indices, k):
+    """ 
+    Les k meilleurs candidats de chaque ligne, par distance croissante puis par indice en cas d'egalite.
+    np.argpartition ne departage pas les egalites sur la k-ieme distance : tous les candidats a distance inferieure
+    ou egale a celle-ci sont conserves (par un tri stable sur un booleen, lineaire), puis seuls eux sont tries.
+    """
+    
+    if distances.shape[1] > k:
+        seuil = np.partition(distances, k - 1, axis = 1)[:, k - 1:k]
+        retenus = distances <= seuil
+        m = max(k, int(retenus.sum(axis = 1).max()))
+        garder = np.argsort(~retenus, axis = 1, kind = "stable")[:, :m]
+        distances, indices = np.take_along_axis(distances, garder, axis = 1), np.take_along_axis(indices, garder, axis = 1)
+    distances, indices = _tri_candidats(distances, indices)
+    return distances[:, :k], indices[:, :k]
+
+@Profilage.etape
+def knn_search(data, queries, k, identites = None, par_identite = False, data_norms = None, taille_tuile = TAILLE_TUILE, dtype = np.float64):
+    """ 
+    Identification : retourne pour chaque requete ses k plus proches voisins, tries par distance croissante.
+    Les distances sont calculees par tuiles (voir distance_tiles) ; chaque tuile est reduite a ses k meilleurs candidats
+    (voir _k_meilleurs), fusionnes avec ceux des tuiles precedentes. Le cout par requete est en O(n + k log k) hors egalites,
+    et la taille du resultat ne depend que de k, quel que soit l'eloignement des voisins.
+    
+    Entree:
+        data: 
+            La liste ou la gallery d'images.
+            Une image est representee par un np array. 
+        queries: 
+            La liste des requetes.
+            Une image est representee par un np array.
+        k:
+            Le nombre de voisins recherches (ramene au nombre d'images, ou d'identites, disponibles).
+        identites:
+            L'identite de chaque image de la gallery (par exemple la partie X des noms X.Y, ou des entiers).
+        par_identite:
+            Si True, une seule image par identite est retenue, la plus proche : les k voisins sont k identites distinctes.
+        data_norms:
+            Les normes au carre des images de la gallery (voir squared_norms), recalculees si absentes.
+        taille_tuile:
+            Le nombre maximal d'elements d'une tuile.
+        dtype:
+            Le type flottant des calculs (voir distance_tiles).
+    
+    Sortie:
+        indices:
+            Le np array de taille (nb requetes, k) des indices des voisins dans la gallery.
+        distances:
+            Le np array de taille (nb requetes, k) des distances au carre correspondantes.
+        identites_voisins:
+            Le np array de taille (nb requetes, k) des identites des voisins, None si identites n'est pas fourni.
+    """
+    
+    queries = as_matrix(queries, dtype)
+    n_queries = len(queries)
+    
+    if identites is not None:
+        etiquettes, ids = np.unique(np.asarray(identites), return_inverse = True)
+        ids = ids.ravel()
+    elif par_identite:
+        raise ValueError("Les identites des images sont necessaires pour un resultat par identite")
+    
+    k = min(k, len(etiquettes) if par_identite else len(data))
+    indices = np.full((n_queries, k), -1, dtype = np.int64)
+    distances = np.full((n_queries, k), np.inf)
+    segments = {}
+    lignes_courantes = None
+    
+    def finaliser(lignes, cand_d, cand_i):
+        distances[lignes], indices[lignes] = _k_meilleurs(cand_d, cand_i, k)
+    
+    if k > 0:
+        for lignes, colonnes, tuile in distance_tiles(data, queries, data_norms, taille_tuile, dtype):
+            if lignes != lignes_courantes:
+                if lignes_courantes is not None:
+                    finaliser(lignes_courantes, cand_d, cand_i)
+                lignes_courantes = lignes
+                if par_identite:
+                    cand_d = np.full((len(tuile), len(etiquettes)), np.inf)
+                    cand_i = np.full((len(tuile), len(etiquettes)), -1, dtype = np.int64)
+                else:
+                    cand_d = np.empty((len(tuile), 0))
+                    cand_i = np.empty((len(tuile), 0), dtype = np.int64)
+            
+            if par_identite:
+                #Distance minimale de chaque identite de la tuile, par reduction sur les images regroupees par identite
+                if colonnes.start not in segments:
+                    segments[colonnes.start] = _segments_identites(ids[colonnes])
+                ordre, debuts, u = segments[colonnes.start]
+                c = len(ordre)
+                tuile = tuile[:, ordre]
+                minimums = np.minimum.reduceat(tuile, debuts, axis = 1)
+                #Premiere image atteignant le minimum de son identite
+                egal = tuile == np.repeat(minimums, np.diff(np.append(debuts, c)), axis = 1)
+                premiere = c - np.maximum.reduceat(np.where(egal, c - np.arange(c), 0), debuts, axis = 1)
+                meilleur = minimums < cand_d[:, u]
+                cand_d[:, u] = np.where(meilleur, minimums, cand_d[:, u])
+                cand_i[:, u] = np.where(meilleur, ordre[premiere] + colonnes.start, cand_i[:, u])
+            else:
+                colonnes_tuile = np.broadcast_to(np.arange(colonnes.start, colonnes.start + tuile.shape[1]), tuile.shape)
+                tuile_d, tuile_i = _k_meilleurs(tuile, colonnes_tuile, k)
+                cand_d = np.concatenate((cand_d, tuile_d), axis = 1)
+                cand_i = np.concatenate((cand_i, tuile_i), axis = 1)
+                if cand_d.shape[1] > 2*k:
+                    cand_d, cand_i = _k_meilleurs(cand_d, cand_i, k)
+        
+        if lignes_courantes is not None:
+            finaliser(lignes_courantes, cand_d, cand_i)
+    
+    identites_voisins = None
+    if identites is not None:
+        identites_voisins = etiquettes[ids[indices]]
+    
+    return indices, distances, identites_voisins
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Binome : DELECLUSE Raphael, CEUNINCK Guillaume
+"""
+
+import os
+import numpy as np
+from multiprocessing import Pool, shared_memory
+import NN_brute_force as NN_BF
+
+#Gallery et normes vues par chaque processus du pool (voir _attacher)
+_gallery = {}
+
+def _attacher(source, shape):
+    """ 
+    Initialisation d'un processus du pool : la gallery est ouverte une seule fois, sans copie,
+    depuis la memoire partagee ou depuis le fichier .npy projete en memoire ; ses normes sont toujours en memoire partagee.
+    """
+    
+    _gallery["memoires"] = [shared_memory.SharedMemory(name = nom) for nom in source[2:]]
+    _gallery["norms"] = np.ndarray(shape[:1], dtype = np.float64, buffer = _gallery["memoires"][-1].buf)
+    if source[0] == "memoire":
+        _gallery["data"] = np.ndarray(shape, dtype = np.float64, buffer = _gallery["memoires"][0].buf)
+    else:
+        _gallery["data"] = np.load(source[1], mmap_mode = "r")
+
+def _fichier_npy_entier(data):
+    """ 
+    Retourne vrai si data est la projection en memoire de tout le contenu d'un fichier .npy de float64 en ordre C
+    (np.load(fichier, mmap_mode = "r")), et peut donc etre rouverte a l'identique par np.load. Une tranche, un np.memmap
+    ouvert avec un autre offset ou sur un fichier d'un autre format ne le sont pas.
+    """
+    
+    if not isinstance(data, np.memmap) or data.filename is None or data.dtype != np.float64 or data.ndim != 2 or not data.flags.c_contiguous:
+        return False
+    try:
+        with open(data.filename, "rb") as f:
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            elif version == (2, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            else:
+                return False
+            longueur_entete = f.tell()
+    except (OSError, ValueError):
+        return False
+    return data.offset == longueur_entete and tuple(shape) == data.shape and not fortran_order and dtype == np.float64
+
+def _rechercher_shard(debut, fin, queries, r):
+    """ 
+    Recherche par rayon dans la tranche debut:fin de la gallery, executee par un processus du pool.
+    Seules les requetes et les indices trouves transitent entre processus.
+    """
+    
+    return [indices + debut for indices in NN_BF.NN_bf_search(_gallery["data"][debut:fin], queries, r, _gallery["norms"][debut:fin])]
+
+class RechercheParallele:
+    """ 
+    Recherche par rayon en force brute repartie sur un pool de processus, respectant le meme contrat que NN_brute_force
+    (radius_search, NN_search).
+    
+    La gallery est decoupee en shards contigus. Elle est placee une seule fois en memoire partagee
+    (multiprocessing.shared_memory) avec ses normes, ou, si c'est un fichier .npy entier projete en memoire (voir _fichier_npy_entier),
+    rouverte par chaque processus depuis le disque, seules ses normes etant en memoire partagee : elle n'est jamais copiee lors des envois aux processus.
+    Les voisins trouves dans chaque shard sont fusionnes dans l'ordre des shards, ce qui donne
+    les memes listes d'indices que NN_brute_force.NN_bf_search.
+    """
+    
+    def __init__(self, data, nb_processus = None, nb_shards = None):
+        """ 
+        Entree:
+            data:
+                La gallery, de taille (n, dim), ou un np array issu de np.load(fichier .npy, mmap_mode = "r").
+                Les autres np.memmap (tranches, autres formats) sont copies en memoire partagee.
+            nb_processus:
+                Le nombre de processus du pool, par defaut le nombre de coeurs.
+            nb_shards:
+                Le nombre de tranches de la gallery, par defaut le nombre de processus.
+        """
+        
+        if nb_processus is None:
+            nb_processus = os.cpu_count()
+        if nb_shards is None:
+            nb_shards = nb_processus
+        self.memoires = []
+        
+        if _fichier_npy_entier(data):
+            tableaux = (NN_BF.squared_norms(data),)
+            source = ("fichier", data.filename)
+        else:
+            data = NN_BF.as_matrix(data)
+            tableaux = (data, NN_BF.squared_norms(data))
+            source = ("memoire", None)
+        shape = data.shape
+        
+        for tableau in tableaux:
+            memoire = shared_memory.SharedMemory(create = True, size = max(tableau.nbytes, 1))
+            np.ndarray(tableau.shape, dtype = np.float64, buffer = memoire.buf)[:] = tableau
+            self.memoires.append(memoire)
+        source += tuple(memoire.name for memoire in self.memoires)
+        
+        bornes = np.linspace(0, shape[0], nb_shards + 1).astype(int)
+        self.shards = [(debut, fin) for debut, fin in zip(bornes[:-1], bornes[1:]) if fin > debut]
+        self.pool = Pool(nb_processus, initializer = _attacher, initargs = (source, shape))
+    
+    def NN_search(self, queries, r):
+        """ 
+        Retourne la liste des indices des plus proches voisins sur l'ensemble des requetes, dont la distance est inferieure au rayon r.
+        
+        Entree:
+            queries:
+                La liste des requetes.
+                Une image est representee par un np array.
+            r:
+                Le rayon delimitant la distance maximale requise pour etre considere comme l'un des plus proches voisins.
+        
+        Sortie:
+            indices:
+                La liste des indices des plus proches voisins sur l'ensemble des requetes, selon r.
+        """
+        
+        queries = NN_BF.as_matrix(queries)
+        par_shard = self.pool.starmap(_rechercher_shard, [(debut, fin, queries, r) for debut, fin in self.shards])
+        if len(par_shard) == 0:
+            return [np.array([], dtype = np.int64) for q in queries]
+        return [np.concatenate(indices) for indices in zip(*par_shard)]
+    
+    def radius_search(self, q, r):
+        """ 
+        Retourne la liste des indices des plus proches voisins de la requete q dont la distance est inferieure au rayon r.
+        """
+        
+        return self.NN_search([q], r)[0]
+    
+    def fermer(self):
+        """ 
+        Arret du pool et liberation de la memoire partagee.
+        """
+        
+        self.pool.close()
+        self.pool.join()
+        for memoire in self.memoires:
+            memoire.close()
+            memoire.unlink()
+        self.memoires = []
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        #En cas d'erreur, les processus sont arretes sans attendre la fin des taches en cours
+        if exc[0] is not None:
+            self.pool.terminate()
+        self.fermer()
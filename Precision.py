@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+Binome : DELECLUSE Raphael, CEUNINCK Guillaume
+"""
+
+import os
+import time
+import numpy as np
+import NN_brute_force as NN_BF
+import Eigenfaces as EG
+import Generation_data
+import Metrics as Mt
+
+#Politiques de precision : type flottant des calculs (ACP, projection, distances) et type de stockage de la gallery reduite.
+#Les images brutes restent en uint8 dans tous les cas (voir Eigenfaces.ACP_efficace_complete).
+POLITIQUES = {
+    "float64": (np.float64, np.float64),
+    "float32": (np.float32, np.float32),
+    "float16": (np.float32, np.float16),
+    "int8": (np.float32, np.int8),
+}
+
+class GalleryReduite:
+    """ 
+    Gallery reduite stockee en precision reduite (float16 ou int8), respectant le meme contrat que NN_brute_force
+    (radius_search, NN_search).
+    
+    Les distances sont toujours accumulees dans le type de calcul (float32) : chaque tuile de la gallery n'est convertie
+    qu'au moment du calcul (voir NN_brute_force.distance_tiles). En int8, une echelle unique est commune a toutes les composantes :
+    la distance entre codes est la distance reelle divisee par echelle², les requetes et le rayon sont donc simplement remis a l'echelle.
+    """
+    
+    def __init__(self, D_reduced, stockage = np.float16, calcul = np.float32):
+        """ 
+        Entree:
+            D_reduced:
+                La gallery reduite, de taille (n, k).
+            stockage:
+                Le type de stockage (np.float64, np.float32, np.float16 ou np.int8).
+            calcul:
+                Le type flottant des calculs de distances.
+        """
+        
+        D_reduced = NN_BF.as_matrix(D_reduced, None)
+        self.stockage = np.dtype(stockage)
+        self.calcul = np.dtype(calcul)
+        self.echelle = 1.0
+        
+        if self.stockage.kind == "i":
+            amplitude = np.abs(D_reduced).max() if D_reduced.size > 0 else 0
+            if amplitude > 0:
+                self.echelle = float(amplitude)/np.iinfo(self.stockage).max
+            self.data = np.rint(D_reduced/self.echelle).astype(self.stockage)
+        else:
+            self.data = D_reduced.astype(self.stockage)
+        
+        self.norms = NN_BF.squared_norms(self.data, self.calcul)
+    
+    def octets(self):
+        """ 
+        Retourne la memoire occupee par la gallery stockee et ses normes, en octets.
+        """
+        
+        return self.data.nbytes + self.norms.nbytes
+    
+    def decoder(self):
+        """ 
+        Retourne la gallery reconstruite dans le type de calcul.
+        """
+        
+        return self.data.astype(self.calcul)*self.calcul.type(self.echelle)
+    
+    def requetes(self, queries):
+        """ 
+        Retourne les requetes converties dans le type de calcul et remises a l'echelle des codes stockes.
+        """
+        
+        return NN_BF.as_matrix(queries, self.calcul)/self.calcul.type(self.echelle)
+    
+    def NN_search(self, queries, r):
+        """ 
+        Retourne la liste des indices des plus proches voisins sur l'ensemble des requetes, dont la distance est inferieure au rayon r.
+        
+        Entree:
+            queries:
+                La liste des requetes.
+                Une image est representee par un np array.
+            r:
+                Le rayon delimitant la distance maximale requise pour etre considere comme l'un des plus proches voisins.
+        
+        Sortie:
+            indices:
+                La liste des indices des plus proches voisins sur l'ensemble des requetes, selon r.
+        """
+        
+        return NN_BF.NN_bf_search(self.data, self.requetes(queries), r/self.echelle**2, self.norms, dtype = self.calcul)
+    
+    def radius_search(self, q, r):
+        """ 
+        Retourne la liste des indices des plus proches voisins de la requete q dont la distance est inferieure au rayon r.
+        """
+        
+        return self.NN_search([q], r)[0]
+    
+    def distances_minimales(self, data_names, names, probes):
+        """ 
+        Equivalent de Metrics.distances_minimales sur la gallery stockee.
+        """
+        
+        d_min, d_meme = Mt.distances_minimales(self.data, data_names, names, self.requetes(probes), self.calcul)
+        return d_min*self.echelle**2, d_meme*self.echelle**2
+
+def taux_roc(d_min_known, d_meme_known, d_min_unknown, radius):
+    """ 
+    Calcule les taux de vrais positifs et de faux positifs pour chaque radius (voir Metrics.mesure_cas_balayage).
+    """
+    
+    TP, TN, FP, FN = Mt.mesure_cas_balayage(d_min_known, d_meme_known, d_min_unknown, radius)
+    return TP/np.maximum(TP + FN, 1), FP/np.maximum(FP + TN, 1)
+
+def benchmark_precision(data, data_names, probes_known, names_known, probes_unknown, names_unknown, rule = "Coude", politiques = POLITIQUES, nb_radius = 1000):
+    """ 
+    Compare les politiques de precision sur une meme repartition gallery/requetes : memoire de la gallery reduite et de la base,
+    temps de l'ACP, de la projection des requetes et du calcul des distances, et ecart des courbes ROC a la politique float64.
+    
+    Entree:
+        data, data_names, probes_known, names_known, probes_unknown, names_unknown:
+            La repartition gallery/requetes (voir Generation_data.generation_data), avec les images brutes.
+        rule:
+            Le critere de selection des vecteurs principaux.
+        politiques:
+            Le dictionnaire des politiques testees (voir POLITIQUES), dont la premiere sert de reference.
+        nb_radius:
+            Le nombre de radius, de 0 a la plus grande distance minimale de reference, auxquels les courbes ROC sont comparees.
+    
+    Sortie:
+        La liste des [politique, octets gallery, octets base, tps ACP, tps projection, tps recherche,
+        ecart max des taux de vrais positifs, ecart max des taux de faux positifs, erreur relative mediane des distances minimales].
+    """
+    
+    data_names, names_known, names_unknown = Mt.identites_entieres(data_names, names_known, names_unknown)
+    res, reference = [], None
+    
+    for nom, (calcul, stockage) in politiques.items():
+        startTime = time.time()
+        #Sans cache des decompositions, pour mesurer chaque ACP
+        D_reduced, w_significatif, mu, moyenne = EG.ACP_efficace_complete(data, rule, dtype = calcul)
+        tps_acp = time.time() - startTime
+        
+        startTime = time.time()
+        transformateur = EG.TransformateurEigenfaces(moyenne, w_significatif, calcul)
+        known_reduced = transformateur.transform(probes_known).copy()
+        unknown_reduced = transformateur.transform(probes_unknown).copy()
+        tps_projection = time.time() - startTime
+        
+        gallery = GalleryReduite(D_reduced, stockage, calcul)
+        startTime = time.time()
+        d_min_known, d_meme_known = gallery.distances_minimales(data_names, names_known, known_reduced)
+        d_min_unknown = gallery.distances_minimales(data_names, names_unknown, unknown_reduced)[0]
+        tps_recherche = time.time() - startTime
+        
+        if reference is None:
+            radius = np.linspace(0, max(d_min_known.max(), d_min_unknown.max()), nb_radius)
+            reference = taux_roc(d_min_known, d_meme_known, d_min_unknown, radius), np.concatenate((d_min_known, d_min_unknown))
+        
+        tpr, fpr = taux_roc(d_min_known, d_meme_known, d_min_unknown, radius)
+        d_min_ref = reference[1]
+        erreur = np.abs(np.concatenate((d_min_known, d_min_unknown)) - d_min_ref)/np.maximum(d_min_ref, 1e-12)
+        
+        res.append([nom, gallery.octets(), transformateur.w.nbytes, tps_acp, tps_projection, tps_recherche,
+                    np.abs(tpr - reference[0][0]).max(), np.abs(fpr - reference[0][1]).max(), np.median(erreur)])
+        print("%-8s gallery %9d o  base %10d o  ACP %.3f s  projection %.4f s  recherche %.4f s  ecart TPR %.4f  ecart FPR %.4f  erreur distances %.1e"
+              % tuple(res[-1]))
+    
+    return res
+
+if __name__ == "__main__":
+    if os.path.isfile("data_npy/data.gal"):
+        data, data_names, probes_unknown, names_unknown, probes_known, names_known = Generation_data.load_data()
+    else:
+        database, database_names = Generation_data.load_images_from_folder("data/dataset1/images")
+        data, data_names, probes_unknown, names_unknown, probes_known, names_known = Generation_data.generation_data(database, database_names, seed = 0)
+    benchmark_precision(data, data_names, probes_known, names_known, probes_unknown, names_unknown)
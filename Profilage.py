@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+Binome : DELECLUSE Raphael, CEUNINCK Guillaume
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+import functools
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    #Module absent sous Windows : le pic de memoire residente n'est alors pas mesure
+    resource = None
+
+#Le profilage est desactive par defaut ; il peut etre active par activer() ou par la variable d'environnement PROFILAGE=1
+_actif = False
+_memoire = False
+_tracemalloc_demarre = False
+_registre = {}
+_verrou = threading.Lock()
+_local = threading.local()
+
+def activer(memoire = True):
+    """ 
+    Activation du profilage.
+    
+    Entree:
+        memoire:
+            Mesure aussi les octets alloues par chaque etape (tracemalloc), ce qui ralentit les allocations.
+    """
+    
+    global _actif, _memoire, _tracemalloc_demarre
+    _memoire = memoire
+    if memoire and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _tracemalloc_demarre = True
+    _actif = True
+
+def desactiver():
+    """ 
+    Desactivation du profilage. Le registre est conserve.
+    """
+    
+    global _actif, _memoire, _tracemalloc_demarre
+    _actif = False
+    #tracemalloc n'est arrete que s'il a ete demarre par activer()
+    if _tracemalloc_demarre:
+        tracemalloc.stop()
+        _tracemalloc_demarre = False
+    _memoire = False
+
+def est_actif():
+    return _actif
+
+def reinitialiser():
+    """ 
+    Remise a zero du registre.
+    """
+    
+    with _verrou:
+        _registre.clear()
+
+def _pic_rss():
+    if resource is None:
+        return 0
+    #ru_maxrss est en kilo-octets sous Linux, en octets sous macOS
+    pic = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pic if sys.platform == "darwin" else pic*1024
+
+class Mesure:
+    """ 
+    Gestionnaire de contexte mesurant une etape : temps, nombre d'appels, octets alloues au plus fort de l'etape
+    (au-dela de la memoire deja allouee a son debut) et pic de memoire residente du processus a sa sortie.
+    Les etapes peuvent etre imbriquees : chacune compte son temps et sa memoire, sous-etapes comprises.
+        
+        with Profilage.Mesure("Projet.balayage"):
+            ...
+    """
+    
+    def __init__(self, nom):
+        self.nom = nom
+    
+    def __enter__(self):
+        if not _actif:
+            self.debut = None
+            return self
+        
+        if _memoire and tracemalloc.is_tracing():
+            pile = getattr(_local, "pile", None)
+            if pile is None:
+                pile = _local.pile = []
+            courant, pic = tracemalloc.get_traced_memory()
+            #Le pic atteint jusqu'ici est reporte sur l'etape englobante avant sa remise a zero
+            if pile:
+                pile[-1][1] = max(pile[-1][1], pic)
+            tracemalloc.reset_peak()
+            self.memoire = [courant, courant]
+            pile.append(self.memoire)
+        else:
+            self.memoire = None
+        
+        self.debut = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        if self.debut is None:
+            return False
+        duree = time.perf_counter() - self.debut
+        
+        octets = 0
+        if self.memoire is not None and tracemalloc.is_tracing():
+            pile = _local.pile
+            pic = max(self.memoire[1], tracemalloc.get_traced_memory()[1])
+            octets = pic - self.memoire[0]
+            pile.pop()
+            if pile:
+                pile[-1][1] = max(pile[-1][1], pic)
+            tracemalloc.reset_peak()
+        
+        rss = _pic_rss()
+        with _verrou:
+            stats = _registre.setdefault(self.nom, {"appels": 0, "secondes": 0.0, "secondes_max": 0.0, "octets_max": 0, "pic_rss": 0})
+            stats["appels"] += 1
+            stats["secondes"] += duree
+            stats["secondes_max"] = max(stats["secondes_max"], duree)
+            stats["octets_max"] = max(stats["octets_max"], octets)
+            stats["pic_rss"] = max(stats["pic_rss"], rss)
+        return False
+
+def etape(fonction):
+    """ 
+    Decorateur enregistrant chaque appel de la fonction comme une etape nommee Module.fonction (voir Mesure).
+    Profilage desactive, il ne coute qu'un test par appel.
+    """
+    
+    nom = fonction.__module__ + "." + fonction.__qualname__
+    
+    @functools.wraps(fonction)
+    def enveloppe(*args, **kwargs):
+        if not _actif:
+            return fonction(*args, **kwargs)
+        with Mesure(nom):
+            return fonction(*args, **kwargs)
+    
+    return enveloppe
+
+def registre():
+    """ 
+    Retourne une copie du registre : le dictionnaire associant a chaque etape son nombre d'appels, son temps cumule
+    et maximal (secondes), ses octets alloues maximaux et le pic de memoire residente du processus (octets).
+    """
+    
+    with _verrou:
+        return {nom: dict(stats) for nom, stats in _registre.items()}
+
+def exporter_json(chemin = None):
+    """ 
+    Exporte le registre au format JSON, dans le fichier chemin s'il est donne.
+    
+    Sortie:
+        Le texte JSON.
+    """
+    
+    texte = json.dumps(registre(), indent = 2, sort_keys = True)
+    if chemin is not None:
+        with open(chemin, "w") as f:
+            f.write(texte)
+    return texte
+
+#Metriques Prometheus : (nom, type, description, champ du registre)
+_METRIQUES_PROMETHEUS = (
+    ("eigenfaces_etape_appels_total", "counter", "Nombre d'appels de l'etape.", "appels"),
+    ("eigenfaces_etape_secondes_total", "counter", "Temps cumule passe dans l'etape.", "secondes"),
+    ("eigenfaces_etape_secondes_max", "gauge", "Duree maximale d'un appel de l'etape.", "secondes_max"),
+    ("eigenfaces_etape_octets_alloues_max", "gauge", "Octets alloues au plus fort d'un appel de l'etape (tracemalloc).", "octets_max"),
+    ("eigenfaces_etape_pic_rss_octets", "gauge", "Pic de memoire residente du processus a la sortie de l'etape.", "pic_rss"),
+)
+
+def exporter_prometheus():
+    """ 
+    Exporte le registre au format texte de Prometheus.
+    
+    Sortie:
+        Le texte, une serie par etape pour chaque metrique.
+    """
+    
+    stats = registre()
+    lignes = []
+    for nom, type_metrique, description, champ in _METRIQUES_PROMETHEUS:
+        lignes.append("# HELP %s %s" % (nom, description))
+        lignes.append("# TYPE %s %s" % (nom, type_metrique))
+        for etape_nom in sorted(stats):
+            etiquette = etape_nom.replace("\\", "\\\\").replace('"', '\\"')
+            lignes.append('%s{etape="%s"} %s' % (nom, etiquette, repr(stats[etape_nom][champ])))
+    return "\n".join(lignes) + "\n"
+
+if os.environ.get("PROFILAGE", "") not in ("", "0"):
+    activer()
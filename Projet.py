@@ -3,51 +3,89 @@
 Binome : DELECLUSE Raphael, CEUNINCK Guillaume
 """
 
+import os
 import numpy as np
 import NN_brute_force as NN_BF
 import Eigenfaces as EG
 import Generation_data 
 import Metrics as Mt
+import Modele
+import Verification
+import Profilage
+import Cache
+
+#Cache des decompositions de l'ACP, conserve sur disque dans la limite de 4 Go (voir Cache.CacheDecomposition)
+CACHE_ACP = Cache.CacheDecomposition(dossier = "cache_acp", octets_max_disque = 2**32)
 
 def is_authorised(data,probe,radius):
     boolean = False
     
+    #Un index (voir Index_arbre.KDTree, Verification.Verificateur) s'arrete au premier voisin trouve
+    if hasattr(data, "existe"):
+        return data.existe(probe, radius)
+    
     indices_probe = NN_BF.radius_search(data, probe, radius)
     if len(indices_probe) != 0:
         boolean = True
     return boolean
 
-def test(radius, dataset = 1, rule = "Coude", rayon_max = 10**8, pas = 10**6, calc_speedup = 0):
+def test(radius, dataset = 1, rule = "Coude", rayon_max = 10**8, pas = 10**6, calc_speedup = 0, dossier_modele = None, profilage = False, metrique = "euclidienne", solveur = "eigh"):
+    
+    #Mesure du temps et de la memoire de chaque etape (voir Profilage), exportee dans data_npy/profilage.json
+    if profilage:
+        Profilage.activer()
     
     if dataset == 1:
         folder="data/dataset1/images"
     elif dataset == 2:
         folder="data/dataset2/images"
-
-    print("---Generation donnees---\n")
-    database, database_names = Generation_data.load_images_from_folder(folder)
-    data, data_names, probes_unknown, names_unknown, probes_known, names_known = Generation_data.generation_data(database, database_names)
-    Generation_data.save_data(data, data_names, probes_unknown, names_unknown, probes_known, names_known)
-
-    print("---Reduction de la dimension des donnees---\n")
-    D_reduced, w_significatif = EG.ACP_efficace(data, rule)
-
-    probes_known_centered = EG.transform_data(probes_known)
-    probes_known_reduced = EG.projection(probes_known_centered, w_significatif)
     
-    probes_unknown_centered = EG.transform_data(probes_unknown)
-    probes_unknown_reduced = EG.projection(probes_unknown_centered, w_significatif)
+    if dossier_modele is not None and os.path.isdir(dossier_modele):
+        print("---Chargement du modele---\n")
+        modele = Modele.ModeleEigenfaces.charger(dossier_modele)
+        data, data_names, probes_unknown, names_unknown, probes_known, names_known = Generation_data.load_data()
+        
+        #Le modele sauvegarde n'est reutilise que s'il a ete ajuste avec le critere et le solveur demandes
+        if not modele.ajuste_avec(rule, solveur):
+            print("---Modele sauvegarde avec d'autres parametres, nouvel ajustement---\n")
+            modele = Modele.ModeleEigenfaces.ajuster(data, data_names, rule, solveur, cache = CACHE_ACP)
+            modele.sauvegarder(dossier_modele)
+    else:
+        print("---Generation donnees---\n")
+        database, database_names = Generation_data.load_images_from_folder(folder)
+        data, data_names, probes_unknown, names_unknown, probes_known, names_known = Generation_data.generation_data(database, database_names)
+        Generation_data.save_data(data, data_names, probes_unknown, names_unknown, probes_known, names_known)
+        
+        print("---Reduction de la dimension des donnees---\n")
+        modele = Modele.ModeleEigenfaces.ajuster(data, data_names, rule, solveur, cache = CACHE_ACP)
+        if dossier_modele is not None:
+            modele.sauvegarder(dossier_modele)
+    
+    #Gallery et requetes preparees pour la metrique choisie (voir NN_brute_force.preparer) ;
+    #pour les metriques blanchie et cosinus, radius, rayon_max et pas sont a l'echelle des distances correspondantes
+    D_reduced = modele.gallery(metrique)
     
-    print("Test probe connu :", is_authorised(D_reduced, probes_known_reduced[0], radius))
-    print("Test probe inconnu :", is_authorised(D_reduced, probes_unknown_reduced[0], radius))
+    #Les requetes sont centrees par rapport au visage moyen de la gallery, et non par rapport au leur
+    transformateur = modele.transformateur(metrique = metrique)
+    probes_known_reduced = transformateur.transform(probes_known)
+    probes_unknown_reduced = transformateur.transform(probes_unknown)
+    
+    verificateur = Verification.Verificateur(D_reduced, data_names)
+    print("Test probe connu :", is_authorised(verificateur, probes_known_reduced[0], radius))
+    print("Test probe inconnu :", is_authorised(verificateur, probes_unknown_reduced[0], radius))
     print("---Metrics---\n")
-    metrics = np.array(Mt.evaluation(D_reduced, data_names, names_known, names_unknown, probes_known_reduced, probes_unknown_reduced, pas, rayon_max))
+    metrics = np.array(Mt.evaluation(D_reduced, data_names, names_known, names_unknown, probes_known_reduced, probes_unknown_reduced, pas, rayon_max, mode = "balayage"))
     Mt.save_metrics(metrics)
+    
+    if profilage:
+        print(Profilage.exporter_json('data_npy/profilage.json'))
+        Profilage.desactiver()
+    
     Mt.trace_metrics(metrics)
     
-
-    if (calc_speedup != 0):
     
+    if (calc_speedup != 0):
+        
         with open('data_npy/metrics_brut_force.npy', 'rb') as f:
             metrics_brut_force = np.load(f,  allow_pickle=True)
         #Mt.trace_metrics(metrics_brut_force)
@@ -59,13 +97,13 @@ def test(radius, dataset = 1, rule = "Coude", rayon_max = 10**8, pas = 10**6, ca
         with open('data_npy/metrics_kaiser.npy', 'rb') as f:
             metrics_kaiser = np.load(f,  allow_pickle=True)
         #Mt.trace_metrics(metrics)
-            
+        
         with open('data_npy/metrics_coude.npy', 'rb') as f:
             metrics_coude = np.load(f,  allow_pickle=True)
         #Mt.trace_metrics(metrics_coude)
         
         Mt.speedup(metrics_brut_force,metrics_kaiser,metrics_inertia,metrics_coude)
-    
 
-test(radius = 2*10**6, rayon_max = 2*10**7, pas = )
 
+if __name__ == "__main__":
+    test(radius = 2*10**6, rayon_max = 2*10**7, pas = 10**6)
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+Binome : DELECLUSE Raphael, CEUNINCK Guillaume
+"""
+
+import numpy as np
+import NN_brute_force as NN_BF
+import Index_IVF
+
+class GalleryPQ:
+    """ 
+    Gallery reduite compressee par quantification produit (PQ), respectant le meme contrat que NN_brute_force
+    (radius_search, NN_search) et Index_arbre.KDTree (existe).
+    
+    Les composantes de chaque image sont decoupees en nb_sous_espaces blocs, et chaque bloc est remplace
+    par l'indice (sur nb_bits bits) du centre le plus proche d'un dictionnaire appris par k-means.
+    Une image de k composantes en float64 (8*k octets) est ainsi stockee sur nb_sous_espaces octets.
+    
+    Les distances sont approchees de maniere asymetrique : la requete n'est pas quantifiee, et une table
+    des distances entre chaque bloc de la requete et chaque centre est calculee une seule fois par requete.
+    Si une gallery d'origine est fournie pour le reclassement (de preference projetee en memoire depuis le disque,
+    pour ne pas perdre le gain de memoire), les candidats dont la distance approchee est inferieure a r*(1 + tolerance)
+    sont reclasses par leur distance exacte.
+    """
+    
+    def __init__(self, D, nb_sous_espaces = None, nb_bits = 8, tolerance = 0.5, original = None, nb_iterations = 10, seed = 0):
+        """ 
+        Apprentissage des dictionnaires et codage de la gallery.
+        
+        Entree:
+            D:
+                La gallery reduite, de taille (n, k).
+            nb_sous_espaces:
+                Le nombre de blocs de composantes, par defaut k/2 (compression par 16).
+            nb_bits:
+                Le nombre de bits par code, au plus 8.
+            tolerance:
+                La marge relative sur le rayon pour la selection des candidats a reclasser.
+            original:
+                La gallery d'origine de taille (n, k) pour le reclassement exact des candidats, par exemple
+                np.load(fichier .npy, mmap_mode = "r") ; None (par defaut) pour n'utiliser que les distances approchees.
+            nb_iterations:
+                Le nombre d'iterations du k-means.
+            seed:
+                La graine du generateur aleatoire.
+        """
+        
+        if not 1 <= nb_bits <= 8:
+            raise ValueError("nb_bits doit etre compris entre 1 et 8, les codes etant stockes sur un octet")
+        
+        D = NN_BF.as_matrix(D)
+        if original is not None and np.shape(original) != D.shape:
+            raise ValueError("La gallery d'origine doit avoir la taille de D")
+        if nb_sous_espaces is None:
+            nb_sous_espaces = max(1, D.shape[1]//2)
+        self.blocs = np.array_split(np.arange(D.shape[1]), nb_sous_espaces)
+        self.tolerance = tolerance
+        self.original = original
+        
+        nb_centres = min(2**nb_bits, len(D))
+        self.dictionnaires = []
+        self.codes = np.empty((len(D), nb_sous_espaces), dtype = np.uint8)
+        for j, bloc in enumerate(self.blocs):
+            centres, affectation = Index_IVF.kmeans(D[:, bloc], nb_centres, nb_iterations, seed + j)
+            self.dictionnaires.append(centres)
+            self.codes[:, j] = affectation
+    
+    def octets_par_image(self):
+        """ 
+        Retourne la memoire occupee par image par les codes, a comparer aux 8*k octets d'une image en float64.
+        """
+        
+        return self.codes.shape[1]*self.codes.itemsize
+    
+    def octets(self):
+        """ 
+        Retourne la place totale occupee par l'index : codes, dictionnaires et gallery d'origine conservee pour le reclassement
+        (comptee meme projetee en memoire, ses pages etant alors lues depuis le disque).
+        """
+        
+        octets = self.codes.nbytes + sum(centres.nbytes for centres in self.dictionnaires)
+        if self.original is not None:
+            octets += self.original.nbytes
+        return octets
+    
+    def table_distances(self, q):
+        """ 
+        Calcule la table des distances au carre entre chaque bloc de la requete et chaque centre du dictionnaire associe.
+        
+        Entree:
+            q:
+                La requete reduite.
+        
+        Sortie:
+            Le np array de taille (nb_sous_espaces, nb_centres) des distances.
+        """
+        
+        return np.array([np.sum((centres - q[bloc])**2, axis = 1) for bloc, centres in zip(self.blocs, self.dictionnaires)])
+    
+    def distances_approchees(self, q):
+        """ 
+        Calcule les distances au carre approchees entre la requete et chaque image de la gallery compressee.
+        
+        Entree:
+            q:
+                La requete reduite.
+        
+        Sortie:
+            Le np array des distances approchees.
+        """
+        
+        table = self.table_distances(q)
+        distances = np.zeros(len(self.codes))
+        for j in range(len(self.blocs)):
+            distances += table[j][self.codes[:, j]]
+        return distances
+    
+    def radius_search(self, q, r):
+        """ 
+        Retourne la liste des indices des plus proches voisins de la requete q dont la distance est inferieure au rayon r.
+        Sans gallery d'origine, la distance approchee est utilisee directement.
+        
+        Entree:
+            q:
+                La requete reduite.
+            r:
+                Le rayon delimitant la distance maximale requise pour etre considere comme l'un des plus proches voisins.
+        
+        Sortie:
+            indices:
+                La liste triee des indices plus proches voisins de la requete q selon r.
+        """
+        
+        q = np.ravel(q).astype(np.float64)
+        return self._selectionner(q, self.distances_approchees(q), r)
+    
+    def _selectionner(self, q, distances, r):
+        if self.original is None:
+            return np.where(distances <= r)[0]
+        
+        #Reclassement exact des candidats
+        candidats = np.where(distances <= r*(1 + self.tolerance))[0]
+        exactes = np.sum((self.original[candidats] - q)**2, axis = 1)
+        return candidats[exactes <= r]
+    
+    def NN_search(self, queries, r):
+        """ 
+        Retourne la liste des indices des plus proches voisins sur l'ensemble des requetes, dont la distance est inferieure au rayon r.
+        
+        Entree:
+            queries:
+                La liste des requetes reduites.
+            r:
+                Le rayon delimitant la distance maximale requise pour etre considere comme l'un des plus proches voisins.
+        
+        Sortie:
+            indices:
+                La liste des indices des plus proches voisins sur l'ensemble des requetes, selon r.
+        """
+        
+        queries = NN_BF.as_matrix(queries)
+        res = []
+        #Les distances approchees sont calculees par lots de requetes, une table de distances par requete
+        taille_lot = max(1, NN_BF.TAILLE_TUILE//max(1, len(self.codes)))
+        for debut in range(0, len(queries), taille_lot):
+            lot = queries[debut:debut + taille_lot]
+            tables = [np.sum((centres[None] - lot[:, None, bloc])**2, axis = 2) for bloc, centres in zip(self.blocs, self.dictionnaires)]
+            distances = np.zeros((len(lot), len(self.codes)))
+            for j, table in enumerate(tables):
+                distances += table[:, self.codes[:, j]]
+            for q, d in zip(lot, distances):
+                res.append(self._selectionner(q, d, r))
+        return res
+    
+    def existe(self, q, r):
+        """ 
+        Indique si au moins une image de la gallery est a une distance inferieure au rayon r de la requete q.
+        Les candidats sont reclasses du plus proche au plus eloigne selon la distance approchee, jusqu'au premier voisin.
+        
+        Entree:
+            q:
+                La requete reduite.
+            r:
+                Le rayon delimitant la distance maximale requise pour etre considere comme l'un des plus proches voisins.
+        
+        Sortie:
+            True si un voisin existe.
+        """
+        
+        q = np.ravel(q).astype(np.float64)
+        distances = self.distances_approchees(q)
+        if self.original is None:
+            return bool(np.any(distances <= r))
+        
+        candidats = np.where(distances <= r*(1 + self.tolerance))[0]
+        for i in candidats[np.argsort(distances[candidats])]:
+            if np.sum((self.original[i] - q)**2) <= r:
+                return True
+        return False
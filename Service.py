@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""
+Binome : DELECLUSE Raphael, CEUNINCK Guillaume
+"""
+
+import sys
+import json
+import time
+import struct
+import asyncio
+import numpy as np
+import NN_brute_force as NN_BF
+import Modele
+
+#Protocole : chaque message est precede de sa taille sur 4 octets (big-endian).
+#Une requete contient les p*p pixels uint8 de l'image, une reponse le JSON {"autorise": ..., "distance": ...}.
+
+async def _lire_message(reader, taille_max = None):
+    taille = struct.unpack(">I", await reader.readexactly(4))[0]
+    #Une taille aberrante ferait attendre, et stocker, jusqu'a 4 Go de donnees
+    if taille_max is not None and taille > taille_max:
+        raise ValueError("Message de %d octets, au plus %d attendus" % (taille, taille_max))
+    return await reader.readexactly(taille)
+
+def _ecrire_message(writer, message):
+    writer.write(struct.pack(">I", len(message)) + message)
+
+class ServiceVerification:
+    """ 
+    Service d'authentification asynchrone regroupant les requetes en micro-lots.
+    
+    Les requetes recues sont placees dans une file. Un lot est traite des qu'il contient taille_lot_max requetes,
+    ou des que attente_max secondes se sont ecoulees depuis l'arrivee de sa premiere requete.
+    Chaque lot donne lieu a une seule projection (voir Eigenfaces.TransformateurEigenfaces) et un seul calcul
+    de distances a la gallery, execute hors de la boucle d'evenements.
+    """
+    
+    def __init__(self, modele, radius, taille_lot_max = 32, attente_max = 0.005):
+        """ 
+        Entree:
+            modele:
+                Le modele charge (voir Modele.ModeleEigenfaces).
+            radius:
+                Le rayon delimitant la distance maximale requise pour etre autorise.
+            taille_lot_max:
+                Le nombre maximal de requetes par lot.
+            attente_max:
+                Le temps maximal, en secondes, qu'une requete attend la constitution de son lot.
+        """
+        
+        self.modele = modele
+        self.radius = radius
+        self.taille_lot_max = taille_lot_max
+        self.attente_max = attente_max
+        self.transformateur = modele.transformateur()
+        self.norms = NN_BF.squared_norms(modele.D_reduced)
+        self.dim = len(modele.moyenne)
+        self.file = None
+        self.tailles_lots = []
+    
+    def traiter_lot(self, probes):
+        """ 
+        Traitement synchrone d'un lot de requetes.
+        
+        Entree:
+            probes:
+                Le np array de taille (n, p*p) des requetes.
+        
+        Sortie:
+            autorise:
+                Le np array des decisions de Projet.is_authorised pour chaque requete.
+            distances:
+                Le np array de la distance de chaque requete a l'image la plus proche de la gallery.
+        """
+        
+        probes_reduced = self.transformateur.transform(probes)
+        distances = np.full(len(probes), np.inf)
+        for lignes, colonnes, tuile in NN_BF.distance_tiles(self.modele.D_reduced, probes_reduced, self.norms):
+            np.minimum(distances[lignes], tuile.min(axis = 1), out = distances[lignes])
+        return distances <= self.radius, distances
+    
+    async def verifier(self, probe):
+        """ 
+        Verification d'une requete : elle est ajoutee au prochain lot, dont on attend le resultat.
+        
+        Entree:
+            probe:
+                La requete, un np array de p*p pixels.
+        
+        Sortie:
+            La decision et la distance a l'image la plus proche de la gallery.
+        """
+        
+        resultat = asyncio.get_running_loop().create_future()
+        await self.file.put((probe, resultat))
+        return await resultat
+    
+    async def _boucle_lots(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            lot = [await self.file.get()]
+            echeance = loop.time() + self.attente_max
+            while len(lot) < self.taille_lot_max:
+                restant = echeance - loop.time()
+                if restant <= 0:
+                    break
+                try:
+                    lot.append(await asyncio.wait_for(self.file.get(), restant))
+                except asyncio.TimeoutError:
+                    break
+            
+            self.tailles_lots.append(len(lot))
+            probes = np.stack([probe for probe, resultat in lot])
+            try:
+                autorise, distances = await loop.run_in_executor(None, self.traiter_lot, probes)
+            except Exception as erreur:
+                for probe, resultat in lot:
+                    if not resultat.done():
+                        resultat.set_exception(erreur)
+                continue
+            #Le resultat d'une requete dont la connexion a ete fermee entre-temps est deja annule
+            for i, (probe, resultat) in enumerate(lot):
+                if not resultat.done():
+                    resultat.set_result((bool(autorise[i]), float(distances[i])))
+    
+    async def _gerer_connexion(self, reader, writer):
+        try:
+            while True:
+                message = await _lire_message(reader, self.dim)
+                probe = np.frombuffer(message, dtype = np.uint8)
+                if len(probe) != self.dim:
+                    reponse = {"erreur": "image de %d pixels attendue" % self.dim}
+                else:
+                    autorise, distance = await self.verifier(probe)
+                    reponse = {"autorise": autorise, "distance": distance}
+                _ecrire_message(writer, json.dumps(reponse).encode("utf-8"))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            #Connexion fermee ou interrompue par le client, ou en-tete invalide : seule cette connexion est fermee
+            pass
+        finally:
+            writer.close()
+    
+    async def demarrer(self, hote = "127.0.0.1", port = 0):
+        """ 
+        Demarrage du service.
+        
+        Entree:
+            hote:
+                L'adresse d'ecoute.
+            port:
+                Le port d'ecoute (0 pour un port libre choisi par le systeme).
+        
+        Sortie:
+            Le serveur asyncio, dont le port est server.sockets[0].getsockname()[1].
+        """
+        
+        self.file = asyncio.Queue()
+        self._tache_lots = asyncio.ensure_future(self._boucle_lots())
+        return await asyncio.start_server(self._gerer_connexion, hote, port)
+    
+    def arreter(self):
+        """ 
+        Arret de la boucle de traitement des lots.
+        """
+        
+        self._tache_lots.cancel()
+
+class ClientVerification:
+    """ 
+    Client du service de verification.
+    """
+    
+    async def connecter(self, hote = "127.0.0.1", port = 8765):
+        self.reader, self.writer = await asyncio.open_connection(hote, port)
+    
+    async def verifier(self, image):
+        """ 
+        Envoi d'une image au service.
+        
+        Entree:
+            image:
+                L'image, un np array uint8 de taille (p,p).
+        
+        Sortie:
+            La reponse du service : {"autorise": ..., "distance": ...}.
+        """
+        
+        _ecrire_message(self.writer, np.ascontiguousarray(image, dtype = np.uint8).tobytes())
+        await self.writer.drain()
+        return json.loads((await _lire_message(self.reader)).decode("utf-8"))
+    
+    async def fermer(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+async def generateur_charge(images, hote = "127.0.0.1", port = 8765, nb_clients = 16, nb_requetes = 1000):
+    """ 
+    Envoi de requetes au service par plusieurs clients simultanes, chacun attendant sa reponse avant la requete suivante.
+    
+    Entree:
+        images:
+            La liste des images envoyees, a tour de role.
+        hote, port:
+            L'adresse du service.
+        nb_clients:
+            Le nombre de clients simultanes.
+        nb_requetes:
+            Le nombre total de requetes.
+    
+    Sortie:
+        latences:
+            Le np array de la latence de chaque requete, en secondes.
+        debit:
+            Le nombre de requetes traitees par seconde.
+    """
+    
+    latences = []
+    
+    async def client(numero):
+        c = ClientVerification()
+        await c.connecter(hote, port)
+        for i in range(numero, nb_requetes, nb_clients):
+            debut = time.perf_counter()
+            await c.verifier(images[i % len(images)])
+            latences.append(time.perf_counter() - debut)
+        await c.fermer()
+    
+    debut = time.perf_counter()
+    await asyncio.gather(*[client(numero) for numero in range(nb_clients)])
+    return np.array(latences), nb_requetes/(time.perf_counter() - debut)
+
+async def mesurer_latences(modele, images, radius, tailles_lot = (1, 4, 16, 64), attente_max = 0.005, nb_clients = 32, nb_requetes = 2000):
+    """ 
+    Mesure des latences p50/p99 et du debit du service en boucle locale, pour differentes tailles de lot maximales.
+    
+    Entree:
+        modele:
+            Le modele charge.
+        images:
+            La liste des images envoyees.
+        radius:
+            Le rayon d'authentification.
+        tailles_lot:
+            Les tailles de lot maximales testees.
+        attente_max:
+            Le temps d'attente maximal d'une requete.
+        nb_clients, nb_requetes:
+            Les parametres du generateur de charge.
+    
+    Sortie:
+        La liste des [taille de lot maximale, taille de lot moyenne, p50, p99, debit].
+    """
+    
+    res = []
+    for taille in tailles_lot:
+        service = ServiceVerification(modele, radius, taille, attente_max)
+        serveur = await service.demarrer()
+        port = serveur.sockets[0].getsockname()[1]
+        
+        latences, debit = await generateur_charge(images, port = port, nb_clients = nb_clients, nb_requetes = nb_requetes)
+        
+        service.arreter()
+        serveur.close()
+        await serveur.wait_closed()
+        
+        p50, p99 = np.percentile(latences, [50, 99])
+        res.append([taille, np.mean(service.tailles_lots), p50, p99, debit])
+        print("lot max %3d  lot moyen %5.1f  p50 %.2f ms  p99 %.2f ms  %.0f requetes/s"
+              % (taille, np.mean(service.tailles_lots), p50*1000, p99*1000, debit))
+    return res
+
+async def servir(dossier_modele, radius, hote = "127.0.0.1", port = 8765):
+    """ 
+    Lancement du service sur un modele sauvegarde, jusqu'a interruption.
+    """
+    
+    service = ServiceVerification(Modele.ModeleEigenfaces.charger(dossier_modele), radius)
+    serveur = await service.demarrer(hote, port)
+    print("Service de verification en ecoute sur %s:%d" % (hote, port))
+    async with serveur:
+        await serveur.serve_forever()
+
+if __name__ == "__main__":
+    #python Service.py <dossier_modele> <radius> [port]
+    asyncio.run(servir(sys.argv[1], float(sys.argv[2]), port = int(sys.argv[3]) if len(sys.argv) > 3 else 8765))
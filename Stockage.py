@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+Binome : DELECLUSE Raphael, CEUNINCK Guillaume
+"""
+
+import os
+import json
+import struct
+import numpy as np
+
+#Format binaire d'une gallery (.gal) :
+#   * 8 octets : MAGIQUE
+#   * 8 octets : taille de l'entete (entier non signe little-endian)
+#   * l'entete JSON : version, forme et type des images, positions des blocs, table des identites,
+#     table des echantillons non entiers (depuis la version 2)
+#   * le bloc des images, contigu et aligne sur ALIGNEMENT octets
+#   * le bloc des etiquettes : pour chaque image, l'indice de son identite et son numero d'echantillon (int32),
+#     ou -1 - l'indice de son echantillon dans la table des echantillons non entiers
+MAGIQUE = b"GALERIE\x00"
+VERSION = 2
+ALIGNEMENT = 64
+
+def _aligner(position):
+    return -(-position // ALIGNEMENT) * ALIGNEMENT
+
+def interner_noms(names):
+    """ 
+    Remplace les noms X.Y par des entiers : l'indice de l'identite X dans une table, et le numero d'echantillon Y.
+    Un echantillon qui n'est pas un entier positif ecrit sans zero superflu (par exemple "01" ou "a"), ou un nom sans Y,
+    est conserve tel quel dans une table d'echantillons, et son numero est alors -1 - son indice dans cette table.
+    
+    Entree:
+        names:
+            La liste des noms.
+            Un nom est formate sous la forme X.Y
+    
+    Sortie:
+        identites:
+            La liste triee des identites X distinctes.
+        etiquettes:
+            Le np array int32 de taille (n, 2) contenant l'indice de l'identite et le numero d'echantillon de chaque nom.
+        echantillons:
+            La liste des echantillons non entiers, None pour un nom sans Y.
+    """
+    
+    separes = [str(name).rsplit(".", 1) + [None] for name in names]
+    identites, ids = np.unique([separe[0] for separe in separes], return_inverse = True)
+    etiquettes = np.empty((len(names), 2), dtype = np.int32)
+    etiquettes[:, 0] = ids
+    
+    echantillons, positions = [], {}
+    for i, separe in enumerate(separes):
+        y = separe[1]
+        if y is not None and y.isdigit() and str(int(y)) == y and int(y) < 2**31:
+            etiquettes[i, 1] = int(y)
+        else:
+            if y not in positions:
+                positions[y] = len(echantillons)
+                echantillons.append(y)
+            etiquettes[i, 1] = -1 - positions[y]
+    return [str(x) for x in identites], etiquettes, echantillons
+
+def reconstruire_noms(identites, etiquettes, echantillons = ()):
+    """ 
+    Reconstruit les noms X.Y a partir de la table des identites, des etiquettes et des echantillons non entiers (voir interner_noms).
+    
+    Entree:
+        identites:
+            La liste des identites X.
+        etiquettes:
+            Le np array de taille (n, 2) des indices d'identite et numeros d'echantillon.
+        echantillons:
+            La liste des echantillons non entiers.
+    
+    Sortie:
+        La liste des noms, formates sous la forme X.Y
+    """
+    
+    noms = []
+    for i, y in etiquettes:
+        if y < 0:
+            y = echantillons[-1 - y]
+        noms.append(identites[i] if y is None else identites[i] + "." + str(y))
+    return noms
+
+def ecrire_gallery(chemin, images, names):
+    """ 
+    Ecriture d'un ensemble d'images et de leurs noms au format binaire .gal.
+    
+    Entree:
+        chemin:
+            Le fichier a ecrire.
+        images:
+            La liste ou le np array des images, toutes de meme taille.
+            Une image est representee par un np array.
+        names:
+            La liste contenant les noms de chaque image.
+            Un nom est formate sous la forme X.Y
+    """
+    
+    images = np.ascontiguousarray(np.asarray(images))
+    identites, etiquettes, echantillons = interner_noms(names)
+    
+    entete = {"version": VERSION, "shape": list(images.shape), "dtype": images.dtype.str, "identites": identites,
+              "echantillons": echantillons}
+    #Les positions des blocs dependent de la taille de l'entete : on reserve assez de chiffres
+    entete["offset_images"] = entete["offset_etiquettes"] = 10**15
+    taille_entete = len(json.dumps(entete).encode("utf-8"))
+    entete["offset_images"] = _aligner(16 + taille_entete)
+    entete["offset_etiquettes"] = _aligner(entete["offset_images"] + images.nbytes)
+    octets_entete = json.dumps(entete).encode("utf-8").ljust(taille_entete)
+    
+    with open(chemin, "wb") as f:
+        f.write(MAGIQUE + struct.pack("<Q", len(octets_entete)) + octets_entete)
+        f.write(b"\x00" * (entete["offset_images"] - f.tell()))
+        f.write(images.tobytes())
+        f.write(b"\x00" * (entete["offset_etiquettes"] - f.tell()))
+        f.write(etiquettes.astype("<i4").tobytes())
+
+def lire_entete(chemin):
+    """ 
+    Lecture de l'entete d'un fichier .gal.
+    
+    Entree:
+        chemin:
+            Le fichier a lire.
+    
+    Sortie:
+        Le dictionnaire de l'entete.
+    """
+    
+    with open(chemin, "rb") as f:
+        if f.read(8) != MAGIQUE:
+            raise ValueError(chemin + " n'est pas une gallery au format .gal")
+        taille_entete = struct.unpack("<Q", f.read(8))[0]
+        entete = json.loads(f.read(taille_entete).decode("utf-8"))
+    if entete["version"] > VERSION:
+        raise ValueError("Version de gallery non supportee : " + str(entete["version"]))
+    return entete
+
+def lire_gallery(chemin):
+    """ 
+    Lecture sans copie d'un fichier .gal : les images et les etiquettes sont projetees en memoire (mmap) en lecture seule.
+    
+    Entree:
+        chemin:
+            Le fichier a lire.
+    
+    Sortie:
+        images:
+            Le np array projete en memoire des images.
+        identites:
+            La liste des identites X.
+        etiquettes:
+            Le np array projete en memoire de taille (n, 2) des indices d'identite et numeros d'echantillon.
+        echantillons:
+            La liste des echantillons non entiers (vide pour un fichier de version 1).
+    """
+    
+    entete = lire_entete(chemin)
+    n = entete["shape"][0]
+    echantillons = entete.get("echantillons", [])
+    if n == 0:
+        return np.empty(entete["shape"], dtype = entete["dtype"]), entete["identites"], np.empty((0, 2), dtype = np.int32), echantillons
+    
+    images = np.memmap(chemin, dtype = entete["dtype"], mode = "r", offset = entete["offset_images"], shape = tuple(entete["shape"]))
+    etiquettes = np.memmap(chemin, dtype = "<i4", mode = "r", offset = entete["offset_etiquettes"], shape = (n, 2))
+    return images, entete["identites"], etiquettes, echantillons
+
+def convertir_npy(chemin_npy, chemin_gal):
+    """ 
+    Conversion d'un fichier .npy historique (voir l'ancien Generation_data.save_data), contenant un np array objet
+    [images, noms] enregistre par pickle, vers le format .gal.
+    
+    Entree:
+        chemin_npy:
+            Le fichier .npy a convertir.
+        chemin_gal:
+            Le fichier .gal a ecrire.
+    """
+    
+    with open(chemin_npy, 'rb') as f:
+        temp = np.load(f,  allow_pickle=True)
+    ecrire_gallery(chemin_gal, np.stack(temp[0]), list(temp[1]))
+
+def convertir_dossier(dossier = "data_npy"):
+    """ 
+    Conversion des fichiers data.npy, unknown.npy et known.npy d'un dossier vers le format .gal, s'ils existent.
+    
+    Entree:
+        dossier:
+            Le dossier contenant les fichiers .npy.
+    """
+    
+    for nom in ("data", "unknown", "known"):
+        chemin_npy = os.path.join(dossier, nom + ".npy")
+        if os.path.isfile(chemin_npy):
+            convertir_npy(chemin_npy, os.path.join(dossier, nom + ".gal"))
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Binome : DELECLUSE Raphael, CEUNINCK Guillaume
+"""
+
+import numpy as np
+import NN_brute_force as NN_BF
+
+def centroides_identites(D, data_names):
+    """ 
+    Regroupe les images de la gallery par individu et resume chaque individu par son centroide.
+    
+    Entree:
+        D:
+            La gallery reduite, de taille (n, k).
+        data_names:
+            La liste contenant les noms de chaque image de la gallery.
+            Un nom est formate sous la forme X.Y
+    
+    Sortie:
+        identites:
+            Le np array des noms X des individus.
+        ordre:
+            Le np array des indices de la gallery tries par individu.
+        debuts:
+            Le np array tel que les images de l'individu i soient ordre[debuts[i]:debuts[i+1]].
+        centroides:
+            Le np array de taille (nb individus, k) des centroides.
+        rayons:
+            Le np array de la distance (non elevee au carre) maximale entre chaque centroide et les images de l'individu.
+    """
+    
+    D = NN_BF.as_matrix(D)
+    identites, inverse = np.unique([name.split(".")[0] for name in data_names], return_inverse = True)
+    ordre = np.argsort(inverse, kind = "stable")
+    effectifs = np.bincount(inverse, minlength = len(identites))
+    debuts = np.concatenate(([0], np.cumsum(effectifs)))
+    
+    centroides = np.zeros((len(identites), D.shape[1]))
+    np.add.at(centroides, inverse, D)
+    centroides /= effectifs[:, None]
+    
+    ecarts = np.sqrt(np.sum((D - centroides[inverse])**2, axis = 1))
+    rayons = np.zeros(len(identites))
+    np.maximum.at(rayons, inverse, ecarts)
+    
+    return identites, ordre, debuts, centroides, rayons
+
+class Verificateur:
+    """ 
+    Verification rapide "existe-t-il une image de la gallery a une distance inferieure a r", pour Projet.is_authorised.
+    
+    Un premier passage grossier compare la requete aux centroides des individus : par l'inegalite triangulaire,
+    aucune image d'un individu n'est dans le rayon si (distance au centroide - rayon de l'individu)² > r.
+    Les individus restants sont parcourus du plus proche au plus eloigne. Pour chacun, la distance est accumulee
+    par blocs de composantes principales, dans l'ordre decroissant des valeurs propres : une somme partielle
+    est une borne inferieure de la distance complete, donc une image est ecartee des qu'elle depasse r.
+    La recherche s'arrete a la premiere image dans le rayon.
+    """
+    
+    def __init__(self, D, data_names, taille_bloc = 4):
+        """ 
+        Entree:
+            D:
+                La gallery reduite, de taille (n, k), dont les composantes sont triees par variance decroissante.
+            data_names:
+                La liste contenant les noms de chaque image de la gallery.
+                Un nom est formate sous la forme X.Y
+            taille_bloc:
+                Le nombre de composantes ajoutees a la somme partielle entre deux elagages.
+        """
+        
+        D = NN_BF.as_matrix(D)
+        self.identites, ordre, self.debuts, self.centroides, self.rayons = centroides_identites(D, data_names)
+        self.data = D[ordre]
+        self.taille_bloc = taille_bloc
+    
+    def _individu_dans_rayon(self, q, r, i):
+        candidats = self.data[self.debuts[i]:self.debuts[i + 1]]
+        sommes = np.zeros(len(candidats))
+        for j in range(0, q.shape[0], self.taille_bloc):
+            ecarts = candidats[:, j:j + self.taille_bloc] - q[j:j + self.taille_bloc]
+            sommes += np.einsum("ij,ij->i", ecarts, ecarts)
+            restants = sommes <= r
+            if not restants.all():
+                if not restants.any():
+                    return False
+                candidats, sommes = candidats[restants], sommes[restants]
+        return True
+    
+    def existe(self, q, r):
+        """ 
+        Indique si au moins une image de la gallery est a une distance inferieure au rayon r de la requete q.
+        
+        Entree:
+            q:
+                La requete reduite.
+            r:
+                Le rayon delimitant la distance maximale requise pour etre considere comme l'un des plus proches voisins.
+        
+        Sortie:
+            True si un voisin existe.
+        """
+        
+        q = np.ravel(q).astype(np.float64)
+        distances_centroides = np.sqrt(np.sum((self.centroides - q)**2, axis = 1))
+        bornes = np.maximum(distances_centroides - self.rayons, 0)**2
+        
+        #Marge pour ne jamais ecarter un individu a cause des arrondis
+        candidats = np.where(bornes <= r*(1 + 1e-9) + 1e-9)[0]
+        for i in candidats[np.argsort(distances_centroides[candidats])]:
+            if self._individu_dans_rayon(q, r, i):
+                return True
+        return False
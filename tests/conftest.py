@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Binome : DELECLUSE Raphael, CEUNINCK Guillaume
+"""
+
+import signal
+import pytest
+import numpy as np
+import NN_brute_force as NN_BF
+
+#Duree maximale d'un test en secondes : un pool de processus bloque fait echouer le test au lieu de bloquer la suite
+DELAI_TEST = 60
+
+@pytest.fixture(autouse = True)
+def delai():
+    if not hasattr(signal, "SIGALRM"):
+        yield
+        return
+    
+    def depassement(signum, frame):
+        raise TimeoutError("Test interrompu apres %d s" % DELAI_TEST)
+    
+    ancien = signal.signal(signal.SIGALRM, depassement)
+    signal.alarm(DELAI_TEST)
+    try:
+        yield
+    finally:
+        signal.alarm(0)
+        signal.signal(signal.SIGALRM, ancien)
+
+@pytest.fixture
+def gallery():
+    """ 
+    Gallery et requetes aleatoires de petite dimension, avec un rayon retenant quelques voisins par requete.
+    """
+    
+    rng = np.random.default_rng(0)
+    data = rng.standard_normal((600, 12))
+    queries = np.concatenate((data[:20] + 0.1*rng.standard_normal((20, 12)), rng.standard_normal((20, 12))))
+    r = float(np.quantile(NN_BF.batch_euclidean_distances(data, queries), 0.01))
+    return data, queries, r
+
+def memes_voisins(indices, reference):
+    """ 
+    Egalite de deux listes de voisins par requete, a l'ordre pres.
+    """
+    
+    return len(indices) == len(reference) and all(np.array_equal(np.sort(a), np.sort(b)) for a, b in zip(indices, reference))
+
+@pytest.fixture
+def gallery_identites():
+    """ 
+    Gallery reduite de 40 personnes, de 1 a 8 images chacune et de composantes de variance decroissante,
+    des requetes proches de ces personnes ou d'autres, et un rayon retenant quelques voisins par requete.
+    """
+    
+    rng = np.random.default_rng(1)
+    echelles = 4/np.sqrt(np.arange(1, 17))
+    personnes = rng.standard_normal((60, 16))*echelles
+    nb_images = rng.integers(1, 9, 40)
+    data = np.repeat(personnes[:40], nb_images, axis = 0) + 0.5*rng.standard_normal((nb_images.sum(), 16))*echelles
+    data_names = ["%d.%d" % (i, j) for i in range(40) for j in range(nb_images[i])]
+    queries = personnes[rng.integers(0, 60, 50)] + 0.5*rng.standard_normal((50, 16))*echelles
+    r = float(np.quantile(NN_BF.batch_euclidean_distances(data, queries), 0.02))
+    return data, data_names, queries, r
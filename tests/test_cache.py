@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+Binome : DELECLUSE Raphael, CEUNINCK Guillaume
+"""
+
+import os
+import time
+import numpy as np
+import Cache
+
+def decomposition_aleatoire(seed, n = 50):
+    rng = np.random.default_rng(seed)
+    return rng.random(n), rng.random((400, n))
+
+def test_empreinte():
+    data = np.arange(60, dtype = np.uint8).reshape(6, 10)
+    assert Cache.empreinte(data, "eigh") == Cache.empreinte(data.copy(), "eigh")
+    assert Cache.empreinte(data, "eigh") != Cache.empreinte(data, "eigsh")
+    assert Cache.empreinte(data, "eigh") != Cache.empreinte(data.astype(np.float64), "eigh")
+    autre = data.copy()
+    autre[3, 4] += 1
+    assert Cache.empreinte(data, "eigh") != Cache.empreinte(autre, "eigh")
+
+def test_memoire_seulement_par_defaut(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    cache = Cache.CacheDecomposition()
+    cache.ranger("a", *decomposition_aleatoire(0))
+    assert cache.obtenir("a") is not None
+    assert os.listdir(tmp_path) == []
+
+def test_eviction_memoire():
+    mu, w = decomposition_aleatoire(0)
+    cache = Cache.CacheDecomposition(octets_max = 2*(mu.nbytes + w.nbytes))
+    for cle in "abc":
+        cache.ranger(cle, mu, w)
+    assert list(cache.entrees) == ["b", "c"]
+    assert cache.obtenir("a") is None
+    assert cache.octets <= cache.octets_max
+
+def test_eviction_disque(tmp_path):
+    mu, w = decomposition_aleatoire(0)
+    cache = Cache.CacheDecomposition(octets_max = 0, dossier = str(tmp_path), octets_max_disque = int(2.5*(mu.nbytes + w.nbytes)))
+    for cle in "abc":
+        cache.ranger(cle, mu, w)
+        time.sleep(0.01)
+    #La plus ancienne decomposition est supprimee du disque
+    assert sorted(os.listdir(tmp_path)) == ["b_mu.npy", "b_w.npy", "c_mu.npy", "c_w.npy"]
+    
+    cache.vider()
+    mu_b, w_b = cache.obtenir("b")
+    assert np.array_equal(mu_b, mu) and np.array_equal(w_b, w) and not w_b.flags.writeable
+    
+    cache.vider(disque = True)
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+Binome : DELECLUSE Raphael, CEUNINCK Guillaume
+"""
+
+import pytest
+import numpy as np
+import NN_brute_force as NN_BF
+import Metrics as Mt
+import Gabarits
+from conftest import memes_voisins
+
+@pytest.mark.parametrize("methode", Gabarits.METHODES)
+def test_recherche_exacte_identique_force_brute(gallery_identites, methode):
+    data, data_names, queries, r = gallery_identites
+    gabarits = Gabarits.GalleryGabarits(data, data_names, methode)
+    for rayon in (0.5*r, r, 3*r):
+        assert memes_voisins(gabarits.NN_search(queries, rayon), NN_BF.NN_bf_search(data, queries, rayon))
+
+@pytest.mark.parametrize("methode", Gabarits.METHODES)
+def test_premier_etage_sans_faux_negatif(gallery_identites, methode):
+    #Aucun individu ayant une image dans le rayon n'est exclu par l'inegalite triangulaire
+    data, data_names, queries, r = gallery_identites
+    gabarits = Gabarits.GalleryGabarits(data, data_names, methode)
+    distances_gabarits = np.sqrt(NN_BF.batch_euclidean_distances(gabarits.gabarits, queries))
+    bornes = gabarits._par_identite(np.maximum(distances_gabarits - gabarits.rayons, 0)**2)
+    distances = NN_BF.batch_euclidean_distances(gabarits.data, queries)
+    minimum_par_individu = np.minimum.reduceat(distances, gabarits.debuts[:-1], axis = 1)
+    assert np.all(bornes <= minimum_par_individu*(1 + 1e-9) + 1e-9)
+
+def test_distances_minimales_exactes(gallery_identites):
+    data, data_names, queries, r = gallery_identites
+    names = ["%d.99" % i for i in range(len(queries))]
+    d_min, d_meme = Gabarits.GalleryGabarits(data, data_names).distances_minimales(names, queries)
+    ids_data, ids_queries = Mt.identites_entieres(data_names, names)
+    d_min_ref, d_meme_ref = Mt.distances_minimales(data, ids_data, ids_queries, queries)
+    assert np.allclose(d_min, d_min_ref) and np.allclose(d_meme, d_meme_ref)
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Binome : DELECLUSE Raphael, CEUNINCK Guillaume
+"""
+
+import pytest
+import numpy as np
+import Generation_data
+
+@pytest.fixture
+def base():
+    #Chaque "image" contient son propre indice, pour verifier les ensembles
+    rng = np.random.default_rng(0)
+    nb_images = rng.integers(1, 12, 80)
+    names = ["%d.%d" % (i, j) for i in range(80) for j in range(nb_images[i])]
+    return np.arange(len(names))[:, None], names
+
+def identite(name):
+    return name.split(".")[0]
+
+def verifier_decoupage(decoupage, base, nb_probes):
+    data, data_names, probes_unknown, names_unknown, probes_known, names_known = decoupage
+    ensembles = [np.ravel(data), np.ravel(probes_unknown), np.ravel(probes_known)]
+    tous = np.concatenate(ensembles)
+    #Aucune image dans deux ensembles
+    assert len(np.unique(tous)) == len(tous)
+    #Les noms suivent les images
+    for images, names in ((data, data_names), (probes_unknown, names_unknown), (probes_known, names_known)):
+        assert list(names) == [base[1][i] for i in np.ravel(images)]
+    #Les identites inconnues sont absentes de la gallery, les connues y sont presentes
+    identites_gallery = {identite(n) for n in data_names}
+    identites_inconnues = {identite(n) for n in names_unknown}
+    assert not identites_gallery & identites_inconnues
+    #Seules les autres images des identites inconnues sont ecartees
+    ecartees = np.setdiff1d(np.arange(len(base[1])), tous)
+    assert {identite(base[1][i]) for i in ecartees} <= identites_inconnues
+    assert {identite(n) for n in names_known} <= identites_gallery
+    assert len({identite(n) for n in names_unknown}) == len(names_unknown)
+    assert len(names_known) == nb_probes
+
+def test_generation_data(base):
+    decoupage = Generation_data.generation_data(*base, 20, seed = 3)
+    verifier_decoupage(decoupage, base, 20)
+    assert len(decoupage[3]) == 20
+
+def test_generation_data_reproductible(base):
+    a = Generation_data.generation_data(*base, 20, seed = 3)
+    b = Generation_data.generation_data(*base, 20, seed = 3)
+    c = Generation_data.generation_data(*base, 20, seed = 4)
+    assert all(np.array_equal(x, y) for x, y in zip(a, b))
+    assert not np.array_equal(a[2], c[2])
+
+def test_generation_repetee(base):
+    decoupages = list(Generation_data.generation_repetee(*base, 3, 10, seed = 1))
+    for decoupage in decoupages:
+        verifier_decoupage(decoupage, base, 10)
+    assert all(np.array_equal(x, y) for x, y in zip(decoupages[0], next(Generation_data.generation_repetee(*base, 3, 10, seed = 1))))
+
+def test_generation_kfold(base):
+    inconnues = []
+    for decoupage in Generation_data.generation_kfold(*base, k = 4, nb_probes = 30, seed = 2):
+        verifier_decoupage(decoupage, base, 30)
+        inconnues += [identite(n) for n in decoupage[3]]
+    #Chaque identite est inconnue exactement une fois
+    assert sorted(inconnues) == sorted({identite(n) for n in base[1]})
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+Binome : DELECLUSE Raphael, CEUNINCK Guillaume
+"""
+
+import pytest
+import numpy as np
+import NN_brute_force as NN_BF
+import Index_arbre
+from conftest import memes_voisins
+
+@pytest.mark.parametrize("taille_feuille", [1, 16, 1000])
+def test_identique_force_brute(gallery, taille_feuille):
+    data, queries, r = gallery
+    arbre = Index_arbre.KDTree(data, taille_feuille)
+    reference = NN_BF.NN_bf_search(data, queries, r)
+    assert memes_voisins(arbre.NN_search(queries, r), reference)
+    assert [arbre.existe(q, r) for q in queries] == [len(indices) > 0 for indices in reference]
+
+def test_points_sur_le_rayon(gallery):
+    #Les produits matriciels ne sont pas reproductibles au bit pres selon la taille des blocs : seuls des points
+    #dont la distance est egale au rayon aux arrondis pres peuvent etre retenus par l'une des recherches et pas par l'autre
+    data, queries, r = gallery
+    arbre = Index_arbre.KDTree(data, 16)
+    distances = NN_BF.batch_euclidean_distances(data, queries)
+    for j in range(0, len(queries), 5):
+        for rayon in distances[j, [3, 250, 599]]:
+            differents = np.setxor1d(arbre.radius_search(queries[j], rayon), NN_BF.NN_bf_search(data, queries[j:j + 1], rayon)[0])
+            assert np.all(np.abs(distances[j, differents] - rayon) <= 1e-9*(1 + rayon))
+
+def test_knn_identique_tri_complet(gallery):
+    data, queries = gallery[:2]
+    indices, distances = Index_arbre.KDTree(data, 16).knn_search(queries, 7)[:2]
+    reference = NN_BF.batch_euclidean_distances(data, queries)
+    ordre = np.argsort(reference, axis = 1, kind = "stable")[:, :7]
+    assert np.array_equal(indices, ordre)
+    assert np.allclose(distances, np.take_along_axis(reference, ordre, axis = 1))
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+"""
+Binome : DELECLUSE Raphael, CEUNINCK Guillaume
+"""
+
+import numpy as np
+import NN_brute_force as NN_BF
+import Index_IVF
+from conftest import memes_voisins
+
+def test_toutes_listes_sondees_identique_force_brute(gallery):
+    data, queries, r = gallery
+    index = Index_IVF.IndexIVF(data, nb_listes = 12, nb_sondes = 12)
+    reference = NN_BF.NN_bf_search(data, queries, r)
+    assert memes_voisins(index.NN_search(queries, r), reference)
+    assert [index.existe(q, r) for q in queries] == [len(indices) > 0 for indices in reference]
+
+def test_sondes_partielles_sous_ensemble(gallery):
+    data, queries, r = gallery
+    index = Index_IVF.IndexIVF(data, nb_listes = 12, nb_sondes = 2)
+    reference = NN_BF.NN_bf_search(data, queries, r)
+    trouves = index.NN_search(queries, r)
+    assert all(np.isin(a, b).all() for a, b in zip(trouves, reference))
+    assert 0 <= Index_IVF.rappel_recherche(reference, trouves) <= 1
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Binome : DELECLUSE Raphael, CEUNINCK Guillaume
+"""
+
+import pytest
+import numpy as np
+import Metrics as Mt
+
+@pytest.fixture
+def repartition():
+    """ 
+    Gallery reduite de 40 personnes, requetes connues (personnes de la gallery) et inconnues (autres personnes).
+    """
+    
+    rng = np.random.default_rng(1)
+    personnes = 3*rng.standard_normal((60, 8))
+    data = np.repeat(personnes[:40], 5, axis = 0) + rng.standard_normal((200, 8))
+    data_names = ["%d.%d" % (i, j) for i in range(40) for j in range(5)]
+    known = personnes[:30] + rng.standard_normal((30, 8))
+    unknown = personnes[40:] + rng.standard_normal((20, 8))
+    return data, data_names, ["%d.9" % i for i in range(30)], ["%d.9" % i for i in range(40, 60)], known, unknown
+
+def distances(repartition):
+    data, data_names, names_known, names_unknown, known, unknown = repartition
+    ids_data, ids_known, ids_unknown = Mt.identites_entieres(data_names, names_known, names_unknown)
+    d_min_known, d_meme_known = Mt.distances_minimales(data, ids_data, ids_known, known)
+    return d_min_known, d_meme_known, Mt.distances_minimales(data, ids_data, ids_unknown, unknown)[0]
+
+def metriques(lignes):
+    return np.array(lignes, dtype = np.float64)[:, :5]
+
+def test_balayage_identique_grille(repartition):
+    grille = metriques(Mt.evaluation(*repartition, 2, 80, mode = "grille"))
+    balayage = metriques(Mt.evaluation(*repartition, 2, 80, mode = "balayage"))
+    assert np.allclose(grille, balayage)
+
+def test_seuils_identiques_grille(repartition):
+    seuils = metriques(Mt.evaluation(*repartition, None, None, mode = "seuils"))
+    assert np.array_equal(seuils[:, 0], Mt.seuils_exacts(*distances(repartition)))
+    grille = metriques([Mt.calc_metrics(*repartition[:4], repartition[4], repartition[5], r) for r in seuils[:, 0]])
+    assert np.allclose(grille, seuils)
+
+def test_seuils_exhaustifs():
+    #Entre deux radius de seuils_exacts, les comptages ne changent pas
+    rng = np.random.default_rng(2)
+    d_min_known = rng.gamma(2, 1, 40).round(1)
+    d_meme_known = d_min_known + rng.choice([0, 0, 0, 1.5], 40)
+    d_min_unknown = rng.gamma(4, 1, 30).round(1)
+    seuils = Mt.seuils_exacts(d_min_known, d_meme_known, d_min_unknown)
+    grille = np.linspace(0, seuils[-1] + 1, 5000)
+    cas_seuils = set(zip(*Mt.mesure_cas_balayage(d_min_known, d_meme_known, d_min_unknown, seuils)))
+    assert set(zip(*Mt.mesure_cas_balayage(d_min_known, d_meme_known, d_min_unknown, grille))) <= cas_seuils
+
+def taux_exhaustifs(d_min_known, d_meme_known, d_min_unknown):
+    seuils = Mt.seuils_exacts(d_min_known, d_meme_known, d_min_unknown)
+    TP, TN, FP, FN = Mt.mesure_cas_balayage(d_min_known, d_meme_known, d_min_unknown, seuils)
+    tpr = np.array([Mt.rappel(*cas) for cas in zip(TP, FN)])
+    fpr = np.array([1 - Mt.specificite(*cas) for cas in zip(TN, FP)])
+    return seuils, tpr, fpr
+
+@pytest.mark.parametrize("seed", range(20))
+def test_bissection_identique_parcours(seed):
+    rng = np.random.default_rng(seed)
+    n, m = rng.integers(5, 60, 2)
+    d_min_known = rng.gamma(2, 1, n).round(1)
+    d_meme_known = d_min_known.copy()
+    d_min_unknown = rng.gamma(4, 1, m).round(1)
+    seuils, tpr, fpr = taux_exhaustifs(d_min_known, d_meme_known, d_min_unknown)
+    
+    seuil, t, f, nb_evaluations = Mt.seuil_bissection(d_min_known, d_meme_known, d_min_unknown, "tpr", 0.8)
+    assert seuil == seuils[np.nonzero(tpr >= 0.8)[0][0]]
+    assert nb_evaluations <= 2*np.log2(len(seuils)) + 2
+    
+    res = Mt.seuil_bissection(d_min_known, d_meme_known, d_min_unknown, "fpr", 0.1)
+    admissibles = np.nonzero(fpr <= 0.1)[0]
+    if len(admissibles) == 0:
+        assert res is None
+    else:
+        assert res[0] == seuils[admissibles[-1]] and res[2] <= 0.1
+    
+    t, f = Mt.seuil_bissection(d_min_known, d_meme_known, d_min_unknown, "eer")[1:3]
+    assert abs(f - (1 - t)) == np.min(np.abs(fpr - (1 - tpr)))
+
+def test_bissection_inatteignable():
+    d_min_known = np.array([1., 2., 3.])
+    #Une requete inconnue a distance nulle : le taux de faux positifs depasse 0.1 des le radius 0
+    assert Mt.seuil_bissection(d_min_known, d_min_known + 10, np.array([0., 5.]), "fpr", 0.1) is None
+    #Aucune requete connue n'a d'image de la meme personne dans la gallery : aucun vrai positif
+    assert Mt.seuil_bissection(d_min_known, np.full(3, np.inf), np.array([5.]), "tpr", 0.5) is None
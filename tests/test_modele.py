@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+Binome : DELECLUSE Raphael, CEUNINCK Guillaume
+"""
+
+import os
+import numpy as np
+import pytest
+import Modele
+
+@pytest.fixture
+def modele():
+    """ 
+    Modele ajuste sur une petite gallery aleatoire d'images 10x20, de composantes de variance decroissante.
+    """
+    
+    rng = np.random.default_rng(3)
+    data = (rng.standard_normal((60, 200))*(8/np.sqrt(np.arange(1, 201)))).reshape(60, 10, 20)
+    data_names = ["%d.%d" % (i//3, i%3) for i in range(len(data))]
+    return Modele.ModeleEigenfaces.ajuster(data, data_names, "Kaiser")
+
+def test_sauvegarde_chargement(modele, tmp_path):
+    modele.sauvegarder(tmp_path)
+    charge = Modele.ModeleEigenfaces.charger(tmp_path)
+    for nom in Modele.FICHIERS_MODELE:
+        assert np.array_equal(np.asarray(getattr(charge, nom)), np.asarray(getattr(modele, nom)))
+
+def test_chargement_ancien_modele(modele, tmp_path):
+    #Modele sauvegarde avant l'ajout de residu_reference : il est deduit des valeurs propres
+    modele.sauvegarder(tmp_path)
+    os.remove(os.path.join(tmp_path, "residu_reference.npy"))
+    charge = Modele.ModeleEigenfaces.charger(tmp_path)
+    assert np.isclose(charge.residu_reference, modele.residu_reference)
+    assert np.array_equal(charge.D_reduced, modele.D_reduced)
+
+def test_fichier_obligatoire_absent(modele, tmp_path):
+    modele.sauvegarder(tmp_path)
+    os.remove(os.path.join(tmp_path, "mu.npy"))
+    with pytest.raises(FileNotFoundError):
+        Modele.ModeleEigenfaces.charger(tmp_path)
+
+def test_parametres_sauvegardes(modele, tmp_path):
+    modele.sauvegarder(tmp_path)
+    charge = Modele.ModeleEigenfaces.charger(tmp_path)
+    assert (charge.regle, charge.solveur) == ("Kaiser", "eigh")
+    assert charge.ajuste_avec("Kaiser", "eigh")
+    assert not charge.ajuste_avec("Coude", "eigh")
+    assert not charge.ajuste_avec("Kaiser", "svd")
+
+def test_parametres_inconnus(modele, tmp_path):
+    #Modele sauvegarde sans ses parametres d'ajustement : il n'est reutilisable pour aucun
+    modele.sauvegarder(tmp_path)
+    for nom in ("regle", "solveur"):
+        os.remove(os.path.join(tmp_path, nom + ".npy"))
+    charge = Modele.ModeleEigenfaces.charger(tmp_path)
+    assert charge.regle is None and charge.solveur is None
+    assert not charge.ajuste_avec("Kaiser", "eigh")
+    
+    #Une nouvelle sauvegarde sans parametres efface ceux d'une sauvegarde precedente
+    modele.sauvegarder(tmp_path)
+    charge.sauvegarder(tmp_path)
+    assert Modele.ModeleEigenfaces.charger(tmp_path).regle is None
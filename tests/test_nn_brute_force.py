@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Binome : DELECLUSE Raphael, CEUNINCK Guillaume
+"""
+
+import numpy as np
+import pytest
+import NN_brute_force as NN_BF
+
+@pytest.fixture
+def gallery_egalites():
+    """ 
+    Gallery et requetes a coordonnees entieres : les distances sont exactes et comportent de nombreuses egalites.
+    """
+    
+    rng = np.random.default_rng(2)
+    data = rng.integers(0, 3, (300, 4)).astype(np.float64)
+    queries = rng.integers(0, 3, (25, 4)).astype(np.float64)
+    identites = rng.integers(0, 30, len(data))
+    return data, queries, identites
+
+def reference_knn(distances, k, identites = None):
+    """ 
+    k plus proches voisins par tri complet et stable : distance croissante, puis indice croissant.
+    Avec des identites, seule la premiere image de chaque identite dans cet ordre est retenue.
+    """
+    
+    indices = []
+    for ligne in distances:
+        ordre = np.argsort(ligne, kind = "stable")
+        if identites is not None:
+            _, premieres = np.unique(identites[ordre], return_index = True)
+            ordre = ordre[np.sort(premieres)]
+        indices.append(ordre[:k])
+    return np.array(indices)
+
+@pytest.mark.parametrize("taille_tuile", [NN_BF.TAILLE_TUILE, 250, 37])
+@pytest.mark.parametrize("k", [1, 5, 40])
+def test_knn_tri_complet(gallery_egalites, k, taille_tuile):
+    data, queries, _ = gallery_egalites
+    distances = NN_BF.batch_euclidean_distances(data, queries)
+    indices, d, _ = NN_BF.knn_search(data, queries, k, taille_tuile = taille_tuile)
+    reference = reference_knn(distances, k)
+    assert np.array_equal(indices, reference)
+    assert np.array_equal(d, np.take_along_axis(distances, reference, axis = 1))
+
+@pytest.mark.parametrize("taille_tuile", [NN_BF.TAILLE_TUILE, 250, 37])
+@pytest.mark.parametrize("k", [1, 5, 30])
+def test_knn_par_identite(gallery_egalites, k, taille_tuile):
+    data, queries, identites = gallery_egalites
+    distances = NN_BF.batch_euclidean_distances(data, queries)
+    indices, d, voisins = NN_BF.knn_search(data, queries, k, identites, par_identite = True, taille_tuile = taille_tuile)
+    reference = reference_knn(distances, k, identites)
+    assert np.array_equal(indices, reference)
+    assert np.array_equal(d, np.take_along_axis(distances, reference, axis = 1))
+    assert np.array_equal(voisins, identites[reference])
+    assert all(len(np.unique(ligne)) == len(ligne) for ligne in voisins)
+
+def test_knn_k_borne(gallery_egalites):
+    data, queries, identites = gallery_egalites
+    indices, _, _ = NN_BF.knn_search(data[:10], queries, 50)
+    assert indices.shape == (len(queries), 10)
+    indices, _, _ = NN_BF.knn_search(data, queries, 500, identites, par_identite = True)
+    assert indices.shape == (len(queries), len(np.unique(identites)))
+
+def test_knn_par_identite_sans_identites(gallery_egalites):
+    data, queries, _ = gallery_egalites
+    with pytest.raises(ValueError):
+        NN_BF.knn_search(data, queries, 3, par_identite = True)
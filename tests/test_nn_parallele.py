@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+Binome : DELECLUSE Raphael, CEUNINCK Guillaume
+"""
+
+import numpy as np
+import NN_brute_force as NN_BF
+import NN_parallele
+from conftest import memes_voisins
+
+def test_memoire_partagee(gallery):
+    data, queries, r = gallery
+    with NN_parallele.RechercheParallele(data, nb_processus = 2, nb_shards = 3) as recherche:
+        assert memes_voisins(recherche.NN_search(queries, r), NN_BF.NN_bf_search(data, queries, r))
+
+def test_fichier_npy_entier(gallery, tmp_path):
+    data, queries, r = gallery
+    chemin = str(tmp_path / "g.npy")
+    np.save(chemin, data)
+    memmap = np.load(chemin, mmap_mode = "r")
+    assert NN_parallele._fichier_npy_entier(memmap)
+    with NN_parallele.RechercheParallele(memmap, nb_processus = 2, nb_shards = 4) as recherche:
+        assert len(recherche.memoires) == 1
+        assert memes_voisins(recherche.NN_search(queries, r), NN_BF.NN_bf_search(data, queries, r))
+
+def test_tranche_npy(gallery, tmp_path):
+    data, queries, r = gallery
+    chemin = str(tmp_path / "g.npy")
+    np.save(chemin, data)
+    tranche = np.load(chemin, mmap_mode = "r")[250:]
+    assert not NN_parallele._fichier_npy_entier(tranche)
+    with NN_parallele.RechercheParallele(tranche, nb_processus = 2) as recherche:
+        assert memes_voisins(recherche.NN_search(queries, r), NN_BF.NN_bf_search(data[250:], queries, r))
+
+def test_memmap_brut(gallery, tmp_path):
+    data, queries, r = gallery
+    chemin = str(tmp_path / "g.bin")
+    with open(chemin, "wb") as f:
+        f.write(b"\0"*40)
+        f.write(data.tobytes())
+    memmap = np.memmap(chemin, dtype = np.float64, mode = "r", offset = 40, shape = data.shape)[100:400]
+    with NN_parallele.RechercheParallele(memmap, nb_processus = 2) as recherche:
+        assert memes_voisins(recherche.NN_search(queries, r), NN_BF.NN_bf_search(data[100:400], queries, r))
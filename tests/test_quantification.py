@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""
+Binome : DELECLUSE Raphael, CEUNINCK Guillaume
+"""
+
+import pytest
+import numpy as np
+import NN_brute_force as NN_BF
+import Quantification
+from conftest import memes_voisins
+
+def test_lot_identique_requete_seule(gallery):
+    data, queries, r = gallery
+    pq = Quantification.GalleryPQ(data)
+    assert memes_voisins(pq.NN_search(queries, r), [pq.radius_search(q, r) for q in queries])
+
+def test_reclassement_exact(gallery):
+    data, queries, r = gallery
+    #Avec une tolerance couvrant toutes les erreurs de quantification, le reclassement donne les voisins exacts
+    pq = Quantification.GalleryPQ(data, tolerance = 1e6, original = data)
+    reference = NN_BF.NN_bf_search(data, queries, r)
+    assert memes_voisins(pq.NN_search(queries, r), reference)
+    assert [pq.existe(q, r) for q in queries] == [len(indices) > 0 for indices in reference]
+
+def test_memoire(gallery):
+    data = gallery[0]
+    pq = Quantification.GalleryPQ(data)
+    assert pq.original is None
+    assert pq.codes.nbytes == data.nbytes//16
+    assert pq.octets() == pq.codes.nbytes + sum(centres.nbytes for centres in pq.dictionnaires)
+    assert Quantification.GalleryPQ(data, original = data).octets() > data.nbytes
+
+def test_nb_bits():
+    with pytest.raises(ValueError):
+        Quantification.GalleryPQ(np.zeros((10, 4)), nb_bits = 9)
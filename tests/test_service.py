@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Binome : DELECLUSE Raphael, CEUNINCK Guillaume
+"""
+
+import struct
+import asyncio
+import numpy as np
+import pytest
+import Modele
+import Service
+
+@pytest.fixture
+def modele():
+    """ 
+    Modele ajuste sur une petite gallery aleatoire d'images 10x20.
+    """
+    
+    rng = np.random.default_rng(4)
+    data = rng.integers(0, 256, (30, 10, 20)).astype(np.float64)
+    data_names = ["%d.%d" % (i//3, i%3) for i in range(len(data))]
+    return Modele.ModeleEigenfaces.ajuster(data, data_names, "Kaiser")
+
+def executer(service, scenario):
+    """ 
+    Execution d'un scenario asynchrone recevant le port d'un service demarre, arrete ensuite.
+    """
+    
+    async def principal():
+        serveur = await service.demarrer()
+        try:
+            return await scenario(serveur.sockets[0].getsockname()[1])
+        finally:
+            service.arreter()
+            serveur.close()
+            await serveur.wait_closed()
+    
+    return asyncio.run(principal())
+
+def test_verification(modele):
+    service = Service.ServiceVerification(modele, radius = 1.)
+    image = np.zeros((10, 20), dtype = np.uint8)
+    
+    async def scenario(port):
+        client = Service.ClientVerification()
+        await client.connecter(port = port)
+        reponse = await client.verifier(image)
+        await client.fermer()
+        return reponse
+    
+    reponse = executer(service, scenario)
+    autorise, distances = service.traiter_lot(image.reshape(1, -1).astype(np.float64))
+    assert reponse == {"autorise": bool(autorise[0]), "distance": float(distances[0])}
+
+def test_connexions_invalides(modele):
+    #Un en-tete aberrant ou une connexion interrompue ne ferment que leur connexion
+    service = Service.ServiceVerification(modele, radius = 1.)
+    image = np.zeros((10, 20), dtype = np.uint8)
+    
+    async def scenario(port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(struct.pack(">I", 2**31))
+        await writer.drain()
+        assert await reader.read() == b""
+        writer.close()
+        
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(struct.pack(">I", 200) + bytes(100))
+        await writer.drain()
+        writer.transport.abort()
+        
+        client = Service.ClientVerification()
+        await client.connecter(port = port)
+        reponse = await client.verifier(image)
+        await client.fermer()
+        return reponse
+    
+    assert "autorise" in executer(service, scenario)
+
+def test_lot_requete_annulee(modele):
+    #Une requete annulee avant le traitement de son lot n'interrompt pas la boucle des lots, meme en cas d'erreur
+    service = Service.ServiceVerification(modele, radius = 1.)
+    service.attente_max = 0.05
+    probe = np.zeros(200, dtype = np.uint8)
+    
+    def erreur(probes):
+        raise RuntimeError("lot")
+    
+    async def scenario(port):
+        loop = asyncio.get_running_loop()
+        resultats = []
+        for traitement in (erreur, service.traiter_lot):
+            service.traiter_lot = traitement
+            annulee, attendue = loop.create_future(), loop.create_future()
+            annulee.cancel()
+            await service.file.put((probe, annulee))
+            await service.file.put((probe, attendue))
+            try:
+                resultats.append(await asyncio.wait_for(attendue, 5))
+            except RuntimeError as e:
+                resultats.append(e)
+        return resultats
+    
+    premier, second = executer(service, scenario)
+    assert isinstance(premier, RuntimeError)
+    assert second[1] >= 0
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+Binome : DELECLUSE Raphael, CEUNINCK Guillaume
+"""
+
+import pytest
+import numpy as np
+import Stockage
+
+@pytest.mark.parametrize("dtype", [np.uint8, np.float32, np.float64])
+def test_aller_retour(tmp_path, dtype):
+    rng = np.random.default_rng(0)
+    images = (rng.random((7, 5, 3))*200).astype(dtype)
+    names = ["%d.%d" % (i//3, i % 3) for i in range(7)]
+    chemin = str(tmp_path / "g.gal")
+    Stockage.ecrire_gallery(chemin, images, names)
+    
+    lues, identites, etiquettes, echantillons = Stockage.lire_gallery(chemin)
+    assert lues.dtype == images.dtype and np.array_equal(lues, images)
+    assert Stockage.reconstruire_noms(identites, etiquettes, echantillons) == names
+    #Les blocs sont alignes pour une lecture directe par projection en memoire
+    entete = Stockage.lire_entete(chemin)
+    assert entete["offset_images"] % Stockage.ALIGNEMENT == 0 and entete["offset_etiquettes"] % Stockage.ALIGNEMENT == 0
+
+def test_noms_non_canoniques(tmp_path):
+    names = ["1.01", "1.1", "1.a", "abc", "2.0", "x.y.3", "3.-2", "1.01"]
+    chemin = str(tmp_path / "g.gal")
+    Stockage.ecrire_gallery(chemin, np.zeros((len(names), 2, 2), dtype = np.uint8), names)
+    images, identites, etiquettes, echantillons = Stockage.lire_gallery(chemin)
+    assert Stockage.reconstruire_noms(identites, etiquettes, echantillons) == names
+    assert identites == ["1", "2", "3", "abc", "x.y"]
+
+def test_gallery_vide(tmp_path):
+    chemin = str(tmp_path / "g.gal")
+    Stockage.ecrire_gallery(chemin, np.zeros((0, 4, 4), dtype = np.uint8), [])
+    images, identites, etiquettes, echantillons = Stockage.lire_gallery(chemin)
+    assert images.shape == (0, 4, 4) and Stockage.reconstruire_noms(identites, etiquettes, echantillons) == []
+
+def test_fichier_invalide(tmp_path):
+    chemin = tmp_path / "g.gal"
+    chemin.write_bytes(b"PAS UNE GALLERY")
+    with pytest.raises(ValueError):
+        Stockage.lire_entete(str(chemin))
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""
+Binome : DELECLUSE Raphael, CEUNINCK Guillaume
+"""
+
+import pytest
+import numpy as np
+import NN_brute_force as NN_BF
+import Verification
+
+@pytest.mark.parametrize("taille_bloc", [1, 4, 16])
+def test_identique_force_brute(gallery_identites, taille_bloc):
+    data, data_names, queries, r = gallery_identites
+    verificateur = Verification.Verificateur(data, data_names, taille_bloc)
+    for rayon in (0.5*r, r, 3*r):
+        reference = [len(indices) > 0 for indices in NN_BF.NN_bf_search(data, queries, rayon)]
+        assert [verificateur.existe(q, rayon) for q in queries] == reference
+
+def test_centroides_couvrent_leurs_images(gallery_identites):
+    data, data_names = gallery_identites[:2]
+    identites, ordre, debuts, centroides, rayons = Verification.centroides_identites(data, data_names)
+    for i in range(len(identites)):
+        images = data[ordre[debuts[i]:debuts[i + 1]]]
+        assert all(name.split(".")[0] == identites[i] for name in np.asarray(data_names)[ordre[debuts[i]:debuts[i + 1]]])
+        assert np.sqrt(np.sum((images - centroides[i])**2, axis = 1)).max() <= rayons[i]*(1 + 1e-12)